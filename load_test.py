@@ -0,0 +1,83 @@
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# --- Configuration ---
+# Compare deployments by pointing one target at each, e.g. the same compose
+# stack started once with APP_SERVER=wsgi and once with APP_SERVER=asgi and
+# the same WEB_CONCURRENCY.
+DEFAULT_TARGETS = ["local=http://localhost:8000/api"]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of latencies."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def endpoints(customer_id, loan_id):
+    """The read and eligibility endpoints served by both the sync and async views."""
+    payload = {"customer_id": customer_id, "loan_amount": 100000, "interest_rate": 12, "tenure": 12}
+    return {
+        "check-eligibility": ("post", "/check-eligibility/", payload),
+        "view-loan": ("get", f"/view-loan/{loan_id}/", None),
+        "view-loans": ("get", f"/view-loans/{customer_id}/", None),
+    }
+
+
+def run(base_url, method, path, payload, concurrency, total):
+    """Fires `total` requests with `concurrency` clients and returns latency stats."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def call(_):
+        started = time.perf_counter()
+        response = session.request(method, base_url + path, json=payload)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency, _ in results]
+    return {
+        "requests": total,
+        "errors": sum(1 for _, code in results if code >= 500),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency load test for the credit API.")
+    parser.add_argument("--target", action="append", help="name=base_url, repeatable (default: local=http://localhost:8000/api)")
+    parser.add_argument("--concurrency", type=int, action="append", help="Concurrent clients, repeatable (default: 1, 16, 64)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--customer-id", type=int, default=1)
+    parser.add_argument("--loan-id", type=int, default=None, help="Defaults to the first loan of the customer")
+    args = parser.parse_args()
+
+    targets = dict(target.split("=", 1) for target in (args.target or DEFAULT_TARGETS))
+    levels = args.concurrency or [1, 16, 64]
+
+    report = []
+    for name, base_url in targets.items():
+        loan_id = args.loan_id or requests.get(f"{base_url}/view-loans/{args.customer_id}/").json()[0]["loan_id"]
+        for endpoint, (method, path, payload) in endpoints(args.customer_id, loan_id).items():
+            for concurrency in levels:
+                stats = run(base_url, method, path, payload, concurrency, args.requests)
+                report.append({"target": name, "endpoint": endpoint, "concurrency": concurrency, **stats})
+                print(f"{name:>8} {endpoint:<18} c={concurrency:<4} {stats['rps']:>8} req/s  "
+                      f"p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms  p99 {stats['p99_ms']}ms")
+
+    print(json.dumps(report, indent=4))
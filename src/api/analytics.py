@@ -0,0 +1,204 @@
+# src/api/analytics.py
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Count, Sum, Value, When
+from django.db.models.functions import TruncMonth
+
+from .eligibility import RATE_TIERS
+from .finance import to_money
+from .models import Loan, PortfolioRollup
+from .utils import score_customers
+
+DIMENSIONS = ['score_tier', 'rate_band', 'tenure_bucket', 'origination_month']
+MEASURES = ['loan_count', 'total_principal', 'total_monthly_repayment']
+UPSERT_BATCH_SIZE = 1000
+# The Loan fields a loan's slice and contribution are derived from
+ROLLUP_FIELDS = ['origination_score', 'interest_rate', 'tenure', 'start_date', 'loan_amount', 'monthly_repayment']
+
+
+class Buckets:
+    """
+    Labels values by the interval of edges they fall in, identically in Python
+    (for incremental updates) and in SQL (for full rebuilds).
+
+    closed='right' puts a value equal to an edge in the interval below it,
+    closed='left' in the interval above it.
+    """
+
+    def __init__(self, edges, labels, closed='right'):
+        assert len(labels) == len(edges) + 1
+        self.edges = list(edges)
+        self.labels = list(labels)
+        self.closed = closed
+
+    def label(self, value):
+        if value is None:
+            return 'unscored'
+        find = bisect_left if self.closed == 'right' else bisect_right
+        return self.labels[find(self.edges, value)]
+
+    def case(self, field):
+        lookup = 'lte' if self.closed == 'right' else 'lt'
+        return Case(
+            *[When(**{f'{field}__{lookup}': edge}, then=Value(label)) for edge, label in zip(self.edges, self.labels)],
+            When(**{f'{field}__isnull': True}, then=Value('unscored')),
+            default=Value(self.labels[-1]),
+            output_field=CharField(),
+        )
+
+
+# The eligibility rate tiers: a score at or below a bound belongs to the tier below it
+SCORE_TIERS = Buckets(
+    edges=sorted(bound for bound, _ in RATE_TIERS),
+    labels=['0-10', '11-30', '31-50', '51-100'],
+)
+RATE_BANDS = Buckets(
+    edges=[10, 12, 14, 16, 18],
+    labels=['<10', '10-12', '12-14', '14-16', '16-18', '18+'],
+    closed='left',
+)
+TENURE_BUCKETS = Buckets(
+    edges=[12, 24, 36, 60],
+    labels=['1-12', '13-24', '25-36', '37-60', '61+'],
+)
+
+
+def rollup_key(loan):
+    """The slice a loan (a dict of its fields) is counted in."""
+    return (
+        SCORE_TIERS.label(loan['origination_score']),
+        # Banded as stored: DecimalField(max_digits=5, decimal_places=2)
+        RATE_BANDS.label(to_money(loan['interest_rate'], max_digits=5)),
+        TENURE_BUCKETS.label(loan['tenure']),
+        loan['start_date'].replace(day=1),
+    )
+
+
+def _upsert_deltas(deltas):
+    """
+    Adds (count, principal, repayment) deltas to their slices with one
+    INSERT ... ON CONFLICT DO UPDATE per batch, creating missing slices.
+    Rows are written in key order so concurrent writers cannot deadlock.
+    """
+    table = PortfolioRollup._meta.db_table
+    keys = sorted(key for key, delta in deltas.items() if any(delta))
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+            batch = keys[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({', '.join(DIMENSIONS + MEASURES)})
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))}
+                ON CONFLICT ({', '.join(DIMENSIONS)}) DO UPDATE SET
+                    {', '.join(f'{measure} = {table}.{measure} + EXCLUDED.{measure}' for measure in MEASURES)}
+                """,
+                [value for key in batch for value in (*key, *deltas[key])],
+            )
+
+
+def apply_loan_changes(removed=(), added=()):
+    """
+    Moves loans between rollup slices: subtracts the removed loans (dicts of
+    their previous field values) and adds the added ones, in one upsert.
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for sign, loans in ((-1, removed), (1, added)):
+        for loan in loans:
+            delta = deltas[rollup_key(loan)]
+            delta[0] += sign
+            # Rounded exactly as the Loan columns store them, so rebuilds agree
+            delta[1] += sign * to_money(loan['loan_amount'])
+            delta[2] += sign * to_money(loan['monthly_repayment'], max_digits=10)
+    _upsert_deltas(deltas)
+
+
+def record_loan_in_rollups(loan):
+    """Counts a freshly created loan; run inside the transaction that inserted it."""
+    apply_loan_changes(added=[{field: getattr(loan, field) for field in ROLLUP_FIELDS}])
+
+
+def rollup_rows_for(loan_ids):
+    """{loan_id: fields rollups depend on} for stored loans, read before they are overwritten."""
+    return {
+        row['loan_id']: row
+        for row in Loan.objects.filter(pk__in=loan_ids).values('loan_id', 'customer_id', *ROLLUP_FIELDS)
+    }
+
+
+def backfill_origination_scores() -> int:
+    """
+    Gives loans without an origination score their customer's current score:
+    loans booked before origination scores were recorded, and bulk-ingested
+    loans once the whole file is loaded.
+    """
+    customer_ids = list(
+        Loan.objects.filter(origination_score__isnull=True).values_list('customer_id', flat=True).distinct()
+    )
+    # One update per distinct score rather than per customer
+    by_score = defaultdict(list)
+    for customer_id, score in score_customers(customer_ids).items():
+        by_score[score].append(customer_id)
+    for score, ids in by_score.items():
+        Loan.objects.filter(customer_id__in=ids, origination_score__isnull=True).update(origination_score=score)
+    return len(customer_ids)
+
+
+def rebuild_portfolio_rollups() -> int:
+    """
+    Recomputes every rollup slice from the Loan table in one grouped query,
+    after scoring the loans that have no origination score yet.
+
+    Holds an exclusive lock on the rollup table while rebuilding, so
+    incremental updates from concurrent loan writes wait and apply on top of
+    the rebuilt totals instead of being lost.
+    """
+    backfill_origination_scores()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {PortfolioRollup._meta.db_table} IN EXCLUSIVE MODE')
+        PortfolioRollup.objects.all().delete()
+        rows = (
+            Loan.objects.annotate(
+                score_tier=SCORE_TIERS.case('origination_score'),
+                rate_band=RATE_BANDS.case('interest_rate'),
+                tenure_bucket=TENURE_BUCKETS.case('tenure'),
+                origination_month=TruncMonth('start_date'),
+            )
+            .values(*DIMENSIONS)
+            .annotate(
+                loan_count=Count('loan_id'),
+                total_principal=Sum('loan_amount'),
+                total_monthly_repayment=Sum('monthly_repayment'),
+            )
+            .order_by()
+        )
+        rollups = PortfolioRollup.objects.bulk_create([PortfolioRollup(**row) for row in rows], batch_size=5000)
+    return len(rollups)
+
+
+def portfolio_slices(group_by, filters):
+    """
+    Sums the rollups over the given filters ({dimension: value or list}), grouped
+    by the given dimensions. Returns (rows, totals).
+    """
+    # Slices whose loans all moved elsewhere stay behind with zero totals
+    queryset = PortfolioRollup.objects.filter(loan_count__gt=0)
+    for dimension, value in filters.items():
+        if dimension == 'month_from':
+            queryset = queryset.filter(origination_month__gte=value)
+        elif dimension == 'month_to':
+            queryset = queryset.filter(origination_month__lte=value)
+        else:
+            queryset = queryset.filter(**{f'{dimension}__in': value})
+
+    measures = {measure: Sum(measure) for measure in MEASURES}
+    rows = list(queryset.values(*group_by).annotate(**measures).order_by(*group_by)) if group_by else []
+    totals = queryset.aggregate(**measures)
+    totals['loan_count'] = totals['loan_count'] or 0
+    totals['total_principal'] = totals['total_principal'] or Decimal('0.00')
+    totals['total_monthly_repayment'] = totals['total_monthly_repayment'] or Decimal('0.00')
+    return rows, totals
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_timer
+
+        # Every connection, including those opened by sync_to_async threads,
+        # charges its queries to the request being instrumented
+        connection_created.connect(install_query_timer, dispatch_uid='api.install_query_timer')
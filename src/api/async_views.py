@@ -0,0 +1,106 @@
+# src/api/async_views.py
+"""
+Async variants of the read and eligibility endpoints for ASGI deployments.
+
+They return the same bodies as the DRF views in views.py but use Django's
+async ORM, so a worker keeps serving other requests while one waits on the
+database. Request parsing and response rendering reuse the DRF serializers and
+the project's orjson renderer and parser. Like DRF's APIView they are exempt
+from CSRF checks, since API clients send no CSRF token.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import cache
+from .eligibility import eligibility_engine
+from .models import Customer, Loan
+from .pagination import LoanCursorPagination
+from .renderers import dumps
+from .serializers import (
+    LoanDetailSerializer,
+    LoanEligibilityRequestSerializer,
+    LoanListSerializer,
+)
+from .views import eligibility_response_data
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(dumps(data), status=status_code, content_type='application/json', headers=headers)
+
+
+def method_not_allowed(method):
+    return json_response({'detail': f'Method "{method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+def parse_body(request):
+    """
+    The request body parsed as the DRF views parse it, with the default parser
+    classes; raises UnsupportedMediaType (415) or ParseError (400) like they do.
+    """
+    return Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]).data
+
+
+@csrf_exempt
+async def check_eligibility(request):
+    """Async /check-eligibility."""
+    if request.method != 'POST':
+        return method_not_allowed(request.method)
+    try:
+        payload = parse_body(request)
+    except APIException as exc:
+        return json_response({'detail': str(exc.detail)}, exc.status_code)
+
+    serializer = LoanEligibilityRequestSerializer(data=payload)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        decision = await eligibility_engine.acheck(**serializer.validated_data)
+    except Customer.DoesNotExist:
+        return json_response({"error": "Customer not found"}, status.HTTP_404_NOT_FOUND)
+
+    return json_response(eligibility_response_data(decision))
+
+
+@csrf_exempt
+async def view_loan(request, loan_id):
+    """Async /view-loan/<loan_id>."""
+    if request.method != 'GET':
+        return method_not_allowed(request.method)
+
+    async def load():
+        loan = await Loan.objects.select_related('customer').aget(loan_id=loan_id)
+        return dict(LoanDetailSerializer(loan).data)
+
+    try:
+        data = await cache.aget_or_set('loan', cache.loan_key(loan_id), load)
+    except Loan.DoesNotExist:
+        return json_response({'detail': 'No Loan matches the given query.'}, status.HTTP_404_NOT_FOUND)
+    return json_response(data)
+
+
+@csrf_exempt
+async def view_customer_loans(request, customer_id):
+    """Async /view-loans/<customer_id>, including the opt-in keyset pagination."""
+    if request.method != 'GET':
+        return method_not_allowed(request.method)
+
+    queryset = LoanListSerializer.with_repayments_left(
+        Loan.objects.filter(customer_id=customer_id).order_by('loan_id')
+    ).values(*LoanListSerializer.Meta.fields)
+
+    paginator = LoanCursorPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(queryset, Request(request))
+    if page is not None:
+        return json_response(paginator.get_paginated_response(LoanListSerializer.lean_data(page)).data)
+
+    async def load():
+        return LoanListSerializer.lean_data([row async for row in queryset[:paginator.max_page_size + 1]])
+
+    data = await cache.aget_or_set('customer-loans', cache.customer_loans_key(customer_id), load)
+    data, headers = paginator.capped_list(data, request)
+    return json_response(data, headers=headers)
@@ -0,0 +1,433 @@
+# src/api/benchmarks.py
+import io
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+import numpy as np
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Sum
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .analytics import rebuild_portfolio_rollups
+from .cache import invalidate_customers
+from .eligibility import eligibility_engine
+from .finance import emi, emi_array
+from .ingestion import reset_sequence, upsert_loans
+from .models import Customer, Loan
+from .parsers import ORJSONParser
+from .partitions import loan_partitions, partition_loans, scanned_relations, unpartition_loans
+from .renderers import ORJSONRenderer
+from .responses import LOAN_APPROVED_MESSAGE, LOAN_REJECTED_MESSAGE, CreateLoanResponse, EligibilityResponse
+from .serializers import (
+    CreateLoanResponseSerializer,
+    LoanDetailSerializer,
+    LoanEligibilityResponseSerializer,
+    LoanListSerializer,
+)
+from .summaries import rebuild_loan_summaries
+from .utils import calculate_credit_score
+
+SEED_BATCH_SIZE = 5000
+
+
+def seed_synthetic_data(customers, loans_per_customer, seed=0, batch_size=SEED_BATCH_SIZE, history_years=5):
+    """
+    Upserts a deterministic synthetic dataset: customer ids 1..customers, each
+    with loans_per_customer loans started over the last history_years years.
+    The same arguments always produce the same rows, so runs at the same scale
+    are comparable. Returns (customer_ids, loan_ids).
+    """
+    rng = np.random.default_rng(seed)
+    today = date.today()
+
+    customer_ids = np.arange(1, customers + 1)
+    salaries = rng.integers(20_000, 200_000, customers)
+    limits = np.round(36 * salaries / 100_000) * 100_000
+    ages = rng.integers(21, 65, customers)
+    for start in range(0, customers, batch_size):
+        Customer.objects.bulk_create(
+            [
+                Customer(
+                    customer_id=int(customer_id), first_name='Bench', last_name=f'Customer {customer_id}',
+                    age=int(ages[index]), phone_number=9_000_000_000 + int(customer_id),
+                    monthly_salary=int(salaries[index]), approved_limit=int(limits[index]),
+                )
+                for index, customer_id in enumerate(customer_ids[start:start + batch_size], start)
+            ],
+            update_conflicts=True, unique_fields=['customer_id'],
+            update_fields=['first_name', 'last_name', 'age', 'phone_number', 'monthly_salary', 'approved_limit'],
+        )
+
+    total = customers * loans_per_customer
+    loan_ids = np.arange(1, total + 1)
+    owners = np.repeat(customer_ids, loans_per_customer)
+    amounts = rng.integers(10, 500, total) * 1000.0
+    rates = np.round(rng.uniform(8, 18, total), 2)
+    tenures = rng.choice([6, 12, 24, 36, 60], total)
+    installments = np.round(emi_array(amounts, rates, tenures), 2)
+    # Start dates spread over the history, so both active and closed loans exist;
+    # the longer the history, the larger the share of closed loans
+    start_offsets = rng.integers(0, history_years * 365, total)
+    paid_on_time = np.minimum(tenures, rng.integers(0, 61, total))
+    for start in range(0, total, batch_size):
+        loans = []
+        for index in range(start, min(start + batch_size, total)):
+            start_date = today - timedelta(days=int(start_offsets[index]))
+            loans.append(Loan(
+                loan_id=int(loan_ids[index]), customer_id=int(owners[index]),
+                loan_amount=amounts[index], interest_rate=rates[index],
+                monthly_repayment=installments[index], tenure=int(tenures[index]),
+                emis_paid_on_time=int(paid_on_time[index]), start_date=start_date,
+                end_date=start_date + timedelta(days=30 * int(tenures[index])),
+            ))
+        upsert_loans(loans, ['customer', 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure',
+                             'emis_paid_on_time', 'start_date', 'end_date'])
+
+    reset_sequence(Customer)
+    reset_sequence(Loan)
+    customer_ids, loan_ids = customer_ids.tolist(), loan_ids.tolist()
+    rebuild_loan_summaries(customer_ids, today)
+    rebuild_portfolio_rollups()
+    invalidate_customers(customer_ids, loan_ids)
+    return customer_ids, loan_ids
+
+
+def latency_stats(samples, elapsed=None):
+    """Summarizes per-call durations in seconds as milliseconds and calls per second."""
+    ordered = sorted(samples)
+    ms = [sample * 1000 for sample in ordered]
+
+    def percentile(pct):
+        return round(ms[max(0, min(len(ms) - 1, round(pct / 100 * len(ms)) - 1))], 4)
+
+    elapsed = sum(ordered) if elapsed is None else elapsed
+    return {
+        'calls': len(ms),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'mean_ms': round(statistics.fmean(ms), 4),
+        'per_second': round(len(ms) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def measure(func, iterations, warmup=10, clock=time.perf_counter):
+    """Times func() iterations times after warmup untimed calls."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = clock()
+        func()
+        samples.append(clock() - started)
+    return latency_stats(samples)
+
+
+def run_micro_benchmarks(customer_ids, iterations=1000):
+    """Benchmarks credit scoring, the EMI math and the loan serializers in isolation."""
+    ids = iter(customer_ids * (iterations // len(customer_ids) + 2))
+    customer_id = customer_ids[0]
+    loans = list(Loan.objects.filter(customer_id=customer_id).select_related('customer'))
+    rows = list(
+        LoanListSerializer.with_repayments_left(Loan.objects.filter(customer_id=customer_id))
+        .values(*LoanListSerializer.Meta.fields)
+    )
+    principals = np.full(10_000, 250_000.0)
+    rates = np.linspace(8, 18, 10_000)
+    tenures = np.full(10_000, 36)
+
+    return {
+        'calculate_credit_score': measure(lambda: calculate_credit_score(next(ids)), iterations),
+        'emi': measure(lambda: emi(250_000.0, 12.5, 36), iterations),
+        'emi_array_10k': measure(lambda: emi_array(principals, rates, tenures), max(iterations // 10, 1)),
+        'loan_detail_serializer': measure(lambda: LoanDetailSerializer(loans[0]).data, iterations),
+        'loan_list_serializer': measure(
+            lambda: LoanListSerializer(LoanListSerializer.with_repayments_left(
+                Loan.objects.filter(customer_id=customer_id)), many=True).data,
+            iterations,
+        ),
+        'loan_list_lean_data': measure(lambda: LoanListSerializer.lean_data(rows), iterations),
+    }
+
+
+def endpoint_requests(customer_ids, loan_ids, batch_size=100):
+    """
+    Returns {name: make_request(i)} for every API endpoint; make_request builds
+    the (method, path, body) of the i-th request so runs cycle through the data.
+    """
+    def customer(i):
+        return customer_ids[i % len(customer_ids)]
+
+    def loan(i):
+        return loan_ids[i % len(loan_ids)]
+
+    def eligibility(i):
+        return {'customer_id': customer(i), 'loan_amount': 100_000, 'interest_rate': 12, 'tenure': 12}
+
+    phone_base = 8_000_000_000 + int(time.time())
+    return {
+        'register': lambda i: ('post', '/api/register/', {
+            'first_name': 'Bench', 'last_name': 'Register', 'age': 30,
+            'monthly_salary': 50_000, 'phone_number': phone_base + i,
+        }),
+        'check-eligibility': lambda i: ('post', '/api/check-eligibility/', eligibility(i)),
+        'check-eligibility-batch': lambda i: (
+            'post', '/api/check-eligibility/batch/',
+            [eligibility(i * batch_size + j) for j in range(batch_size)],
+        ),
+        'create-loan': lambda i: ('post', '/api/create-loan/', eligibility(i)),
+        'view-loan': lambda i: ('get', f'/api/view-loan/{loan(i)}/', None),
+        'view-loan-schedule': lambda i: ('get', f'/api/view-loan/{loan(i)}/schedule/', None),
+        'view-loans': lambda i: ('get', f'/api/view-loans/{customer(i)}/', None),
+        'analytics-portfolio': lambda i: ('get', '/api/analytics/portfolio/?group_by=score_tier,rate_band', None),
+        'credit-scores-batch': lambda i: (
+            'post', '/api/credit-scores/batch/',
+            {'customer_ids': [customer(i * batch_size + j) for j in range(batch_size)]},
+        ),
+    }
+
+
+def run_endpoint_benchmarks(customer_ids, loan_ids, requests=200, endpoints=None):
+    """
+    Load-tests each endpoint in-process through the Django test client.
+
+    Reports latency percentiles, requests per second, queries per request and
+    the status codes seen. Cached entries for the dataset are dropped before
+    each endpoint, so every run starts cold.
+    """
+    client = Client()
+    results = {}
+    for name, make_request in endpoint_requests(customer_ids, loan_ids).items():
+        if endpoints and name not in endpoints:
+            continue
+        invalidate_customers(customer_ids, loan_ids)
+        samples, queries, statuses = [], 0, {}
+        started = time.perf_counter()
+        for i in range(requests):
+            method, path, body = make_request(i)
+            call_started = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                if method == 'get':
+                    response = client.get(path)
+                else:
+                    response = client.post(path, body, content_type='application/json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            samples.append(time.perf_counter() - call_started)
+            queries += len(captured)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - started
+
+        stats = latency_stats(samples, elapsed)
+        stats['requests_per_second'] = stats.pop('per_second')
+        stats['queries_per_request'] = round(queries / requests, 2)
+        stats['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+        results[name] = stats
+    return results
+
+
+def _serializer_round_trip(serializer_class, data):
+    # How the views built these bodies before the response dataclasses
+    serializer = serializer_class(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+def response_builders(decision):
+    """{endpoint: (build the body the old way, build it the lean way)} for the endpoints with typed bodies."""
+    eligibility_data = {
+        'customer_id': decision.customer_id, 'approval': decision.approval,
+        'interest_rate': decision.interest_rate, 'corrected_interest_rate': decision.corrected_interest_rate,
+        'tenure': decision.tenure, 'monthly_installment': round(decision.monthly_installment, 2),
+    }
+    loan_data = {
+        'loan_id': 1, 'customer_id': decision.customer_id, 'loan_approved': decision.approval,
+        'message': LOAN_APPROVED_MESSAGE if decision.approval else LOAN_REJECTED_MESSAGE,
+        'monthly_installment': round(decision.monthly_installment, 2),
+    }
+    return {
+        'check-eligibility': (
+            lambda: _serializer_round_trip(LoanEligibilityResponseSerializer, eligibility_data),
+            lambda: EligibilityResponse.from_decision(decision).to_dict(),
+        ),
+        'create-loan': (
+            lambda: _serializer_round_trip(CreateLoanResponseSerializer, loan_data),
+            lambda: CreateLoanResponse.from_decision(decision, 1).to_dict(),
+        ),
+    }
+
+
+def run_response_benchmarks(customer_ids, loan_ids, iterations=1000, endpoints=None):
+    """
+    Measures the CPU time each endpoint spends parsing its request body and
+    building and rendering its response body, on the stock DRF path (stdlib
+    json, response serializer round trips) and on the lean one (orjson,
+    response dataclasses).
+
+    Bodies are captured from one real request per endpoint; the database work,
+    identical on both paths, is left out. view-loan-schedule writes its JSON by
+    hand and is skipped.
+    """
+    client = Client()
+    parsers = {'stock': JSONParser(), 'lean': ORJSONParser()}
+    renderers = {'stock': JSONRenderer(), 'lean': ORJSONRenderer()}
+    decision = eligibility_engine.check(customer_ids[0], 100_000, 12, 12)
+    builders = response_builders(decision)
+
+    results = {}
+    for name, make_request in endpoint_requests(customer_ids, loan_ids).items():
+        if name == 'view-loan-schedule' or (endpoints and name not in endpoints):
+            continue
+        method, path, body = make_request(0)
+        if method == 'get':
+            response = client.get(path)
+        else:
+            response = client.post(path, body, content_type='application/json')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        # Streamed NDJSON endpoints render one document per line
+        documents = [json.loads(line) for line in content.splitlines() if line.strip()]
+        request_body = None if body is None else json.dumps(body).encode()
+
+        def path_for(variant):
+            parser, renderer = parsers[variant], renderers[variant]
+            build = builders[name][variant == 'lean'] if name in builders else None
+
+            def handle():
+                if request_body is not None:
+                    parser.parse(io.BytesIO(request_body))
+                if build is not None:
+                    build()
+                for document in documents:
+                    renderer.render(document)
+            return handle
+
+        stock = measure(path_for('stock'), iterations, clock=time.process_time)
+        lean = measure(path_for('lean'), iterations, clock=time.process_time)
+        saved_us = (stock['mean_ms'] - lean['mean_ms']) * 1000
+        results[name] = {
+            'stock_cpu_us': round(stock['mean_ms'] * 1000, 2),
+            'lean_cpu_us': round(lean['mean_ms'] * 1000, 2),
+            'saved_cpu_us': round(saved_us, 2),
+            'saved_pct': round(100 * saved_us / (stock['mean_ms'] * 1000), 1) if stock['mean_ms'] else 0.0,
+        }
+    return results
+
+
+def connection_setup_seconds(samples=50):
+    """Times opening a fresh database connection (including the session setup Django runs)."""
+    durations = []
+    for _ in range(samples):
+        connection.close()
+        started = time.perf_counter()
+        connection.ensure_connection()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def run_connection_benchmarks(customer_ids, requests=200, conn_max_age=60):
+    """
+    Measures how much of a check-eligibility request is spent opening database
+    connections, with connections closed after every request (CONN_MAX_AGE=0)
+    and reused (conn_max_age, or the configured pool).
+
+    Requests go through the full WSGI handler rather than the test client, so
+    Django's per-request connection handling runs exactly as in production.
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    connects = []
+    connection_created.connect(lambda **kwargs: connects.append(1), weak=False, dispatch_uid='benchmark-connects')
+    setup = connection_setup_seconds()
+
+    modes = {'per_request': 0, 'persistent': conn_max_age}
+    if connection.settings_dict['OPTIONS'].get('pool'):
+        # With a pool every request checks a connection out, and "setup" is the checkout
+        modes = {'pooled': 0}
+    original = connection.settings_dict['CONN_MAX_AGE']
+    results = {}
+    try:
+        for mode, max_age in modes.items():
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            connection.close()
+            connects.clear()
+            samples = []
+            started = time.perf_counter()
+            for i in range(requests):
+                request = factory.post('/api/check-eligibility/', {
+                    'customer_id': customer_ids[i % len(customer_ids)],
+                    'loan_amount': 100_000, 'interest_rate': 12, 'tenure': 12,
+                }, content_type='application/json')
+                call_started = time.perf_counter()
+                response = handler(request.environ, lambda status, headers: None)
+                b''.join(response)
+                response.close()  # Fires request_finished, which closes or keeps the connection
+                samples.append(time.perf_counter() - call_started)
+            stats = latency_stats(samples, time.perf_counter() - started)
+            stats['requests_per_second'] = stats.pop('per_second')
+            stats['connections_opened'] = len(connects)
+            stats['connection_setup_share'] = round(
+                len(connects) * setup / sum(samples), 4
+            )
+            results[mode] = stats
+    finally:
+        connection.settings_dict['CONN_MAX_AGE'] = original
+        connection_created.disconnect(dispatch_uid='benchmark-connects')
+        connection.close()
+    return {'connection_setup_ms': round(setup * 1000, 4), **results}
+
+
+def run_partition_benchmarks(customer_ids, iterations=1000, scans=10):
+    """
+    Times active-loan aggregates (the whole book's active exposure, and one
+    customer's active loans) with the loan table as a single heap and split
+    into yearly end_date partitions, and lists the relations each plan reads.
+
+    The table is converted and then restored, copying every row twice; on a
+    large book that dominates the run time, so scans caps the book-wide calls.
+    """
+    if connection.vendor != 'postgresql':
+        return {}
+    today = date.today()
+    totals = {'loans': Count('loan_id'), 'principal': Sum('loan_amount'), 'emi': Sum('monthly_repayment')}
+    active = Loan.objects.filter(end_date__gte=today)
+
+    def run():
+        ids = iter(customer_ids * (iterations // len(customer_ids) + 2))
+        exposure = measure(lambda: active.aggregate(**totals), scans, warmup=1)
+        exposure['relations_scanned'] = len(scanned_relations(active))
+        customer = measure(lambda: active.filter(customer_id=next(ids)).aggregate(**totals), iterations)
+        customer['relations_scanned'] = len(scanned_relations(active.filter(customer_id=customer_ids[0])))
+        return {'partitions': len(loan_partitions()), 'active_exposure': exposure, 'customer_active_loans': customer}
+
+    results = {'single_table': run()}
+    started = time.perf_counter()
+    partition_loans(today=today)
+    try:
+        results['partition_seconds'] = round(time.perf_counter() - started, 3)
+        results['partitioned'] = run()
+    finally:
+        unpartition_loans()
+    return results
+
+
+def environment():
+    """Describes where a benchmark ran, so results from different runs can be compared."""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
@@ -0,0 +1,107 @@
+# src/api/cache.py
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Seconds each kind of entry may live before it is recomputed
+DEFAULT_TTLS = {
+    'loan': 300,
+    'customer-loans': 300,
+    'credit-score': 3600,
+}
+
+_MISSING = object()
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def ttl(namespace):
+    return getattr(settings, 'API_CACHE_TTLS', {}).get(namespace, DEFAULT_TTLS[namespace])
+
+
+def loan_key(loan_id):
+    return f'loan:{loan_id}'
+
+
+def customer_loans_key(customer_id):
+    return f'customer-loans:{customer_id}'
+
+
+def credit_score_key(customer_id):
+    return f'credit-score:{customer_id}'
+
+
+def _count(counter, namespace, amount=1):
+    with _lock:
+        counter[namespace] += amount
+
+
+def get_or_set(namespace, key, compute):
+    """Returns the cached value for key, computing and storing it on a miss."""
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(_hits, namespace)
+        return value
+
+    _count(_misses, namespace)
+    value = compute()
+    cache.set(key, value, ttl(namespace))
+    return value
+
+
+async def aget_or_set(namespace, key, compute):
+    """Async get_or_set(); compute is a coroutine function."""
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _count(_hits, namespace)
+        return value
+
+    _count(_misses, namespace)
+    value = await compute()
+    await cache.aset(key, value, ttl(namespace))
+    return value
+
+
+def get_or_set_many(namespace, keys, compute_missing):
+    """
+    Multi-key read-through. keys maps ids to cache keys; compute_missing receives
+    the ids that missed and returns {id: value}. Returns {id: value} for all ids.
+    """
+    cached = cache.get_many(list(keys.values()))
+    values = {item: cached[key] for item, key in keys.items() if key in cached}
+    missing = [item for item in keys if item not in values]
+    _count(_hits, namespace, len(values))
+    _count(_misses, namespace, len(missing))
+
+    if missing:
+        computed = compute_missing(missing)
+        cache.set_many({keys[item]: computed[item] for item in missing}, ttl(namespace))
+        values.update(computed)
+    return values
+
+
+def invalidate_customers(customer_ids, loan_ids=()):
+    """Drops the cached loan lists, credit scores and given loan details after a write."""
+    keys = [loan_key(loan_id) for loan_id in loan_ids]
+    for customer_id in customer_ids:
+        keys += [customer_loans_key(customer_id), credit_score_key(customer_id)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def cache_stats():
+    """Returns in-process hit and miss counters per entry kind."""
+    with _lock:
+        return {
+            namespace: {'hits': _hits[namespace], 'misses': _misses[namespace]}
+            for namespace in DEFAULT_TTLS
+        }
+
+
+def reset_cache_stats():
+    with _lock:
+        _hits.clear()
+        _misses.clear()
@@ -0,0 +1,184 @@
+# src/api/eligibility.py
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from .finance import emi
+from .metrics import timed
+from .models import Customer
+from .snapshots import fresh_snapshot
+from .summaries import (
+    aload_customer_with_summary,
+    load_customer_with_summary,
+    load_customers_with_summaries,
+    summary_credit_score,
+)
+from .utils import score_array
+
+# Credit score tiers as (exclusive lower score bound, minimum interest rate).
+# Scores at or below the lowest bound are never approved.
+RATE_TIERS = (
+    (50, 10.0),  # Minimum rate for the best customers
+    (30, 12.0),
+    (10, 16.0),
+)
+
+# Total EMIs on current loans may not exceed this share of the monthly salary
+MAX_EMI_TO_SALARY = 0.5
+
+
+@dataclass(frozen=True)
+class EligibilityDecision:
+    """The outcome of evaluating a loan request against the eligibility rules."""
+    customer_id: int
+    credit_score: int
+    approval: bool
+    interest_rate: float
+    # Only set when the loan is approved at the tier minimum instead of the requested rate
+    corrected_interest_rate: Optional[float]
+    final_interest_rate: float
+    tenure: int
+    loan_amount: float
+    monthly_installment: float
+    customer: Customer = field(default=None, repr=False, compare=False)
+
+
+class EligibilityEngine:
+    """
+    Evaluates loan requests against the credit score rate tiers and the EMI rule.
+
+    The rate tiers are compiled once into a bisect table, and a customer and its
+    loan aggregates are loaded with a single read per request.
+    """
+
+    def __init__(self, rate_tiers=RATE_TIERS, max_emi_to_salary=MAX_EMI_TO_SALARY):
+        tiers = sorted(rate_tiers)
+        self._bounds = [bound for bound, _ in tiers]
+        # Index i holds the minimum rate for scores in (bounds[i-1], bounds[i]]
+        self._min_rates = [None] + [rate for _, rate in tiers]
+        self.max_emi_to_salary = max_emi_to_salary
+
+    def min_rate_for_score(self, credit_score) -> Optional[float]:
+        """Returns the minimum interest rate for a score, or None if it cannot be approved."""
+        return self._min_rates[bisect_left(self._bounds, credit_score)]
+
+    def check(self, customer_id, loan_amount, interest_rate, tenure, lock=False) -> EligibilityDecision:
+        """
+        Loads the customer and evaluates a request. Raises Customer.DoesNotExist.
+        Pass lock=True inside a transaction when the decision will be acted on.
+        """
+        with timed('load'):
+            customer, summary = load_customer_with_summary(customer_id, lock=lock)
+        with timed('evaluate'):
+            return self.evaluate(customer, summary, loan_amount, interest_rate, tenure)
+
+    async def acheck(self, customer_id, loan_amount, interest_rate, tenure) -> EligibilityDecision:
+        """Async check() for the ASGI views. Raises Customer.DoesNotExist."""
+        with timed('load'):
+            customer, summary = await aload_customer_with_summary(customer_id)
+        with timed('evaluate'):
+            return self.evaluate(customer, summary, loan_amount, interest_rate, tenure)
+
+    @staticmethod
+    def credit_score(customer, summary) -> int:
+        """
+        Reads the credit score snapshot when it was loaded with the customer and
+        is fresh, and scores from the loan summary otherwise. Locked loads never
+        carry a snapshot, so decisions that create loans always score live.
+        """
+        if Customer.credit_score_snapshot.related.is_cached(customer):
+            snapshot = fresh_snapshot(customer)
+            if snapshot is not None:
+                return snapshot.credit_score
+        return summary_credit_score(customer, summary)
+
+    def evaluate(self, customer, summary, loan_amount, interest_rate, tenure) -> EligibilityDecision:
+        """Evaluates a request for an already loaded customer and loan summary."""
+        credit_score = self.credit_score(customer, summary)
+        min_rate = self.min_rate_for_score(credit_score)
+
+        approval = min_rate is not None
+        corrected_interest_rate = None
+        final_interest_rate = interest_rate
+        if approval and interest_rate < min_rate:
+            # The loan can be approved, but at the tier's minimum required rate
+            corrected_interest_rate = min_rate
+            final_interest_rate = min_rate
+
+        # Final check: The EMI rule overrides everything
+        if summary.active_emi_total > customer.monthly_salary * self.max_emi_to_salary:
+            approval = False
+            corrected_interest_rate = None
+
+        monthly_installment = emi(loan_amount, final_interest_rate, tenure) if approval else 0
+
+        return EligibilityDecision(
+            customer_id=customer.customer_id,
+            credit_score=credit_score,
+            approval=approval,
+            interest_rate=interest_rate,
+            corrected_interest_rate=corrected_interest_rate,
+            final_interest_rate=final_interest_rate,
+            tenure=tenure,
+            loan_amount=loan_amount,
+            monthly_installment=monthly_installment,
+            customer=customer,
+        )
+
+
+    def evaluate_batch(self, requests) -> list:
+        """
+        Evaluates many requests with set-based loading and vectorized rules.
+
+        requests is a list of dicts with customer_id, loan_amount, interest_rate
+        and tenure. Returns a list aligned with it holding an EligibilityDecision,
+        or None where the customer does not exist. Decisions are identical to
+        evaluate() for the same inputs.
+        """
+        loaded = load_customers_with_summaries({request['customer_id'] for request in requests})
+        found = [index for index, request in enumerate(requests) if request['customer_id'] in loaded]
+        decisions = [None] * len(requests)
+        if not found:
+            return decisions
+
+        rows = [(requests[index], *loaded[requests[index]['customer_id']]) for index in found]
+        scores = score_array(
+            [customer.approved_limit for _, customer, _ in rows],
+            [summary.active_principal for _, _, summary in rows],
+            [summary.active_loan_count for _, _, summary in rows],
+            [summary.closed_loan_count for _, _, summary in rows],
+            [summary.late_loan_count for _, _, summary in rows],
+        )
+        rates = np.array([request['interest_rate'] for request, _, _ in rows], dtype=np.float64)
+        emi_totals = np.array([summary.active_emi_total for _, _, summary in rows], dtype=np.float64)
+        salaries = np.array([customer.monthly_salary for _, customer, _ in rows], dtype=np.float64)
+
+        # bisect_left over the tier bounds, for every score at once
+        min_rate_table = np.array([np.nan if rate is None else rate for rate in self._min_rates])
+        min_rates = min_rate_table[np.searchsorted(self._bounds, scores, side='left')]
+        approvable = ~np.isnan(min_rates)
+        tier_corrected = approvable & (rates < min_rates)
+        approval = approvable & ~(emi_totals > salaries * self.max_emi_to_salary)
+
+        for position, (index, (request, customer, _)) in enumerate(zip(found, rows)):
+            approved = bool(approval[position])
+            final_rate = float(min_rates[position]) if tier_corrected[position] else request['interest_rate']
+            decisions[index] = EligibilityDecision(
+                customer_id=customer.customer_id,
+                credit_score=int(scores[position]),
+                approval=approved,
+                interest_rate=request['interest_rate'],
+                corrected_interest_rate=final_rate if approved and tier_corrected[position] else None,
+                final_interest_rate=final_rate,
+                tenure=request['tenure'],
+                loan_amount=request['loan_amount'],
+                # Scalar emi(): NumPy's SIMD pow may differ from libm in the last bit
+                monthly_installment=emi(request['loan_amount'], final_rate, request['tenure']) if approved else 0,
+                customer=customer,
+            )
+        return decisions
+
+
+eligibility_engine = EligibilityEngine()
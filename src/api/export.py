@@ -0,0 +1,202 @@
+# src/api/export.py
+import csv
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import F
+
+from .models import Loan
+from .utils import score_customers, score_from_aggregates
+
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Output column -> Loan lookup
+COLUMNS = {
+    'loan_id': 'loan_id',
+    'customer_id': 'customer_id',
+    'first_name': 'customer__first_name',
+    'last_name': 'customer__last_name',
+    'phone_number': 'customer__phone_number',
+    'age': 'customer__age',
+    'monthly_salary': 'customer__monthly_salary',
+    'approved_limit': 'customer__approved_limit',
+    'current_debt': 'customer__current_debt',
+    'loan_amount': 'loan_amount',
+    'interest_rate': 'interest_rate',
+    'monthly_repayment': 'monthly_repayment',
+    'tenure': 'tenure',
+    'emis_paid_on_time': 'emis_paid_on_time',
+    'repayments_left': 'repayments_left',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+}
+# Loan summary fields the credit score is calculated from, joined into the same query
+SCORE_LOOKUPS = {
+    'current_debt_sum': 'customer__loan_summary__active_principal',
+    'num_current_loans': 'customer__loan_summary__active_loan_count',
+    'num_past_loans': 'customer__loan_summary__closed_loan_count',
+    'num_late_loans': 'customer__loan_summary__late_loan_count',
+}
+NEXT_ROLLOVER = 'customer__loan_summary__next_rollover'
+FIELDS = list(COLUMNS) + ['credit_score']
+
+
+class ExportError(Exception):
+    pass
+
+
+def _group(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_rows(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields every loan joined with its customer, repayments_left and the
+    customer's current credit score, ordered by customer and loan id.
+
+    Rows are read through a server-side cursor chunk_size at a time, so memory
+    stays flat however large the loan book is. The export only reads: customers
+    with no loan summary, or one a closed loan has made stale, are scored from
+    their loans with one grouped query per chunk.
+    """
+    today = date.today()
+    queryset = (
+        Loan.objects.annotate(repayments_left=F('tenure') - F('emis_paid_on_time'))
+        .order_by('customer_id', 'loan_id')
+        .values_list(*COLUMNS.values(), *SCORE_LOOKUPS.values(), NEXT_ROLLOVER)
+    )
+    names = list(COLUMNS)
+    for batch in _group(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        rows = []
+        unscored = []
+        for values in batch:
+            row = dict(zip(names, values))
+            aggregates, next_rollover = values[len(names):-1], values[-1]
+            if aggregates[0] is None or (next_rollover is not None and next_rollover < today):
+                unscored.append(row['customer_id'])
+            else:
+                row['credit_score'] = score_from_aggregates(row['approved_limit'], *aggregates)
+            rows.append(row)
+        scores = score_customers(unscored) if unscored else {}
+        for row in rows:
+            if 'credit_score' not in row:
+                row['credit_score'] = scores[row['customer_id']]
+            yield row
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        # Decimals as strings, like the DecimalFields of the loan endpoints
+        return str(value)
+    return value.isoformat()
+
+
+class _Pipe:
+    """A write-only file object that hands written bytes or text to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def stream_csv(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    pipe = _Pipe()
+    writer = csv.DictWriter(pipe, fieldnames=FIELDS)
+    writer.writeheader()
+    for batch in _group(rows, chunk_size):
+        writer.writerows(batch)
+        yield ''.join(pipe.drain())
+    yield ''.join(pipe.drain())
+
+
+def stream_ndjson(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    for batch in _group(rows, chunk_size):
+        yield ''.join(json.dumps(row, default=_json_default, separators=(',', ':')) + '\n' for row in batch)
+
+
+def _pyarrow():
+    # Optional dependency, only needed for Parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise ExportError('Parquet export requires pyarrow') from exc
+    return pyarrow, pyarrow.parquet
+
+
+def stream_parquet(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Writes one Parquet row group per chunk and yields the bytes as they are produced."""
+    pa, pq = _pyarrow()
+    money = pa.decimal128(12, 2)
+    schema = pa.schema([
+        ('loan_id', pa.int64()), ('customer_id', pa.int64()),
+        ('first_name', pa.string()), ('last_name', pa.string()),
+        ('phone_number', pa.int64()), ('age', pa.int32()),
+        ('monthly_salary', pa.int64()), ('approved_limit', pa.int64()), ('current_debt', pa.int64()),
+        ('loan_amount', money), ('interest_rate', pa.decimal128(5, 2)), ('monthly_repayment', pa.decimal128(10, 2)),
+        ('tenure', pa.int32()), ('emis_paid_on_time', pa.int32()), ('repayments_left', pa.int32()),
+        ('start_date', pa.date32()), ('end_date', pa.date32()), ('credit_score', pa.int32()),
+    ])
+
+    pipe = _Pipe()
+    writer = pq.ParquetWriter(pipe, schema)
+    try:
+        for batch in _group(rows, chunk_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield b''.join(pipe.drain())
+    finally:
+        writer.close()
+    yield b''.join(pipe.drain())
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'parquet': stream_parquet,
+}
+
+
+def stream_export(file_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Returns a generator of str (csv, ndjson) or bytes (parquet) chunks with the
+    whole loan book. Raises ExportError for unknown or unavailable formats
+    before any row is read.
+    """
+    if file_format not in STREAMERS:
+        raise ExportError(f"Unknown export format '{file_format}', expected one of: {', '.join(STREAMERS)}")
+    if file_format == 'parquet':
+        _pyarrow()
+    return STREAMERS[file_format](export_rows(chunk_size), chunk_size)
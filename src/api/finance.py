@@ -0,0 +1,114 @@
+# src/api/finance.py
+import decimal
+from decimal import Decimal
+
+import numpy as np
+
+CENT = Decimal('0.01')
+
+
+def emi(principal, annual_rate, tenure) -> float:
+    """Returns the monthly installment for one loan as a float."""
+    r = (annual_rate / 12) / 100
+    n = tenure
+    return (principal * r * (1 + r)**n) / ((1 + r)**n - 1) if r > 0 else principal / n
+
+
+def emi_array(principals, annual_rates, tenures) -> np.ndarray:
+    """Returns the monthly installments for arrays of loans, element-wise like emi()."""
+    p = np.asarray(principals, dtype=np.float64)
+    r = np.asarray(annual_rates, dtype=np.float64) / 12 / 100
+    n = np.asarray(tenures, dtype=np.float64)
+    growth = np.power(1 + r, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(r > 0, p * r * growth / (growth - 1), p / n)
+
+
+def to_money(value, max_digits=12) -> Decimal:
+    """
+    Rounds a float or Decimal to cents exactly as a DecimalField with
+    decimal_places=2 stores it, so values can be compared with saved rows.
+    """
+    context = decimal.Context(prec=max_digits)
+    if isinstance(value, float):
+        value = context.create_decimal_from_float(value)
+    return Decimal(value).quantize(CENT, context=context)
+
+
+def amortization_schedules(principals, annual_rates, tenures, installments=None):
+    """
+    Builds amortization schedules for arrays of loans at once.
+
+    Returns (payment, interest, principal, balance) float arrays of shape
+    (loans, max tenure); months past a loan's tenure are NaN. installments
+    defaults to emi_array(); pass the stored monthly_repayment to follow it.
+    The final payment of each loan absorbs the rounding residue so the
+    closing balance is exactly zero.
+    """
+    p = np.asarray(principals, dtype=np.float64).reshape(-1, 1)
+    r = np.asarray(annual_rates, dtype=np.float64).reshape(-1, 1) / 12 / 100
+    n = np.asarray(tenures, dtype=np.int64).reshape(-1, 1)
+    if installments is None:
+        installments = emi_array(principals, annual_rates, tenures)
+    e = np.asarray(installments, dtype=np.float64).reshape(-1, 1)
+
+    months = np.arange(1, int(n.max(initial=0)) + 1, dtype=np.float64)
+    growth = np.power(1 + r, months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(r > 0, (growth - 1) / r, months)
+    balance = p * growth - e * annuity
+    opening = np.concatenate([p, balance[:, :-1]], axis=1)
+
+    interest = opening * r
+    payment = np.broadcast_to(e, balance.shape).copy()
+    last = months == n
+    payment[last] = (opening * (1 + r))[last]
+    balance[last] = 0.0
+    principal = payment - interest
+
+    beyond = months > n
+    for column in (payment, interest, principal, balance):
+        column[beyond] = np.nan
+    return payment, interest, principal, balance
+
+
+def outstanding_balances(principals, annual_rates, tenures, installments, months) -> np.ndarray:
+    """
+    Returns the balance left on each loan after `months` installments,
+    element-wise and as amortization_schedules() computes it: zero from the
+    last month of the tenure on, and never above the principal or below zero.
+    """
+    p = np.asarray(principals, dtype=np.float64)
+    r = np.asarray(annual_rates, dtype=np.float64) / 12 / 100
+    e = np.asarray(installments, dtype=np.float64)
+    k = np.asarray(months, dtype=np.float64)
+    growth = np.power(1 + r, k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(r > 0, (growth - 1) / r, k)
+    balance = np.clip(p * growth - e * annuity, 0.0, p)
+    return np.where(k >= np.asarray(tenures), 0.0, balance)
+
+
+def amortization_schedule(principal, annual_rate, tenure, installment=None):
+    """
+    Yields one loan's schedule as dicts of Decimal amounts rounded to cents.
+
+    Rounding happens only here, at the edge: balances are rounded to cents and
+    each principal repayment is the difference of consecutive rounded balances,
+    so the principal column sums exactly to the loan amount.
+    """
+    installments = None if installment is None else [float(installment)]
+    columns = amortization_schedules([float(principal)], [float(annual_rate)], [tenure], installments)
+    payment, _, _, balance = (column[0] for column in columns)
+    opening = to_money(principal)
+    for month in range(tenure):
+        closing = to_money(float(balance[month]))
+        paid = to_money(float(payment[month]))
+        yield {
+            'month': month + 1,
+            'payment': paid,
+            'interest': paid - (opening - closing),
+            'principal': opening - closing,
+            'balance': closing,
+        }
+        opening = closing
@@ -0,0 +1,81 @@
+# src/api/idempotency.py
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class IdempotencyKeyConflict(Exception):
+    """Raised when a key is stored concurrently for a different request."""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    response: dict
+
+
+def ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+
+
+def _cache_key(key):
+    return f'idempotency:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def fingerprint(payload) -> str:
+    """Hashes a request payload independently of key order."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def lookup(key, use_cache=True):
+    """
+    Returns the StoredResponse for key, or None. Reads Redis first and falls
+    back to the database, which is the source of truth.
+    """
+    if use_cache:
+        stored = cache.get(_cache_key(key))
+        if stored is not None:
+            return StoredResponse(*stored)
+
+    row = IdempotencyKey.objects.filter(pk=key).values_list('fingerprint', 'status_code', 'response').first()
+    if row is None:
+        return None
+    cache.set(_cache_key(key), row, ttl())
+    return StoredResponse(*row)
+
+
+def store(key, request_fingerprint, status_code, response):
+    """
+    Records the response for key inside the caller's transaction and caches it
+    once that commits. Raises IdempotencyKeyConflict if the key is taken.
+    """
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key=key, fingerprint=request_fingerprint, status_code=status_code, response=response,
+            )
+    except IntegrityError as exc:
+        raise IdempotencyKeyConflict(key) from exc
+
+    entry = (request_fingerprint, status_code, response)
+    transaction.on_commit(lambda: cache.set(_cache_key(key), entry, ttl()))
+
+
+def purge_expired(now=None) -> int:
+    """Deletes stored responses older than the key TTL."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=ttl())
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,355 @@
+# src/api/ingestion.py
+import pickle
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .analytics import apply_loan_changes, rebuild_portfolio_rollups, rollup_rows_for
+from .cache import invalidate_customers
+from .models import Customer, Loan
+from .partitions import is_partitioned, lock_loan_ids
+from .snapshots import invalidate_snapshots
+from .summaries import rebuild_loan_summaries
+from .utils import lock_customers
+
+# pandas and openpyxl are imported inside the functions that read files, so the
+# web tier and Celery autodiscovery never pay for them
+
+CHUNK_SIZE = 5000
+
+SHARD_SUFFIX = '.pkl'
+
+# Spreadsheet column -> model field
+CUSTOMER_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'First Name': 'first_name',
+    'Last Name': 'last_name',
+    'Phone Number': 'phone_number',
+    'Monthly Salary': 'monthly_salary',
+    'Approved Limit': 'approved_limit',
+}
+CUSTOMER_OPTIONAL_COLUMNS = {
+    'Age': 'age',
+    'Current Debt': 'current_debt',
+}
+LOAN_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'Loan ID': 'loan_id',
+    'Loan Amount': 'loan_amount',
+    'Tenure': 'tenure',
+    'Interest Rate': 'interest_rate',
+    'Monthly payment': 'monthly_repayment',
+    'EMIs paid on Time': 'emis_paid_on_time',
+    'Date of Approval': 'start_date',
+    'End Date': 'end_date',
+}
+
+
+@dataclass
+class IngestionReport:
+    """Row counts and timing for one ingestion run."""
+    rows: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    touched_ids: set = field(default_factory=set, repr=False)
+
+    @property
+    def loaded(self):
+        return self.rows - self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows, {self.loaded} loaded, {self.rejected} rejected "
+                f"in {self.seconds:.2f}s ({self.rows_per_second:.0f} rows/s)")
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Streams a .xlsx or .csv file as DataFrames of at most chunk_size rows. A
+    shard file written by split_file is streamed in the chunks it was written in.
+    """
+    import pandas as pd
+
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+    if path.suffix.lower() == SHARD_SUFFIX:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows)
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def count_rows(path) -> int:
+    """Counts the data rows (header excluded) of a .xlsx or .csv file."""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, 'rb') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        if sheet.max_row is None:
+            # No dimension record in the file, so the rows have to be walked
+            sheet.calculate_dimension(force=True)
+        return max(sheet.max_row - 1, 0)
+    finally:
+        workbook.close()
+
+
+def shard_of(ids, shards):
+    """
+    The shard of each id in a Series: id % shards, so every row of an id lands
+    in the same shard. Rows without a numeric id go to shard 0, to be rejected
+    exactly once.
+    """
+    import pandas as pd
+
+    return (pd.to_numeric(ids, errors='coerce').fillna(0) // 1 % shards).astype('int64')
+
+
+def split_file(path, column, shards, directory, chunk_size=CHUNK_SIZE):
+    """
+    Reads a .xlsx or .csv file once and writes its rows into one shard file per
+    shard by shard_of(column), in file order, so parallel shards never parse
+    the whole file again and the last row of an id still wins. Returns the
+    shard file paths, in shard order.
+
+    Shard files hold pickled DataFrames of about chunk_size rows each.
+    """
+    import pandas as pd
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = [directory / f'{Path(path).stem}-{index}{SHARD_SUFFIX}' for index in range(shards)]
+    buffers = [[] for _ in range(shards)]
+    files = [open(shard_path, 'wb') for shard_path in paths]
+
+    def flush(index):
+        pickle.dump(pd.concat(buffers[index]), files[index], protocol=pickle.HIGHEST_PROTOCOL)
+        buffers[index] = []
+
+    try:
+        for chunk in read_chunks(path, chunk_size):
+            for index, part in chunk.groupby(shard_of(chunk[column], shards), sort=False):
+                buffers[index].append(part)
+                if sum(len(buffered) for buffered in buffers[index]) >= chunk_size:
+                    flush(index)
+        for index in range(shards):
+            if buffers[index]:
+                flush(index)
+    finally:
+        for f in files:
+            f.close()
+    return [str(shard_path) for shard_path in paths]
+
+
+def _numeric(df, columns, integer=False):
+    import pandas as pd
+
+    for column in columns:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+        if integer:
+            # Fractional ids or counts are invalid, not something to truncate
+            df.loc[df[column] % 1 != 0, column] = float('nan')
+
+
+def _clean_customers(chunk):
+    import pandas as pd
+
+    columns = {**CUSTOMER_COLUMNS, **{k: v for k, v in CUSTOMER_OPTIONAL_COLUMNS.items() if k in chunk}}
+    df = chunk[list(columns)].rename(columns=columns)
+    _numeric(df, ['customer_id', 'phone_number', 'monthly_salary', 'approved_limit'], integer=True)
+    valid = df[list(CUSTOMER_COLUMNS.values())].notna().all(axis=1)
+
+    # A customer id listed more than once keeps its last row; the others count as rejected
+    df = df[valid].drop_duplicates('customer_id', keep='last').copy()
+    for column in ['customer_id', 'phone_number', 'monthly_salary', 'approved_limit']:
+        df[column] = df[column].astype('int64')
+    if 'age' in df:
+        df['age'] = pd.to_numeric(df['age'], errors='coerce').astype('Int64')
+    if 'current_debt' in df:
+        df['current_debt'] = pd.to_numeric(df['current_debt'], errors='coerce').fillna(0).astype('int64')
+    else:
+        df['current_debt'] = 0
+    return df, len(chunk) - len(df)
+
+
+def _clean_loans(chunk):
+    import pandas as pd
+
+    df = chunk[list(LOAN_COLUMNS)].rename(columns=LOAN_COLUMNS)
+    _numeric(df, ['customer_id', 'loan_id', 'tenure', 'emis_paid_on_time'], integer=True)
+    _numeric(df, ['loan_amount', 'interest_rate', 'monthly_repayment'])
+    for column in ['start_date', 'end_date']:
+        df[column] = pd.to_datetime(df[column], errors='coerce')
+    valid = df.notna().all(axis=1)
+
+    # Resolve customer existence with one set lookup per chunk
+    customer_ids = df.loc[valid, 'customer_id'].astype('int64').unique().tolist()
+    existing = set(Customer.objects.filter(pk__in=customer_ids).values_list('pk', flat=True))
+    valid &= df['customer_id'].isin(existing)
+
+    # A loan id listed more than once keeps its last row; the others count as rejected
+    df = df[valid].drop_duplicates('loan_id', keep='last').copy()
+    for column in ['customer_id', 'loan_id', 'tenure', 'emis_paid_on_time']:
+        df[column] = df[column].astype('int64')
+    for column in ['start_date', 'end_date']:
+        df[column] = df[column].dt.date
+    return df, len(chunk) - len(df)
+
+
+def reset_sequence(model):
+    """Moves the model's id sequence past the ids written explicitly by ingestion."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def upsert_loans(loans, update_fields, batch_size=1000):
+    """
+    Inserts new loans and updates the stored ones with the same loan_id.
+
+    A partitioned loan table has no unique index on loan_id alone for ON
+    CONFLICT to target, so there the stored ids are looked up first and the
+    two groups are written separately, under a lock that keeps concurrent
+    upserts from both inserting the same id.
+    """
+    if not is_partitioned():
+        Loan.objects.bulk_create(
+            loans, update_conflicts=True, unique_fields=['loan_id'], update_fields=update_fields,
+        )
+        return
+    with transaction.atomic():
+        lock_loan_ids()
+        stored = set(Loan.objects.filter(pk__in=[loan.loan_id for loan in loans]).values_list('loan_id', flat=True))
+        Loan.objects.bulk_update([loan for loan in loans if loan.loan_id in stored], update_fields, batch_size=batch_size)
+        Loan.objects.bulk_create([loan for loan in loans if loan.loan_id not in stored], batch_size=batch_size)
+
+
+def _records(df):
+    # None instead of pandas' NA markers, native Python scalars for the DB driver
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def ingest_customers(path, chunk_size=CHUNK_SIZE) -> IngestionReport:
+    """
+    Upserts customers from a spreadsheet in chunks with one bulk write per
+    chunk. Each chunk commits on its own, so a failure keeps every earlier
+    chunk whole and leaves nothing of the failed one.
+    """
+    report = IngestionReport()
+    started = time.perf_counter()
+    for chunk in read_chunks(path, chunk_size):
+        df, rejected = _clean_customers(chunk)
+        # Written in id order, so the row locks are taken in the order every other writer uses
+        df = df.sort_values('customer_id')
+        update_fields = [column for column in df.columns if column != 'customer_id']
+        customer_ids = df['customer_id'].tolist()
+        with transaction.atomic():
+            Customer.objects.bulk_create(
+                [Customer(**record) for record in _records(df)],
+                update_conflicts=True, unique_fields=['customer_id'], update_fields=update_fields,
+            )
+            # Approved limits may have changed, and with them the scores
+            invalidate_snapshots(customer_ids)
+            # Loan details embed the customer, so their cached copies go stale too
+            loan_ids = list(Loan.objects.filter(customer_id__in=customer_ids).values_list('loan_id', flat=True))
+            transaction.on_commit(partial(invalidate_customers, customer_ids, loan_ids))
+        report.rows += len(chunk)
+        # Ids loaded by an earlier chunk were just overwritten: that earlier row is rejected too
+        report.rejected += rejected + len(report.touched_ids.intersection(customer_ids))
+        report.touched_ids.update(customer_ids)
+    reset_sequence(Customer)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def ingest_loans(path, chunk_size=CHUNK_SIZE, rebuild_rollups=True) -> IngestionReport:
+    """
+    Upserts loans from a spreadsheet in chunks with one bulk write per chunk.
+
+    Rows for unknown customers are rejected. A loan id listed more than once
+    takes its last row in file order, and its other rows count as rejected.
+    Parallel shards load the shard files of split_file, so they never write
+    the same loan.
+
+    Each chunk commits on its own: its loans, their rollup deltas and the loan
+    summaries of the customers they touch are written in one transaction,
+    under a lock on those customers, so a failure keeps every earlier chunk
+    whole and leaves nothing of the failed one, and readers never see loans
+    without their summaries.
+
+    New loans are given an origination score only once the whole file is
+    loaded, from their customer's full loan book, so the score does not depend
+    on chunk size or shard order; re-ingested loans keep theirs. The portfolio
+    rollups are then rebuilt, unless rebuild_rollups=False (the caller does
+    both once every shard has loaded).
+    """
+    report = IngestionReport()
+    started = time.perf_counter()
+    loaded_ids = set()
+    for chunk in read_chunks(path, chunk_size):
+        df, rejected = _clean_loans(chunk)
+        loan_ids = df['loan_id'].tolist()
+        with transaction.atomic():
+            previous = rollup_rows_for(loan_ids)
+            # A re-ingested loan id may move to another customer; the previous owner needs a rebuild too
+            customer_ids = set(df['customer_id'].tolist())
+            customer_ids.update(row['customer_id'] for row in previous.values())
+            # Customers first, as loan creation does, then loans and rollups
+            lock_customers(customer_ids)
+
+            # Re-ingested loans keep their score; new ones are scored once every chunk is in
+            records = _records(df)
+            for record in records:
+                stored = previous.get(record['loan_id'])
+                record['origination_score'] = stored['origination_score'] if stored else None
+
+            upsert_loans(
+                [Loan(**record) for record in records],
+                [column for column in LOAN_COLUMNS.values() if column != 'loan_id'] + ['origination_score'],
+            )
+            apply_loan_changes(removed=previous.values(), added=records)
+            rebuild_loan_summaries(customer_ids)
+            transaction.on_commit(partial(invalidate_customers, customer_ids, loan_ids))
+        report.rows += len(chunk)
+        # As for customers, a loan id loaded by an earlier chunk was just overwritten
+        report.rejected += rejected + len(loaded_ids.intersection(loan_ids))
+        loaded_ids.update(loan_ids)
+        report.touched_ids.update(customer_ids)
+    reset_sequence(Loan)
+    if rebuild_rollups:
+        rebuild_portfolio_rollups()
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import (
+    environment,
+    run_connection_benchmarks,
+    run_endpoint_benchmarks,
+    run_micro_benchmarks,
+    run_partition_benchmarks,
+    run_response_benchmarks,
+    seed_synthetic_data,
+)
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset and benchmark the scoring code and every API endpoint, reporting JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help='Synthetic customers to seed.')
+        parser.add_argument('--loans-per-customer', type=int, default=5, help='Loans seeded per customer.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic dataset.')
+        parser.add_argument('--history-years', type=int, default=5, help='Years over which synthetic loans started.')
+        parser.add_argument('--iterations', type=int, default=1000, help='Calls per micro-benchmark.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint load test.')
+        parser.add_argument('--endpoint', action='append', help='Only load-test this endpoint (repeatable).')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+        parser.add_argument('--partitions', action='store_true',
+                            help='Also time active-loan aggregates on a partitioned loan table (PostgreSQL).')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the benchmark database between runs.')
+
+    def handle(self, *args, **options):
+        # Benchmarks run against a throwaway test database, never the real data
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = json.dumps(results, indent=4)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}."))
+        else:
+            self.stdout.write(report)
+
+    def run(self, options):
+        self.stderr.write(f"Seeding {options['customers']} customers x {options['loans_per_customer']} loans...")
+        customer_ids, loan_ids = seed_synthetic_data(
+            options['customers'], options['loans_per_customer'], seed=options['seed'],
+            history_years=options['history_years'],
+        )
+        self.stderr.write('Running micro-benchmarks...')
+        micro = run_micro_benchmarks(customer_ids, options['iterations'])
+        self.stderr.write('Running endpoint load tests...')
+        endpoints = run_endpoint_benchmarks(customer_ids, loan_ids, options['requests'], options['endpoint'])
+        self.stderr.write('Running response path benchmark...')
+        responses = run_response_benchmarks(customer_ids, loan_ids, options['iterations'], options['endpoint'])
+        self.stderr.write('Running connection reuse benchmark...')
+        connections = run_connection_benchmarks(customer_ids, options['requests'])
+        results = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'environment': environment(),
+            'dataset': {
+                'customers': options['customers'],
+                'loans_per_customer': options['loans_per_customer'],
+                'seed': options['seed'],
+                'history_years': options['history_years'],
+            },
+            'micro_benchmarks': micro,
+            'endpoints': endpoints,
+            'responses': responses,
+            'connections': connections,
+        }
+        if options['partitions']:
+            self.stderr.write('Running loan partitioning benchmark...')
+            results['partitions'] = run_partition_benchmarks(customer_ids, options['iterations'])
+        return results
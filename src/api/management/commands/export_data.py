@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_CHUNK_SIZE, STREAMERS, ExportError, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Export every loan joined with its customer, repayments_left and credit score as CSV, NDJSON or Parquet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(STREAMERS), default='csv', help='Output format.')
+        parser.add_argument('--output', help='File to write; defaults to stdout for csv and ndjson.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per cursor round trip.')
+
+    def handle(self, *args, **options):
+        file_format, output = options['format'], options['output']
+        if file_format == 'parquet' and not output:
+            raise CommandError('Parquet export needs --output')
+        try:
+            chunks = stream_export(file_format, options['chunk_size'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        binary = file_format == 'parquet'
+        if output:
+            with open(output, 'wb' if binary else 'w', newline=None if binary else '') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'Loans exported to {output}.'))
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
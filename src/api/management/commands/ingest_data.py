@@ -1,14 +1,45 @@
+import time
 from django.core.management.base import BaseCommand
-from api.tasks import ingest_customer_data, ingest_loan_data
+from api.models import IngestionJob
+from api.tasks import start_ingestion_job
 
 class Command(BaseCommand):
     help = 'Ingest customer and loan data from Excel files into the database via Celery.'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', default='customer_data.xlsx', help='Customer .xlsx or .csv file.')
+        parser.add_argument('--loans', default='loan_data.xlsx', help='Loan .xlsx or .csv file.')
+        parser.add_argument('--shards', type=int, default=4, help='Shards per phase: customers by customer id, loans by loan id.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk write.')
+        parser.add_argument('--wait', action='store_true', help='Poll the job and print progress until it finishes.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between progress polls.')
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting data ingestion...'))
 
-        # Queue the tasks to be executed by the Celery worker
-        ingest_customer_data.delay()
-        ingest_loan_data.delay()
+        job = IngestionJob.objects.create(
+            customer_file=options['customers'], loan_file=options['loans'],
+            shards=options['shards'], chunk_size=options['chunk_size'],
+        )
+        # Customers are sharded across workers first; loan shards start only after all of them finish
+        start_ingestion_job.delay(job.pk)
+        self.stdout.write(self.style.SUCCESS(f'Ingestion job {job.pk} has been queued.'))
+
+        if options['wait']:
+            self.wait_for(job, options['poll_interval'])
+
+    def wait_for(self, job, poll_interval):
+        while True:
+            job.refresh_from_db()
+            self.stdout.write(
+                f'[{job.status}] {job.processed_rows}/{job.total_rows} rows, '
+                f'{job.rejected_rows} rejected, {job.rows_per_second:.0f} rows/s'
+            )
+            if job.is_finished:
+                break
+            time.sleep(poll_interval)
 
-        self.stdout.write(self.style.SUCCESS('Data ingestion tasks have been queued.'))
\ No newline at end of file
+        if job.status == IngestionJob.FAILED:
+            self.stderr.write(self.style.ERROR(f'Ingestion job {job.pk} failed: {job.error}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Ingestion job {job.pk} completed.'))
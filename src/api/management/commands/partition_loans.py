@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from api.partitions import ensure_loan_partitions, loan_partitions, partition_loans, unpartition_loans
+
+
+class Command(BaseCommand):
+    help = 'Split the loan table into yearly end_date range partitions (PostgreSQL), or merge it back with --undo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--undo', action='store_true', help='Merge the partitions back into a single table.')
+        parser.add_argument('--status', action='store_true', help='Only list the partitions.')
+        parser.add_argument('--years-ahead', type=int, help='Years of partitions to create past the current one.')
+
+    def handle(self, *args, **options):
+        if options['undo']:
+            changed = unpartition_loans()
+            self.stdout.write(self.style.SUCCESS('Loan table merged.' if changed else 'Loan table is not partitioned.'))
+        elif not options['status']:
+            try:
+                changed = partition_loans(options['years_ahead'])
+            except NotSupportedError as exc:
+                raise CommandError(str(exc))
+            if not changed:
+                created = ensure_loan_partitions(options['years_ahead'])
+                self.stdout.write(f'Loan table already partitioned; created {len(created)} new partitions.')
+            else:
+                self.stdout.write(self.style.SUCCESS('Loan table partitioned.'))
+        for partition in loan_partitions():
+            self.stdout.write(f"{partition['name']}: {partition['bounds']} (~{partition['estimated_rows']} rows)")
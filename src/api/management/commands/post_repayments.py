@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingestion import CHUNK_SIZE
+from api.repayments import post_repayment_file
+
+
+class Command(BaseCommand):
+    help = 'Post a repayment file (.xlsx or .csv) to the repayment ledger in set-based batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Repayment file with Loan ID, Amount, Payment Date and optional EMI Number columns.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows posted per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            report = post_repayment_file(options['path'], options['chunk_size'])
+        except (OSError, KeyError) as exc:
+            raise CommandError(f"Could not read {options['path']}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f'Repayments posted: {report}.'))
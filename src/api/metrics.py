@@ -0,0 +1,208 @@
+# src/api/metrics.py
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """A cumulative Prometheus-style histogram with one series per label set."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            counts, total = self._series.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[key] = (counts, total + value)
+
+    def samples(self):
+        """Yields (labels, [(le, cumulative count)], sum, count) per series."""
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                cumulative.append((bound, running))
+            yield dict(zip(self.label_names, key)), cumulative, total, running
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """A Prometheus-style counter with one value per label set."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield dict(zip(self.label_names, key)), value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+REQUESTS = Counter('api_requests_total', 'Requests handled, by endpoint, method and status.',
+                   ('endpoint', 'method', 'status'))
+REQUEST_DURATION = Histogram('api_request_duration_seconds', 'Total time spent handling a request.',
+                             ('endpoint',))
+DB_DURATION = Histogram('api_db_duration_seconds', 'Time spent in SQL queries per request.', ('endpoint',))
+DB_QUERIES = Histogram('api_db_queries_per_request', 'SQL queries issued per request.', ('endpoint',),
+                       buckets=QUERY_COUNT_BUCKETS)
+PHASE_DURATION = Histogram('api_phase_duration_seconds', 'Time spent in instrumented phases of a request.',
+                           ('endpoint', 'phase'))
+
+METRICS = (REQUESTS, REQUEST_DURATION, DB_DURATION, DB_QUERIES, PHASE_DURATION)
+
+
+class RequestTimings:
+    """What one request spent its time on; collected while the request runs."""
+
+    def __init__(self, capture_sql=False):
+        self.capture_sql = capture_sql
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.phases = {}
+        self.queries = []
+
+    def record_query(self, sql, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        if self.capture_sql:
+            self.queries.append((sql, seconds))
+
+    def record_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# A context variable rather than a thread local, so timings follow async views
+# into the threads sync_to_async runs their ORM calls in
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+
+def query_timer(execute, sql, params, many, context):
+    """A database execute wrapper that charges each query to the current request."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver that adds query_timer to every new connection."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+@contextmanager
+def timed(phase):
+    """Times a block as a named phase of the current request, if there is one."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record_phase(phase, time.perf_counter() - started)
+
+
+def timed_function(phase):
+    """Decorator form of timed()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_request(endpoint, method, status, total_seconds, timings):
+    REQUESTS.inc(endpoint=endpoint, method=method, status=str(status))
+    REQUEST_DURATION.observe(total_seconds, endpoint=endpoint)
+    DB_DURATION.observe(timings.db_seconds, endpoint=endpoint)
+    DB_QUERIES.observe(timings.query_count, endpoint=endpoint)
+    for phase, seconds in timings.phases.items():
+        PHASE_DURATION.observe(seconds, endpoint=endpoint, phase=phase)
+
+
+def server_timing(total_seconds, timings):
+    """Builds a Server-Timing header value; durations are in milliseconds."""
+    entries = [f'db;dur={timings.db_seconds * 1000:.2f};desc="{timings.query_count} queries"']
+    entries += [f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in timings.phases.items()]
+    entries.append(f'total;dur={total_seconds * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def render_prometheus():
+    """Renders every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+        lines += [f'# HELP {metric.name} {metric.help_text}', f'# TYPE {metric.name} {kind}']
+        if kind == 'counter':
+            lines += [f'{metric.name}{_format_labels(labels)} {value}' for labels, value in metric.samples()]
+            continue
+        for labels, buckets, total, count in metric.samples():
+            for bound, cumulative in buckets:
+                bucket_labels = {**labels, 'le': _format_bound(bound)}
+                lines.append(f'{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.reset()
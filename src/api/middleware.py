@@ -0,0 +1,120 @@
+# src/api/middleware.py
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-endpoint latency, SQL query count and SQL time into the
+    in-process histograms behind /metrics, adds a Server-Timing header, and
+    logs requests slower than SLOW_REQUEST_THRESHOLD_MS together with their SQL.
+
+    Streaming responses do most of their work after the view returns, so they
+    are timed until their content is exhausted or closed. Their headers go out
+    before that, so they carry no Server-Timing header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    @property
+    def slow_threshold(self):
+        return getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+
+    def start(self):
+        # SQL text is only kept when the slow-request log may need it
+        timings = metrics.RequestTimings(capture_sql=self.slow_threshold is not None)
+        return timings, metrics.current_timings.set(timings), time.perf_counter()
+
+    def finish(self, request, response, timings, started):
+        if response.streaming:
+            if response.is_async:
+                timed = self.timed_astream(request, response, aiter(response.streaming_content), timings, started)
+            else:
+                timed = self.timed_stream(request, response, iter(response.streaming_content), timings, started)
+            response.streaming_content = timed
+            return response
+        total = self.record(request, response, timings, started)
+        response['Server-Timing'] = metrics.server_timing(total, timings)
+        return response
+
+    def timed_stream(self, request, response, content, timings, started):
+        try:
+            while True:
+                # Chunks may be produced in other threads or contexts, so charge each one explicitly
+                token = metrics.current_timings.set(timings)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    break
+                finally:
+                    metrics.current_timings.reset(token)
+                yield chunk
+        finally:
+            self.record(request, response, timings, started)
+
+    async def timed_astream(self, request, response, content, timings, started):
+        try:
+            while True:
+                token = metrics.current_timings.set(timings)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    metrics.current_timings.reset(token)
+                yield chunk
+        finally:
+            self.record(request, response, timings, started)
+
+    def record(self, request, response, timings, started):
+        """Records the finished request in the metrics and the slow-request log; returns its duration."""
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        # Route names keep the label set bounded; unmatched paths share one series
+        endpoint = (match.url_name or match.route) if match else 'unmatched'
+        metrics.observe_request(endpoint, request.method, response.status_code, total, timings)
+
+        threshold = self.slow_threshold
+        if threshold is not None and total * 1000 >= threshold:
+            self.log_slow_request(request, response, total, timings)
+        return total
+
+    @staticmethod
+    def log_slow_request(request, response, total, timings):
+        statements = '\n'.join(f'  [{seconds * 1000:.2f}ms] {sql}' for sql, seconds in timings.queries)
+        slow_request_logger.warning(
+            'Slow request %s %s -> %s in %.1fms (%d queries, %.1fms in SQL)\n%s',
+            request.method, request.path, response.status_code, total * 1000,
+            timings.query_count, timings.db_seconds * 1000, statements,
+        )
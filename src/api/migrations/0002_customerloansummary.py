@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerLoanSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_summary', serialize=False, to='api.customer')),
+                ('active_emi_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('active_principal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('active_loan_count', models.IntegerField(default=0)),
+                ('closed_loan_count', models.IntegerField(default=0)),
+                ('late_loan_count', models.IntegerField(default=0)),
+                ('next_rollover', models.DateField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_customerloansummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_file', models.CharField(max_length=255)),
+                ('loan_file', models.CharField(max_length=255)),
+                ('shards', models.IntegerField(default=1)),
+                ('chunk_size', models.IntegerField(default=5000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('customers', 'Ingesting customers'), ('loans', 'Ingesting loans'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('total_rows', models.IntegerField(default=0)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('rejected_rows', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'end_date'], include=['loan_id', 'loan_amount', 'monthly_repayment', 'tenure', 'emis_paid_on_time'], name='loan_customer_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'loan_id'], name='loan_customer_loan_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='loan',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='loans', to='api.customer'),
+        ),
+        migrations.AlterField(
+            model_name='customerloansummary',
+            name='next_rollover',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
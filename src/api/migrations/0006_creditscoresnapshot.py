@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditScoreSnapshot',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_score_snapshot', serialize=False, to='api.customer')),
+                ('credit_score', models.IntegerField()),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('valid_until', models.DateField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_creditscoresnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='origination_score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PortfolioRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_tier', models.CharField(max_length=16)),
+                ('rate_band', models.CharField(max_length=16)),
+                ('tenure_bucket', models.CharField(max_length=16)),
+                ('origination_month', models.DateField()),
+                ('loan_count', models.IntegerField(default=0)),
+                ('total_principal', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_monthly_repayment', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('score_tier', 'rate_band', 'tenure_bucket', 'origination_month'), name='portfolio_rollup_slice_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_portfolio_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Repayment',
+            fields=[
+                ('repayment_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('installment_number', models.IntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paid_on', models.DateField()),
+                ('due_date', models.DateField()),
+                ('on_time', models.BooleanField()),
+                ('principal_repaid', models.IntegerField()),
+                ('posted_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='repayments', to='api.loan')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('loan', 'installment_number'), name='repayment_loan_installment_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,121 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations
+
+# A frozen copy of the conversion in api/partitions.py as it stood when this
+# migration was written; later changes there must not change what it does.
+
+PARTITION_KEY = 'end_date'
+FK_SUFFIX = '_fk_%(to_table)s_%(to_column)s'
+
+
+def is_partitioned(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [table]
+        )
+        return cursor.fetchone()[0]
+
+
+def swap_table(schema_editor, table, staging):
+    quote = schema_editor.quote_name
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    schema_editor.execute(f'INSERT INTO {quote(staging)} SELECT * FROM {quote(table)}')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = to_regclass(%s) AND conrelid <> confrelid",
+            [table],
+        )
+        references = cursor.fetchall()
+    for referencing_table, name in references:
+        schema_editor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT {quote(name)}')
+    schema_editor.execute(f'DROP TABLE {quote(table)}')
+    schema_editor.execute(f'ALTER TABLE {quote(staging)} RENAME TO {quote(table)}')
+    schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def restore_table(schema_editor, model):
+    table, pk = model._meta.db_table, model._meta.pk.column
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT setval(pg_get_serial_sequence(%s, %s), coalesce(max({quote(pk)}), 1), '
+            f'max({quote(pk)}) IS NOT NULL) FROM {quote(table)}',
+            [quote(table), pk],
+        )
+    for field in model._meta.local_concrete_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, FK_SUFFIX))
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+    schema_editor.execute(f'ANALYZE {quote(table)}')
+
+
+def partition_loans(apps, schema_editor):
+    # Opt-in: a partitioned loan table drops database-level uniqueness of loan_id
+    if not settings.LOAN_PARTITIONING or schema_editor.connection.vendor != 'postgresql':
+        return
+    Loan = apps.get_model('api', 'Loan')
+    table, pk = Loan._meta.db_table, Loan._meta.pk.column
+    if is_partitioned(schema_editor, table):
+        return
+    quote = schema_editor.quote_name
+    staging = f'{table}_partitioned'
+    today = date.today()
+    ahead = getattr(settings, 'LOAN_PARTITION_YEARS_AHEAD', 5)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT min({PARTITION_KEY}) FROM {quote(table)}')
+        first = cursor.fetchone()[0]
+
+    schema_editor.execute(f'CREATE TABLE {quote(staging)} (LIKE {quote(table)}) PARTITION BY RANGE ({PARTITION_KEY})')
+    for year in range(min(first.year if first else today.year, today.year), today.year + ahead + 1):
+        schema_editor.execute(
+            f"CREATE TABLE {quote(f'{table}_p{year}')} PARTITION OF {quote(staging)} "
+            f"FOR VALUES FROM ('{date(year, 1, 1).isoformat()}') TO ('{date(year + 1, 1, 1).isoformat()}')"
+        )
+    schema_editor.execute(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {quote(staging)} DEFAULT")
+    swap_table(schema_editor, table, staging)
+
+    sequence = f'{table}_{pk}_seq'
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk)}, {PARTITION_KEY})')
+    schema_editor.execute(f'CREATE SEQUENCE {quote(sequence)} AS integer OWNED BY {quote(table)}.{quote(pk)}')
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} SET DEFAULT nextval('{sequence}')")
+    restore_table(schema_editor, Loan)
+
+
+def unpartition_loans(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Loan = apps.get_model('api', 'Loan')
+    table, pk = Loan._meta.db_table, Loan._meta.pk.column
+    if not is_partitioned(schema_editor, table):
+        return
+    quote = schema_editor.quote_name
+    staging = f'{table}_unpartitioned'
+
+    schema_editor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+    schema_editor.execute(f'CREATE TABLE {quote(staging)} (LIKE {quote(table)})')
+    swap_table(schema_editor, table, staging)
+
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk)})')
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} ADD GENERATED BY DEFAULT AS IDENTITY')
+    restore_table(schema_editor, Loan)
+    for relation in Loan._meta.related_objects:
+        field = relation.field
+        if field.concrete and field.db_constraint and not relation.many_to_many:
+            schema_editor.execute(schema_editor._create_fk_sql(field.model, field, FK_SUFFIX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_repayment'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_loans, unpartition_loans),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Customer(models.Model):
     customer_id = models.AutoField(primary_key=True)
@@ -16,7 +17,8 @@ class Customer(models.Model):
 
 class Loan(models.Model):
     loan_id = models.AutoField(primary_key=True)
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans')
+    # Indexed through the composite indexes below, which all lead with customer
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans', db_index=False)
     loan_amount = models.DecimalField(max_digits=12, decimal_places=2)
     tenure = models.IntegerField()
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
@@ -24,6 +26,165 @@ class Loan(models.Model):
     emis_paid_on_time = models.IntegerField()
     start_date = models.DateField()
     end_date = models.DateField()
+    # The customer's credit score when the loan was booked (or first ingested);
+    # fixes the loan's score tier in the portfolio rollups
+    origination_score = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Covers the active/closed loan aggregates behind credit scores and
+            # loan summaries, so they are answered by index-only scans
+            models.Index(
+                fields=['customer', 'end_date'],
+                include=['loan_id', 'loan_amount', 'monthly_repayment', 'tenure', 'emis_paid_on_time'],
+                name='loan_customer_end_date_idx',
+            ),
+            # Keyset pagination of a customer's loans
+            models.Index(fields=['customer', 'loan_id'], name='loan_customer_loan_id_idx'),
+        ]
+
+    def __str__(self):
+        # customer_id avoids loading the customer row just to render the loan
+        return f"Loan ID: {self.loan_id} for customer {self.customer_id}"
+
+class CustomerLoanSummary(models.Model):
+    """Per-customer loan aggregates, maintained on loan writes so eligibility is a single-row read."""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='loan_summary')
+    active_emi_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    active_principal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    active_loan_count = models.IntegerField(default=0)
+    closed_loan_count = models.IntegerField(default=0)
+    late_loan_count = models.IntegerField(default=0)
+    # Earliest end_date among active loans; once it passes, a loan has rolled to closed
+    next_rollover = models.DateField(null=True, blank=True, db_index=True)
+
+    def is_stale(self, today):
+        return self.next_rollover is not None and self.next_rollover < today
+
+    def __str__(self):
+        return f"Loan summary for customer {self.customer_id}"
+
+
+class CreditScoreSnapshot(models.Model):
+    """A precomputed credit score, read instead of scoring live while it is fresh."""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_score_snapshot')
+    credit_score = models.IntegerField()
+    computed_at = models.DateTimeField(db_index=True)
+    # Earliest end_date among active loans at computation time; the score changes the day after
+    valid_until = models.DateField(null=True, blank=True, db_index=True)
+
+    def is_fresh(self, now, max_age, today):
+        return (
+            (now - self.computed_at).total_seconds() <= max_age
+            and (self.valid_until is None or self.valid_until >= today)
+        )
+
+    def __str__(self):
+        return f"Credit score snapshot for customer {self.customer_id}"
+
+
+class PortfolioRollup(models.Model):
+    """Loan exposure totals for one slice of the portfolio, maintained as loans are written."""
+    score_tier = models.CharField(max_length=16)
+    rate_band = models.CharField(max_length=16)
+    tenure_bucket = models.CharField(max_length=16)
+    origination_month = models.DateField()
+    loan_count = models.IntegerField(default=0)
+    total_principal = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_monthly_repayment = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['score_tier', 'rate_band', 'tenure_bucket', 'origination_month'],
+                name='portfolio_rollup_slice_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.score_tier} / {self.rate_band} / {self.tenure_bucket} / {self.origination_month:%Y-%m}"
+
+
+class Repayment(models.Model):
+    """One EMI paid against a loan. The ledger is append-only: rows are never updated."""
+    repayment_id = models.BigAutoField(primary_key=True)
+    # Indexed through the unique constraint below, which leads with loan
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayments', db_index=False)
+    installment_number = models.IntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    paid_on = models.DateField()
+    due_date = models.DateField()
+    # Paid in full by the due date; counted in the loan's emis_paid_on_time
+    on_time = models.BooleanField()
+    # Whole units of principal this installment took off the customer's current_debt
+    principal_repaid = models.IntegerField()
+    posted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'installment_number'], name='repayment_loan_installment_unique'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Repayments are append-only and cannot be changed once posted.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Repayment {self.installment_number} of loan {self.loan_id}"
+
+
+class IngestionJob(models.Model):
+    """Tracks a sharded spreadsheet ingestion run across Celery workers."""
+    PENDING = 'pending'
+    CUSTOMERS = 'customers'
+    LOANS = 'loans'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (CUSTOMERS, 'Ingesting customers'),
+        (LOANS, 'Ingesting loans'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    customer_file = models.CharField(max_length=255)
+    loan_file = models.CharField(max_length=255)
+    shards = models.IntegerField(default=1)
+    chunk_size = models.IntegerField(default=5000)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    rejected_rows = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0.0
+        seconds = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return self.processed_rows / seconds if seconds else 0.0
+
+    def __str__(self):
+        return f"Ingestion job {self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """A stored create-loan response, replayed for retries carrying the same Idempotency-Key."""
+    key = models.CharField(max_length=255, primary_key=True)
+    # SHA-256 of the request payload; a key may only be reused for the same request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.IntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
-        return f"Loan ID: {self.loan_id} for {self.customer.first_name}"
\ No newline at end of file
+        return f"Idempotency key {self.key}"
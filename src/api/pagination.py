@@ -0,0 +1,36 @@
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Keyset pagination on loan_id for the loan list endpoint.
+
+    Opt-in: requests without a cursor or page_size keep the plain list response,
+    capped at max_page_size loans (see capped_list).
+    """
+    ordering = 'loan_id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def capped_list(self, rows, request):
+        """
+        Caps a plain list response at max_page_size loans. rows are the first
+        max_page_size + 1 loans in loan_id order; returns (rows, headers), with
+        a Link header to the keyset page after the last loan kept when some
+        were cut off.
+        """
+        if len(rows) <= self.max_page_size:
+            return rows, {}
+        rows = rows[:self.max_page_size]
+        self.base_url = replace_query_param(
+            request.build_absolute_uri(), self.page_size_query_param, self.max_page_size
+        )
+        link = self.encode_cursor(Cursor(offset=0, reverse=False, position=str(rows[-1]['loan_id'])))
+        return rows, {'Link': f'<{link}>; rel="next"'}
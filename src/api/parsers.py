@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def loads(data):
+    """Decodes one JSON document (UTF-8 bytes or str); raises ValueError if it is invalid."""
+    return json.loads(data) if orjson is None else orjson.loads(data)
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser that decodes UTF-8 bodies with orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline-delimited JSON into a list with one item per non-blank line."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line.decode(encoding)))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {number} - {exc}')
+        return items
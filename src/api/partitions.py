@@ -0,0 +1,238 @@
+# src/api/partitions.py
+"""
+Optional range partitioning of the loan table by end_date (PostgreSQL only).
+
+A partitioned api_loan has one partition per calendar year of end_date plus a
+default partition for end dates outside those years. Queries that filter on
+end_date >= today (active loans) skip every partition of closed loans.
+
+PostgreSQL requires the partition key in every unique index, so the primary
+key becomes (loan_id, end_date): loan ids still come from a sequence but are
+no longer unique at the database level, and foreign keys to the loan table
+(the repayment ledger's) are enforced by the ORM only while it is partitioned.
+"""
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db import NotSupportedError, connection
+
+from .models import Loan
+
+PARTITION_KEY = 'end_date'
+
+DEFAULT_YEARS_AHEAD = 5
+
+
+def years_ahead() -> int:
+    """Years of partitions kept ready past the current one."""
+    return getattr(settings, 'LOAN_PARTITION_YEARS_AHEAD', DEFAULT_YEARS_AHEAD)
+
+
+def partition_name(year, table=Loan._meta.db_table):
+    return f'{table}_p{year}'
+
+
+def default_partition_name(table=Loan._meta.db_table):
+    return f'{table}_default'
+
+
+def is_partitioned(model=Loan, using=None) -> bool:
+    using = using or connection
+    if using.vendor != 'postgresql':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+            [model._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def lock_loan_ids():
+    """
+    Holds an advisory lock until the end of the transaction that serializes
+    writers choosing between inserting and updating loans by id. With no
+    unique index on loan_id, two of them could otherwise both insert an id.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'{Loan._meta.db_table}.loan_id'])
+
+
+def loan_partitions(model=Loan):
+    """Lists the partitions of the loan table with their bounds and estimated row counts."""
+    if not is_partitioned(model):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), greatest(c.reltuples, 0)::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+            """,
+            [model._meta.db_table],
+        )
+        return [{'name': name, 'bounds': bounds, 'estimated_rows': rows} for name, bounds, rows in cursor.fetchall()]
+
+
+def _year_bounds(year):
+    return f"FOR VALUES FROM ('{date(year, 1, 1).isoformat()}') TO ('{date(year + 1, 1, 1).isoformat()}')"
+
+
+def _swap_table(schema_editor, model, staging):
+    """Copies every row into staging, then drops the table and renames staging to take its place."""
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+    # Rows written earlier in the transaction must pass their deferred checks before the table can change
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    schema_editor.execute(f'INSERT INTO {quote(staging)} SELECT * FROM {quote(table)}')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = to_regclass(%s) AND conrelid <> confrelid",
+            [table],
+        )
+        references = cursor.fetchall()
+    for referencing_table, name in references:
+        schema_editor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT {quote(name)}')
+    schema_editor.execute(f'DROP TABLE {quote(table)}')
+    schema_editor.execute(f'ALTER TABLE {quote(staging)} RENAME TO {quote(table)}')
+    schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def _restore_table(schema_editor, model):
+    """Moves the id sequence past the copied rows and recreates the model's foreign keys and indexes."""
+    table, pk = model._meta.db_table, model._meta.pk.column
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT setval(pg_get_serial_sequence(%s, %s), coalesce(max({quote(pk)}), 1), '
+            f'max({quote(pk)}) IS NOT NULL) FROM {quote(table)}',
+            [quote(table), pk],
+        )
+    for field in model._meta.local_concrete_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+    # The copies have no planner statistics yet, and autovacuum never analyzes a partitioned parent
+    schema_editor.execute(f'ANALYZE {quote(table)}')
+
+
+def partition_table(schema_editor, model=Loan, ahead=None, today=None) -> bool:
+    """
+    Rebuilds the loan table as yearly end_date range partitions, covering the
+    stored loans and `ahead` years past today. Returns False if it already is.
+
+    Runs under an exclusive lock and copies every row, so large books should be
+    converted in a maintenance window.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        raise NotSupportedError('Loan partitioning requires PostgreSQL.')
+    if is_partitioned(model, schema_editor.connection):
+        return False
+    ahead = years_ahead() if ahead is None else ahead
+    today = today or date.today()
+    table, pk = model._meta.db_table, model._meta.pk.column
+    quote = schema_editor.quote_name
+    staging = f'{table}_partitioned'
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT min({PARTITION_KEY}) FROM {quote(table)}')
+        first = cursor.fetchone()[0]
+
+    schema_editor.execute(f'CREATE TABLE {quote(staging)} (LIKE {quote(table)}) PARTITION BY RANGE ({PARTITION_KEY})')
+    for year in range(min(first.year if first else today.year, today.year), today.year + ahead + 1):
+        schema_editor.execute(
+            f'CREATE TABLE {quote(partition_name(year, table))} PARTITION OF {quote(staging)} {_year_bounds(year)}'
+        )
+    schema_editor.execute(f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(staging)} DEFAULT')
+    _swap_table(schema_editor, model, staging)
+
+    # Identity columns cannot be added to a partitioned table; an owned sequence works the same
+    sequence = f'{table}_{pk}_seq'
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk)}, {PARTITION_KEY})')
+    schema_editor.execute(f'CREATE SEQUENCE {quote(sequence)} AS integer OWNED BY {quote(table)}.{quote(pk)}')
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} SET DEFAULT nextval('{sequence}')")
+    _restore_table(schema_editor, model)
+    return True
+
+
+def unpartition_table(schema_editor, model=Loan) -> bool:
+    """Rebuilds a partitioned loan table as a single table. Returns False if it is not partitioned."""
+    if not is_partitioned(model, schema_editor.connection):
+        return False
+    table, pk = model._meta.db_table, model._meta.pk.column
+    quote = schema_editor.quote_name
+    staging = f'{table}_unpartitioned'
+
+    schema_editor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+    schema_editor.execute(f'CREATE TABLE {quote(staging)} (LIKE {quote(table)})')
+    _swap_table(schema_editor, model, staging)
+
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk)})')
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} ADD GENERATED BY DEFAULT AS IDENTITY')
+    _restore_table(schema_editor, model)
+    # Foreign keys to the loan table, dropped while it was partitioned
+    for relation in model._meta.related_objects:
+        field = relation.field
+        if field.concrete and field.db_constraint and not relation.many_to_many:
+            schema_editor.execute(schema_editor._create_fk_sql(field.model, field, '_fk_%(to_table)s_%(to_column)s'))
+    return True
+
+
+def partition_loans(ahead=None, today=None) -> bool:
+    with connection.schema_editor() as schema_editor:
+        return partition_table(schema_editor, Loan, ahead, today)
+
+
+def unpartition_loans() -> bool:
+    with connection.schema_editor() as schema_editor:
+        return unpartition_table(schema_editor, Loan)
+
+
+def ensure_loan_partitions(ahead=None, today=None):
+    """
+    Creates the yearly partitions for this year and `ahead` years after it that
+    do not exist yet, moving any of their loans out of the default partition.
+    Does nothing unless the loan table is partitioned. Returns the new partitions.
+    """
+    if not is_partitioned():
+        return []
+    ahead = years_ahead() if ahead is None else ahead
+    today = today or date.today()
+    existing = {partition['name'] for partition in loan_partitions()}
+    table = Loan._meta.db_table
+
+    created = []
+    for year in range(today.year, today.year + ahead + 1):
+        name = partition_name(year)
+        if name in existing:
+            continue
+        with connection.schema_editor() as schema_editor:
+            quote = schema_editor.quote_name
+            schema_editor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(table)})')
+            # A partition cannot be added while the default partition holds rows in its range
+            schema_editor.execute(
+                f'WITH moved AS (DELETE FROM {quote(default_partition_name())} '
+                f'WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s RETURNING *) '
+                f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                [date(year, 1, 1), date(year + 1, 1, 1)],
+            )
+            schema_editor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} {_year_bounds(year)}')
+        created.append(name)
+    return created
+
+
+def scanned_relations(queryset):
+    """Names the tables and partitions PostgreSQL's plan for the queryset reads."""
+    def walk(node):
+        if 'Relation Name' in node:
+            yield node['Relation Name']
+        for child in node.get('Plans', ()):
+            yield from walk(child)
+
+    plan = json.loads(queryset.explain(format='json'))
+    return sorted(set(walk(plan[0]['Plan'])))
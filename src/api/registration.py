@@ -0,0 +1,111 @@
+# src/api/registration.py
+import numpy as np
+from django.db import DatabaseError, transaction
+
+from .models import Customer
+from .serializers import CustomerBatchItemSerializer
+
+# Column ranges the ModelSerializer would enforce for these fields on PostgreSQL
+INT_RANGE = (-2**31, 2**31 - 1)
+BIGINT_RANGE = (-2**63, 2**63 - 1)
+
+DUPLICATE_PHONE_ERROR = {'phone_number': ['customer with this phone number already exists.']}
+
+
+def approved_limits(monthly_salaries) -> np.ndarray:
+    """36x the monthly salary rounded to the nearest lakh, element-wise like CustomerSerializer.create."""
+    salaries = np.asarray(monthly_salaries, dtype=np.float64)
+    return (np.round(36 * salaries / 100000) * 100000).astype(np.int64)
+
+
+def _is_name(value):
+    # Non-empty, untrimmed-free strings pass CharField validation unchanged
+    return type(value) is str and 0 < len(value) <= 255 and value == value.strip()
+
+
+def _is_int(value, bounds):
+    return type(value) is int and bounds[0] <= value <= bounds[1]
+
+
+def validate(item):
+    """
+    Returns the validated fields of one registration, or {'errors': ...} with
+    exactly the errors /register would report (apart from phone uniqueness,
+    which is checked per chunk).
+    """
+    if type(item) is dict and set(item) <= {'first_name', 'last_name', 'age', 'monthly_salary', 'phone_number'}:
+        age = item.get('age')
+        if (_is_name(item.get('first_name')) and _is_name(item.get('last_name'))
+                and (age is None or _is_int(age, INT_RANGE))
+                and _is_int(item.get('monthly_salary'), INT_RANGE)
+                and _is_int(item.get('phone_number'), BIGINT_RANGE)):
+            return {
+                'first_name': item['first_name'], 'last_name': item['last_name'], 'age': age,
+                'monthly_salary': item['monthly_salary'], 'phone_number': item['phone_number'],
+            }
+
+    serializer = CustomerBatchItemSerializer(data=item)
+    if not serializer.is_valid():
+        return {'errors': serializer.errors}
+    return {'age': None, **serializer.validated_data}
+
+
+def response_data(customer):
+    """The /register response body for a created customer."""
+    return {
+        'customer_id': customer.customer_id,
+        'name': f"{customer.first_name} {customer.last_name}",
+        'age': customer.age,
+        'monthly_income': customer.monthly_salary,
+        'approved_limit': customer.approved_limit,
+        'phone_number': customer.phone_number,
+    }
+
+
+def register_customers(items) -> list:
+    """
+    Registers a chunk of customers with one duplicate-phone query and one bulk
+    insert. Returns one result per item, in order: the /register response body,
+    or {'errors': ...}. Phone numbers already registered, or repeated earlier in
+    the chunk, are rejected like /register rejects them.
+    """
+    validated = [validate(item) for item in items]
+    phones = [row['phone_number'] for row in validated if 'errors' not in row]
+    taken = set(Customer.objects.filter(phone_number__in=phones).values_list('phone_number', flat=True))
+
+    results, pending = [None] * len(items), []
+    for index, row in enumerate(validated):
+        if 'errors' in row:
+            results[index] = row
+        elif row['phone_number'] in taken:
+            results[index] = {'errors': DUPLICATE_PHONE_ERROR}
+        else:
+            taken.add(row['phone_number'])
+            pending.append(index)
+
+    limits = approved_limits([validated[index]['monthly_salary'] for index in pending]).tolist()
+    customers = [Customer(**validated[index], approved_limit=limit) for index, limit in zip(pending, limits)]
+    try:
+        with transaction.atomic():
+            Customer.objects.bulk_create(customers)
+    except DatabaseError:
+        # A concurrent registration took a phone number, or a value overflowed its
+        # column; insert one by one so only the offending rows fail
+        for customer in customers:
+            customer.pk = None
+        customers = [_insert_one(customer) for customer in customers]
+
+    for index, customer in zip(pending, customers):
+        results[index] = response_data(customer) if isinstance(customer, Customer) else customer
+    return results
+
+
+def _insert_one(customer):
+    try:
+        with transaction.atomic():
+            customer.save(force_insert=True)
+        return customer
+    except DatabaseError:
+        if Customer.objects.filter(phone_number=customer.phone_number).exists():
+            return {'errors': DUPLICATE_PHONE_ERROR}
+        return {'errors': {'non_field_errors': ['Customer could not be stored.']}}
@@ -0,0 +1,83 @@
+# src/api/renderers.py
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# Kept as escapes, like DRF, so the output stays a strict JavaScript subset
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _json_float(value):
+    """True if orjson writes the float exactly as json.dumps does: finite and not in exponent form."""
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def _has_odd_floats(data):
+    """True if data holds a float that only the standard library encodes like DRF."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not _json_float(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def dumps(data):
+    """Encodes data as compact UTF-8 JSON bytes, exactly as the API renders it."""
+    return _renderer.render(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson.
+
+    Output matches JSONRenderer byte for byte for API data: compact separators,
+    unescaped unicode and DRF's encoding of dates, times and decimals. Indented
+    output (the browsable API, ?indent=) is left to JSONRenderer, and so is data
+    holding a NaN or infinity (which DRF rejects) or a float json.dumps writes
+    in exponent form (1e+16, 1e-05), which orjson spells differently.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if _has_odd_floats(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default(), option=self.options)
+        except orjson.JSONEncodeError:
+            # Integers wider than 64 bits and other values only the standard library handles
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in _LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+    def _default(self):
+        encode = self.encoder_class().default
+
+        def default(value):
+            encoded = encode(value)
+            # Floats the encoder converts to (decimals, unless coerced to strings) get the same check
+            if isinstance(encoded, float) and not _json_float(encoded):
+                raise TypeError(f'{encoded!r} is left to the standard library encoder')
+            return encoded
+        return default
+
+
+_renderer = ORJSONRenderer()
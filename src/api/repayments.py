@@ -0,0 +1,356 @@
+# src/api/repayments.py
+import math
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import serializers
+
+from . import cache
+from .finance import CENT, outstanding_balances, to_money
+from .ingestion import CHUNK_SIZE, IngestionReport, read_chunks
+from .models import Customer, CustomerLoanSummary, Loan, Repayment
+from .serializers import RepaymentBatchItemSerializer
+from .snapshots import invalidate_snapshots
+
+# Days between installments, as create-loan sets end_date from the tenure
+INSTALLMENT_DAYS = 30
+MAX_AMOUNT = Decimal(10) ** 10
+
+# Spreadsheet column -> repayment field; EMI Number is optional
+REPAYMENT_COLUMNS = {
+    'Loan ID': 'loan_id',
+    'EMI Number': 'installment_number',
+    'Amount': 'amount',
+    'Payment Date': 'paid_on',
+}
+
+LOAN_NOT_FOUND_ERROR = {'loan_id': ['Loan not found.']}
+DUPLICATE_INSTALLMENT_ERROR = {'installment_number': ['This installment has already been paid.']}
+FULLY_PAID_ERROR = {'installment_number': ['Every installment of this loan has already been paid.']}
+FUTURE_PAYMENT_ERROR = {'paid_on': ['Ensure this date is not in the future.']}
+
+_posted_at_field = serializers.DateTimeField()
+
+
+def _is_amount(value):
+    # Numbers with at most two decimal places pass the DecimalField unchanged
+    if type(value) not in (int, float) or not math.isfinite(value):
+        return False
+    amount = Decimal(repr(value))
+    return Decimal('0.01') <= amount < MAX_AMOUNT and amount == amount.quantize(CENT)
+
+
+def validate(item):
+    """
+    Returns the validated fields of one repayment (installment_number, amount
+    and paid_on None when omitted), or {'errors': ...} with exactly the errors
+    RepaymentBatchItemSerializer reports.
+    """
+    if type(item) is dict and set(item) <= {'loan_id', 'installment_number', 'amount', 'paid_on'}:
+        number, amount, paid_on = item.get('installment_number'), item.get('amount'), item.get('paid_on')
+        if (type(item.get('loan_id')) is int
+                and ('installment_number' not in item or (type(number) is int and number >= 1))
+                and ('amount' not in item or _is_amount(amount))
+                and ('paid_on' not in item or type(paid_on) is str)):
+            try:
+                parsed = parse_date(paid_on) if 'paid_on' in item else None
+            except ValueError:
+                parsed = None
+            if parsed is not None or 'paid_on' not in item:
+                return {
+                    'loan_id': item['loan_id'], 'installment_number': number,
+                    'amount': None if amount is None else Decimal(repr(amount)), 'paid_on': parsed,
+                }
+
+    serializer = RepaymentBatchItemSerializer(data=item)
+    if not serializer.is_valid():
+        return {'errors': serializer.errors}
+    return {'installment_number': None, 'amount': None, 'paid_on': None, **serializer.validated_data}
+
+
+def response_data(repayment, posted_at):
+    """A posted repayment (a dict of its fields) as RepaymentSerializer renders it."""
+    return {
+        'repayment_id': repayment['repayment_id'],
+        'loan_id': repayment['loan_id'],
+        'installment_number': repayment['installment_number'],
+        'amount': str(repayment['amount']),
+        'paid_on': repayment['paid_on'].isoformat(),
+        'due_date': repayment['due_date'].isoformat(),
+        'on_time': repayment['on_time'],
+        'principal_repaid': repayment['principal_repaid'],
+        'posted_at': posted_at,
+    }
+
+
+def principal_repaid(loans, numbers) -> list:
+    """
+    Whole units of principal each installment repays, so that a loan's
+    installments together take exactly int(loan_amount) (what create-loan adds
+    to current_debt) off the customer's debt.
+    """
+    if not loans:
+        return []
+    principals = [float(loan['loan_amount']) for loan in loans]
+    rates = [float(loan['interest_rate']) for loan in loans]
+    tenures = [loan['tenure'] for loan in loans]
+    installments = [float(loan['monthly_repayment']) for loan in loans]
+    numbers = np.asarray(numbers)
+    before = np.floor(outstanding_balances(principals, rates, tenures, installments, numbers - 1))
+    after = np.floor(outstanding_balances(principals, rates, tenures, installments, numbers))
+    return (before - after).astype(np.int64).tolist()
+
+
+def _insert_ledger_rows(rows, posted_at):
+    """Appends rows to the ledger, skipping installments already posted; returns {(loan_id, number): id}."""
+    table = Repayment._meta.db_table
+    columns = ['loan_id', 'installment_number', 'amount', 'paid_on', 'due_date', 'on_time', 'principal_repaid']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({', '.join(columns)}, posted_at)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))}
+            ON CONFLICT (loan_id, installment_number) DO NOTHING
+            RETURNING repayment_id, loan_id, installment_number
+            """,
+            [value for row in rows for value in (*(row[column] for column in columns), posted_at)],
+        )
+        return {(loan_id, number): repayment_id for repayment_id, loan_id, number in cursor.fetchall()}
+
+
+def _add_deltas(model, key, assignment, deltas):
+    """UPDATE model SET assignment FROM (VALUES (key, delta) ...) in one statement, in key order."""
+    if not deltas:
+        return
+    table = model._meta.db_table
+    keys = sorted(deltas)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} AS target SET {assignment}
+            FROM (VALUES {', '.join(['(%s, %s)'] * len(keys))}) AS delta (id, value)
+            WHERE target.{key} = delta.id
+            """,
+            [value for k in keys for value in (k, deltas[k])],
+        )
+
+
+def post_repayments(rows, today=None) -> list:
+    """
+    Posts a chunk of validated repayments in one transaction and returns one
+    result per row, in order: the posted repayment, or {'errors': ...}.
+
+    Works set-based: one locking read of the loans, one read of their latest
+    installments, one ledger insert, then one update each for the loans'
+    emis_paid_on_time, the customers' current_debt and the loan summaries.
+    Counters are only ever incremented by what this chunk adds. An omitted
+    installment_number means the loan's next unpaid installment; a posted
+    installment, or one counted as paid before the ledger existed, cannot be
+    posted again, and amounts below the loan's monthly_repayment are rejected,
+    as are payment dates in the future or before the loan started.
+    """
+    today = today or date.today()
+    results = [None] * len(rows)
+    if not rows:
+        return results
+
+    with transaction.atomic():
+        # Locked in id order, so concurrent postings for the same loans queue instead of deadlocking
+        loans = {
+            loan['loan_id']: loan
+            for loan in Loan.objects.select_for_update().filter(pk__in={row['loan_id'] for row in rows})
+            .order_by('loan_id')
+            .values('loan_id', 'customer_id', 'loan_amount', 'interest_rate', 'tenure', 'monthly_repayment',
+                    'emis_paid_on_time', 'start_date', 'end_date')
+        }
+        ledger = {
+            loan_id: (latest, on_time)
+            for loan_id, latest, on_time in Repayment.objects.filter(loan_id__in=loans).values('loan_id')
+            .annotate(latest=Max('installment_number'), on_time=Count('repayment_id', filter=Q(on_time=True)))
+            .values_list('loan_id', 'latest', 'on_time')
+        }
+        # Ingested loans count installments 1..n paid before the ledger existed in
+        # emis_paid_on_time; on-time ledger rows have been added to it since
+        paid_before = {
+            loan_id: max(loan['emis_paid_on_time'] - ledger.get(loan_id, (0, 0))[1], 0)
+            for loan_id, loan in loans.items()
+        }
+        next_numbers = {
+            loan_id: max(ledger.get(loan_id, (0, 0))[0], paid_before[loan_id]) + 1 for loan_id in loans
+        }
+
+        pending, claimed = [], set()
+        for index, row in enumerate(rows):
+            loan = loans.get(row['loan_id'])
+            if loan is None:
+                results[index] = {'errors': LOAN_NOT_FOUND_ERROR}
+                continue
+            amount = to_money(row['amount'] if row['amount'] is not None else loan['monthly_repayment'])
+            # An installment is only posted once it is paid in full; partial payments would claim it for good
+            if amount < loan['monthly_repayment']:
+                results[index] = {'errors': {
+                    'amount': [f"Ensure this value is greater than or equal to {loan['monthly_repayment']}."]
+                }}
+                continue
+            # Checked before an installment is claimed, so a rejected row claims none
+            paid_on = row['paid_on'] or today
+            if paid_on > today:
+                results[index] = {'errors': FUTURE_PAYMENT_ERROR}
+                continue
+            if paid_on < loan['start_date']:
+                results[index] = {'errors': {
+                    'paid_on': [f"Ensure this date is on or after the loan's start date, {loan['start_date'].isoformat()}."]
+                }}
+                continue
+            number = row['installment_number']
+            if number is None:
+                number = next_numbers[loan['loan_id']]
+                while (loan['loan_id'], number) in claimed:
+                    number += 1
+                next_numbers[loan['loan_id']] = number + 1
+                if number > loan['tenure']:
+                    results[index] = {'errors': FULLY_PAID_ERROR}
+                    continue
+            elif number > loan['tenure']:
+                results[index] = {'errors': {
+                    'installment_number': [f"Ensure this value is less than or equal to {loan['tenure']}."]
+                }}
+                continue
+            if (loan['loan_id'], number) in claimed or number <= paid_before[loan['loan_id']]:
+                results[index] = {'errors': DUPLICATE_INSTALLMENT_ERROR}
+                continue
+            claimed.add((loan['loan_id'], number))
+            due_date = loan['start_date'] + timedelta(days=INSTALLMENT_DAYS * number)
+            pending.append((index, loan, {
+                'loan_id': loan['loan_id'], 'installment_number': number, 'amount': amount,
+                'paid_on': paid_on, 'due_date': due_date,
+                'on_time': paid_on <= due_date,
+            }))
+
+        if not pending:
+            return results
+        principals = principal_repaid([loan for _, loan, _ in pending],
+                                      [entry['installment_number'] for _, _, entry in pending])
+        for (_, _, entry), principal in zip(pending, principals):
+            entry['principal_repaid'] = principal
+
+        posted_at = timezone.now()
+        inserted = _insert_ledger_rows([entry for _, _, entry in pending], posted_at)
+        rendered_posted_at = _posted_at_field.to_representation(posted_at)
+
+        paid_on_time, repaid = defaultdict(int), defaultdict(int)
+        for index, loan, entry in pending:
+            repayment_id = inserted.get((entry['loan_id'], entry['installment_number']))
+            if repayment_id is None:
+                # Posted by an earlier chunk or file
+                results[index] = {'errors': DUPLICATE_INSTALLMENT_ERROR}
+                continue
+            results[index] = response_data({**entry, 'repayment_id': repayment_id}, rendered_posted_at)
+            paid_on_time[loan['loan_id']] += entry['on_time']
+            repaid[loan['customer_id']] += entry['principal_repaid']
+
+        paid_on_time = {loan_id: paid for loan_id, paid in paid_on_time.items() if paid}
+        _add_deltas(Loan, 'loan_id', 'emis_paid_on_time = LEAST(target.emis_paid_on_time + delta.value, target.tenure)',
+                    paid_on_time)
+        _add_deltas(Customer, 'customer_id', 'current_debt = GREATEST(target.current_debt - delta.value, 0)',
+                    {customer_id: amount for customer_id, amount in repaid.items() if amount})
+        _settle_late_loans(loans, paid_on_time, today)
+
+        customer_ids = {loans[loan_id]['customer_id'] for loan_id in paid_on_time}
+        transaction.on_commit(lambda: cache.invalidate_customers(customer_ids))
+    return results
+
+
+def _settle_late_loans(loans, paid_on_time, today):
+    """
+    Takes closed loans whose last missing on-time installment was just posted
+    out of their customers' late_loan_count.
+
+    Summaries that are due a rollover are left alone: they still count some
+    closed loans as active, and their rebuild recounts from the Loan table.
+    """
+    settled = defaultdict(int)
+    for loan_id, paid in paid_on_time.items():
+        loan = loans[loan_id]
+        before = loan['emis_paid_on_time']
+        if loan['end_date'] < today and before < loan['tenure'] <= before + paid:
+            settled[loan['customer_id']] += 1
+    if not settled:
+        return
+
+    # One update per distinct count rather than per customer
+    by_count = defaultdict(list)
+    for customer_id, count in settled.items():
+        by_count[count].append(customer_id)
+    for count, customer_ids in by_count.items():
+        CustomerLoanSummary.objects.filter(
+            Q(next_rollover__isnull=True) | Q(next_rollover__gte=today), customer_id__in=customer_ids,
+        ).update(late_loan_count=F('late_loan_count') - count)
+    invalidate_snapshots(settled)
+
+
+def post_repayment_items(items, today=None) -> list:
+    """Validates and posts a chunk of raw request items; one result per item, in order."""
+    validated = [validate(item) for item in items]
+    valid = [row for row in validated if 'errors' not in row]
+    posted = iter(post_repayments(valid, today))
+    return [row if 'errors' in row else next(posted) for row in validated]
+
+
+def _clean_repayments(chunk):
+    import pandas as pd
+
+    columns = {column: field for column, field in REPAYMENT_COLUMNS.items() if column in chunk}
+    df = chunk[list(columns)].rename(columns=columns)
+    if 'installment_number' not in df:
+        df['installment_number'] = float('nan')
+    for column in ['loan_id', 'installment_number', 'amount']:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df['paid_on'] = pd.to_datetime(df['paid_on'], errors='coerce')
+
+    number = df['installment_number']
+    valid = (
+        df[['loan_id', 'amount', 'paid_on']].notna().all(axis=1)
+        & (df['loan_id'] % 1 == 0) & (df['amount'] > 0)
+        & (number.isna() | ((number % 1 == 0) & (number >= 1)))
+    )
+    df = df[valid]
+    rows = [
+        {
+            'loan_id': int(loan_id),
+            'installment_number': None if math.isnan(number) else int(number),
+            'amount': to_money(float(amount)),
+            'paid_on': paid_on.date(),
+        }
+        for loan_id, number, amount, paid_on in zip(
+            df['loan_id'].tolist(), df['installment_number'].tolist(), df['amount'].tolist(), df['paid_on'].tolist()
+        )
+    ]
+    return rows, int((~valid).sum())
+
+
+def post_repayment_file(path, chunk_size=CHUNK_SIZE, today=None) -> IngestionReport:
+    """
+    Posts a day's repayment file (.xlsx or .csv with Loan ID, Amount, Payment
+    Date and optionally EMI Number columns), one transaction per chunk.
+
+    Invalid rows, unknown loans and installments already posted are rejected.
+    Files with EMI numbers can be posted again safely; without them every row
+    pays the loan's next installment.
+    """
+    report = IngestionReport()
+    started = time.perf_counter()
+    for chunk in read_chunks(path, chunk_size):
+        rows, rejected = _clean_repayments(chunk)
+        results = post_repayments(rows, today)
+        report.rows += len(chunk)
+        report.rejected += rejected + sum('errors' in result for result in results)
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,63 @@
+# src/api/responses.py
+"""
+Typed bodies for the eligibility and create-loan responses.
+
+They are built straight from an EligibilityDecision with the field types the
+response serializers produced, so views skip the serializer validation round
+trip on every request. The serializers stay the documented contract; the
+tests check both agree.
+"""
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+LOAN_APPROVED_MESSAGE = "Loan approved successfully!"
+LOAN_REJECTED_MESSAGE = "Loan not approved. Customer does not meet eligibility criteria."
+
+
+@dataclass(frozen=True, slots=True)
+class EligibilityResponse:
+    """The /check-eligibility body; mirrors LoanEligibilityResponseSerializer."""
+    customer_id: int
+    approval: bool
+    interest_rate: float
+    corrected_interest_rate: Optional[float]
+    tenure: int
+    monthly_installment: float
+
+    @classmethod
+    def from_decision(cls, decision):
+        corrected = decision.corrected_interest_rate
+        return cls(
+            customer_id=int(decision.customer_id),
+            approval=bool(decision.approval),
+            interest_rate=float(decision.interest_rate),
+            corrected_interest_rate=None if corrected is None else float(corrected),
+            tenure=int(decision.tenure),
+            monthly_installment=float(round(decision.monthly_installment, 2)),
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class CreateLoanResponse:
+    """The /create-loan body; mirrors CreateLoanResponseSerializer."""
+    loan_id: Optional[int]
+    customer_id: int
+    loan_approved: bool
+    message: str
+    monthly_installment: float
+
+    @classmethod
+    def from_decision(cls, decision, loan_id):
+        return cls(
+            loan_id=None if loan_id is None else int(loan_id),
+            customer_id=int(decision.customer_id),
+            loan_approved=bool(decision.approval),
+            message=LOAN_APPROVED_MESSAGE if decision.approval else LOAN_REJECTED_MESSAGE,
+            monthly_installment=float(round(decision.monthly_installment, 2)),
+        )
+
+    def to_dict(self):
+        return asdict(self)
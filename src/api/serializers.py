@@ -1,6 +1,10 @@
 
+from decimal import Decimal
+
+from django.db.models import F
 from rest_framework import serializers
-from .models import Customer, Loan
+from .analytics import DIMENSIONS
+from .models import Customer, Loan, Repayment
 
 class CustomerSerializer(serializers.ModelSerializer):
     """Serializer for registering a new customer."""
@@ -20,6 +24,11 @@ class CustomerSerializer(serializers.ModelSerializer):
         )
         return customer
 
+class CustomerBatchItemSerializer(CustomerSerializer):
+    """CustomerSerializer for batch registration; phone uniqueness is checked per chunk instead of per row."""
+    class Meta(CustomerSerializer.Meta):
+        extra_kwargs = {'phone_number': {'validators': []}}
+
 class LoanEligibilityRequestSerializer(serializers.Serializer):
     """Serializer for the incoming /check-eligibility request."""
     customer_id = serializers.IntegerField()
@@ -51,6 +60,76 @@ class CreateLoanResponseSerializer(serializers.Serializer):
     message = serializers.CharField(allow_null=True)
     monthly_installment = serializers.FloatField()
 
+class CreditScoreBatchRequestSerializer(serializers.Serializer):
+    """Serializer for the incoming /credit-scores/batch request."""
+    customer_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100000)
+
+class CreditScoreSerializer(serializers.Serializer):
+    """Serializer for a single entry of the /credit-scores/batch response."""
+    customer_id = serializers.IntegerField()
+    credit_score = serializers.IntegerField()
+
+class PortfolioQuerySerializer(serializers.Serializer):
+    """Serializer for the /analytics/portfolio query string."""
+
+    group_by = serializers.CharField(required=False, default='')
+    score_tier = serializers.CharField(required=False)
+    rate_band = serializers.CharField(required=False)
+    tenure_bucket = serializers.CharField(required=False)
+    month_from = serializers.DateField(required=False, input_formats=['%Y-%m'])
+    month_to = serializers.DateField(required=False, input_formats=['%Y-%m'])
+
+    def validate_group_by(self, value):
+        dimensions = [dimension for dimension in value.split(',') if dimension]
+        unknown = [dimension for dimension in dimensions if dimension not in DIMENSIONS]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown dimensions {unknown}, expected any of {DIMENSIONS}")
+        return list(dict.fromkeys(dimensions))
+
+    def filters(self):
+        """The validated filters as {dimension: [values]}, plus month_from and month_to."""
+        data = self.validated_data
+        filters = {
+            dimension: data[dimension].split(',')
+            for dimension in ('score_tier', 'rate_band', 'tenure_bucket') if dimension in data
+        }
+        filters.update((bound, data[bound]) for bound in ('month_from', 'month_to') if bound in data)
+        return filters
+
+class PortfolioSliceSerializer(serializers.Serializer):
+    """Serializer for one row (or the totals) of the /analytics/portfolio response."""
+    score_tier = serializers.CharField(required=False)
+    rate_band = serializers.CharField(required=False)
+    tenure_bucket = serializers.CharField(required=False)
+    origination_month = serializers.DateField(required=False, format='%Y-%m')
+    loan_count = serializers.IntegerField()
+    total_principal = serializers.DecimalField(max_digits=18, decimal_places=2)
+    total_monthly_repayment = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class RepaymentRequestSerializer(serializers.Serializer):
+    """Serializer for the incoming /loans/<loan_id>/repayments request."""
+    # Defaults to the next unpaid installment
+    installment_number = serializers.IntegerField(required=False, min_value=1)
+    # Defaults to the loan's monthly_repayment
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, min_value=Decimal('0.01'))
+    # Defaults to today
+    paid_on = serializers.DateField(required=False)
+
+class RepaymentBatchItemSerializer(RepaymentRequestSerializer):
+    """Serializer for one item of the /repayments/batch request."""
+    loan_id = serializers.IntegerField()
+
+class RepaymentSerializer(serializers.ModelSerializer):
+    """Serializer for a posted repayment."""
+    loan_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Repayment
+        fields = [
+            'repayment_id', 'loan_id', 'installment_number', 'amount', 'paid_on', 'due_date',
+            'on_time', 'principal_repaid', 'posted_at',
+        ]
+
 class CustomerLoanSerializer(serializers.ModelSerializer):
     """A simplified customer serializer for nesting within loan details."""
     class Meta:
@@ -67,11 +146,31 @@ class LoanDetailSerializer(serializers.ModelSerializer):
 
 class LoanListSerializer(serializers.ModelSerializer):
     """Serializer for the /view-loans/<customer_id> endpoint."""
-    repayments_left = serializers.SerializerMethodField()
+    # Annotated on the queryset by with_repayments_left()
+    repayments_left = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Loan
         fields = ['loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'repayments_left']
 
-    def get_repayments_left(self, obj):
-        return obj.tenure - obj.emis_paid_on_time
\ No newline at end of file
+    @staticmethod
+    def with_repayments_left(queryset):
+        return queryset.annotate(repayments_left=F('tenure') - F('emis_paid_on_time'))
+
+    @classmethod
+    def lean_data(cls, rows):
+        """
+        Serializes rows from .values(*Meta.fields) without per-field serializer
+        calls. Stored decimals already have two places, so str() renders them
+        exactly like the DecimalFields would.
+        """
+        return [
+            {
+                'loan_id': row['loan_id'],
+                'loan_amount': str(row['loan_amount']),
+                'interest_rate': str(row['interest_rate']),
+                'monthly_repayment': str(row['monthly_repayment']),
+                'repayments_left': row['repayments_left'],
+            }
+            for row in rows
+        ]
\ No newline at end of file
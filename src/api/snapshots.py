@@ -0,0 +1,131 @@
+# src/api/snapshots.py
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import CreditScoreSnapshot, Customer
+from .utils import loan_aggregates, lock_customers, score_array
+
+SNAPSHOT_BATCH_SIZE = 5000
+
+# How often the beat schedule runs refresh_credit_score_snapshots()
+REFRESH_INTERVAL = timedelta(minutes=15)
+
+DEFAULT_MAX_AGE = 6 * 60 * 60
+
+
+def max_age() -> int:
+    """Seconds a snapshot may be served before the endpoints score live instead."""
+    return getattr(settings, 'CREDIT_SCORE_SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def fresh_snapshot(customer, now=None, today=None):
+    """Returns the customer's snapshot if it was loaded and is fresh, else None."""
+    snapshot = getattr(customer, 'credit_score_snapshot', None)
+    if snapshot is None:
+        return None
+    now = now or timezone.now()
+    return snapshot if snapshot.is_fresh(now, max_age(), today or date.today()) else None
+
+
+def compute_snapshots(customer_ids, today=None, batch_size=SNAPSHOT_BATCH_SIZE) -> int:
+    """
+    Scores the given customers in bulk and upserts their snapshots.
+
+    One grouped aggregate query and one upsert per batch, with the scoring
+    rules applied as array math. Returns the number of snapshots written.
+
+    Each batch locks its customer rows before reading their loans, and
+    invalidate_snapshots() locks the same rows until the writer commits, so a
+    score read before a write can never overwrite its invalidation. Customers
+    being written right now are skipped; the next refresh finds their snapshot
+    missing.
+    """
+    today = today or date.today()
+    customer_ids = list(customer_ids)
+    computed_at = timezone.now()
+    written = 0
+    for start in range(0, len(customer_ids), batch_size):
+        with transaction.atomic():
+            locked = list(
+                Customer.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=customer_ids[start:start + batch_size])
+                .order_by('customer_id')
+                .values_list('customer_id', flat=True)
+            )
+            # Read in a new statement, so the aggregates see every write committed before the lock
+            rows = list(
+                Customer.objects.filter(pk__in=locked)
+                .values('customer_id', 'approved_limit')
+                .annotate(**loan_aggregates(today), valid_until=Min('loans__end_date', filter=Q(loans__end_date__gte=today)))
+                .values_list('customer_id', 'approved_limit', 'current_debt_sum',
+                             'num_current_loans', 'num_past_loans', 'num_late_loans', 'valid_until')
+            )
+            if not rows:
+                continue
+
+            ids, limits, debt, current, past, late, valid_until = zip(*rows)
+            scores = score_array(limits, debt, current, past, late).tolist()
+            CreditScoreSnapshot.objects.bulk_create(
+                [
+                    CreditScoreSnapshot(customer_id=customer_id, credit_score=score,
+                                        computed_at=computed_at, valid_until=until)
+                    for customer_id, score, until in zip(ids, scores, valid_until)
+                ],
+                update_conflicts=True, unique_fields=['customer'],
+                update_fields=['credit_score', 'computed_at', 'valid_until'],
+            )
+        written += len(rows)
+    return written
+
+
+def refresh_credit_score_snapshots(today=None, now=None) -> int:
+    """
+    Recomputes the snapshots that are missing (the customer's loans changed and
+    the write dropped the snapshot), whose valid_until has passed (a loan moved
+    from active to closed), or that would exceed max_age() before the next run.
+    """
+    today = today or date.today()
+    now = now or timezone.now()
+    renew_before = now - timedelta(seconds=max_age()) + REFRESH_INTERVAL
+    stale_ids = (
+        Customer.objects.filter(
+            Q(credit_score_snapshot__isnull=True)
+            | Q(credit_score_snapshot__valid_until__lt=today)
+            | Q(credit_score_snapshot__computed_at__lt=renew_before)
+        )
+        .order_by('customer_id')
+        .values_list('customer_id', flat=True)
+    )
+    return compute_snapshots(stale_ids, today)
+
+
+def invalidate_snapshots(customer_ids) -> None:
+    """
+    Drops the snapshots of customers whose loans or limits were just written.
+    Their customer rows stay locked until the caller's transaction ends.
+    """
+    customer_ids = list(customer_ids)
+    with transaction.atomic():
+        lock_customers(customer_ids)
+        CreditScoreSnapshot.objects.filter(customer_id__in=customer_ids).delete()
+
+
+def snapshot_scores(customer_ids, compute_missing) -> dict:
+    """
+    Returns {customer_id: score} from fresh snapshots, scoring the customers
+    without one through compute_missing(ids) -> {customer_id: score}.
+    """
+    now, today, bound = timezone.now(), date.today(), max_age()
+    scores = {
+        snapshot.customer_id: snapshot.credit_score
+        for snapshot in CreditScoreSnapshot.objects.filter(customer_id__in=customer_ids)
+        if snapshot.is_fresh(now, bound, today)
+    }
+    missing = [customer_id for customer_id in customer_ids if customer_id not in scores]
+    if missing:
+        scores.update(compute_missing(missing))
+    return scores
@@ -0,0 +1,170 @@
+# src/api/summaries.py
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.db.models import F, Min, Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce, Least
+from .models import Customer, CustomerLoanSummary
+from .snapshots import invalidate_snapshots
+from .utils import loan_aggregates, score_from_aggregates
+
+SUMMARY_BATCH_SIZE = 5000
+
+SUMMARY_FIELDS = [
+    'active_emi_total', 'active_principal', 'active_loan_count',
+    'closed_loan_count', 'late_loan_count', 'next_rollover',
+]
+
+
+def _summary_rows(customer_ids, today):
+    """Computes fresh summary rows for the given customers in one grouped query."""
+    active = Q(loans__end_date__gte=today)
+    return (
+        Customer.objects.filter(pk__in=customer_ids)
+        .values('customer_id')
+        .annotate(
+            **loan_aggregates(today),
+            active_emi_total=Coalesce(
+                Sum('loans__monthly_repayment', filter=active),
+                Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+            next_rollover=Min('loans__end_date', filter=active),
+        )
+    )
+
+
+def rebuild_loan_summaries(customer_ids=None, today=None, batch_size=SUMMARY_BATCH_SIZE) -> int:
+    """
+    Recomputes CustomerLoanSummary rows from the Loan table.
+
+    Works set-based in batches: one grouped aggregate query and one upsert per
+    batch. Rebuilds every customer when customer_ids is None.
+    """
+    today = today or date.today()
+    if customer_ids is None:
+        customer_ids = Customer.objects.values_list('customer_id', flat=True).order_by('customer_id')
+    customer_ids = list(customer_ids)
+
+    rebuilt = 0
+    for start in range(0, len(customer_ids), batch_size):
+        summaries = [
+            CustomerLoanSummary(
+                customer_id=row['customer_id'],
+                active_emi_total=row['active_emi_total'],
+                active_principal=row['current_debt_sum'],
+                active_loan_count=row['num_current_loans'],
+                closed_loan_count=row['num_past_loans'],
+                late_loan_count=row['num_late_loans'],
+                next_rollover=row['next_rollover'],
+            )
+            for row in _summary_rows(customer_ids[start:start + batch_size], today)
+        ]
+        CustomerLoanSummary.objects.bulk_create(
+            summaries, update_conflicts=True,
+            unique_fields=['customer'], update_fields=SUMMARY_FIELDS,
+        )
+        # The loans behind these customers' scores changed or rolled over
+        invalidate_snapshots([summary.customer_id for summary in summaries])
+        rebuilt += len(summaries)
+    return rebuilt
+
+
+def record_new_loan(loan) -> None:
+    """
+    Adds a freshly created active loan to its customer's summary.
+
+    Must run inside the transaction that inserted the loan. Falls back to a
+    rebuild when the customer has no summary row yet.
+    """
+    updated = CustomerLoanSummary.objects.filter(customer_id=loan.customer_id).update(
+        active_emi_total=F('active_emi_total') + loan.monthly_repayment,
+        active_principal=F('active_principal') + loan.loan_amount,
+        active_loan_count=F('active_loan_count') + 1,
+        next_rollover=Least(Coalesce('next_rollover', Value(loan.end_date)), Value(loan.end_date)),
+    )
+    if not updated:
+        rebuild_loan_summaries([loan.customer_id])
+    else:
+        invalidate_snapshots([loan.customer_id])
+
+
+def load_customer_with_summary(customer_id, today=None, lock=False):
+    """
+    Loads a customer, its loan summary and its credit score snapshot with a
+    single primary-key read (two when locking, without the snapshot).
+
+    Rebuilds the summary first if it is missing or one of the active loans has
+    passed its end_date. Raises Customer.DoesNotExist for unknown customers.
+    With lock=True the customer row is locked FOR UPDATE, which serializes loan
+    writes for that customer; the caller must be inside a transaction.
+    """
+    today = today or date.today()
+    if lock:
+        # Lock first, then read the summary in a new statement: rows joined into
+        # a FOR UPDATE query keep the values read before waiting for the lock
+        customer = Customer.objects.select_for_update().get(pk=customer_id)
+        summary = CustomerLoanSummary.objects.filter(pk=customer_id).first()
+    else:
+        customer = Customer.objects.select_related('loan_summary', 'credit_score_snapshot').get(pk=customer_id)
+        try:
+            summary = customer.loan_summary
+        except CustomerLoanSummary.DoesNotExist:
+            summary = None
+
+    if summary is None or summary.is_stale(today):
+        rebuild_loan_summaries([customer_id], today)
+        summary = CustomerLoanSummary.objects.get(pk=customer_id)
+        customer.loan_summary = summary
+    return customer, summary
+
+
+async def aload_customer_with_summary(customer_id, today=None):
+    """Async load_customer_with_summary() for the ASGI views (without locking)."""
+    today = today or date.today()
+    customer = await Customer.objects.select_related('loan_summary', 'credit_score_snapshot').aget(pk=customer_id)
+    summary = getattr(customer, 'loan_summary', None)
+    if summary is None or summary.is_stale(today):
+        await sync_to_async(rebuild_loan_summaries)([customer_id], today)
+        summary = await CustomerLoanSummary.objects.aget(pk=customer_id)
+    return customer, summary
+
+
+def load_customers_with_summaries(customer_ids, today=None) -> dict:
+    """
+    Set-based load_customer_with_summary(): returns {customer_id: (customer, summary)}
+    for the customers that exist, rebuilding missing or stale summaries in bulk.
+    """
+    today = today or date.today()
+    customers = {
+        customer.pk: customer
+        for customer in Customer.objects.filter(pk__in=customer_ids).select_related('loan_summary')
+    }
+    summaries, stale_ids = {}, []
+    for customer_id, customer in customers.items():
+        summary = getattr(customer, 'loan_summary', None)
+        if summary is None or summary.is_stale(today):
+            stale_ids.append(customer_id)
+        else:
+            summaries[customer_id] = summary
+
+    if stale_ids:
+        rebuild_loan_summaries(stale_ids, today)
+        summaries.update((summary.pk, summary) for summary in CustomerLoanSummary.objects.filter(pk__in=stale_ids))
+    return {customer_id: (customer, summaries[customer_id]) for customer_id, customer in customers.items()}
+
+
+def summary_credit_score(customer, summary) -> int:
+    """Calculates the credit score from a customer's loan summary."""
+    return score_from_aggregates(
+        approved_limit=customer.approved_limit,
+        current_debt_sum=summary.active_principal,
+        num_current_loans=summary.active_loan_count,
+        num_past_loans=summary.closed_loan_count,
+        num_late_loans=summary.late_loan_count,
+    )
+
+
+def roll_over_loan_summaries(today=None) -> int:
+    """Rebuilds every summary that still counts a loan whose end_date has passed as active."""
+    today = today or date.today()
+    stale_ids = CustomerLoanSummary.objects.filter(next_rollover__lt=today).values_list('customer_id', flat=True)
+    return rebuild_loan_summaries(stale_ids, today)
@@ -1,46 +1,147 @@
-import pandas as pd
-from celery import shared_task
-from .models import Customer, Loan
-
-@shared_task
-def ingest_customer_data():
-    # Add engine='openpyxl' here
-    df = pd.read_excel('customer_data.xlsx', engine='openpyxl')
-
-    for _, row in df.iterrows():
-        Customer.objects.update_or_create(
-            customer_id=row['Customer ID'], # Match the exact column name from the file
-            defaults={
-                'first_name': row['First Name'],
-                'last_name': row['Last Name'],
-                'phone_number': row['Phone Number'],
-                'monthly_salary': row['Monthly Salary'],
-                'approved_limit': row['Approved Limit'],
-                # The 'Current Debt' might not be in the initial file, so use .get
-                'current_debt': row.get('Current Debt', 0) 
-            }
-        )
-    return "Customer data ingestion complete."
-
-@shared_task
-def ingest_loan_data():
-    # Add engine='openpyxl' here
-    df = pd.read_excel('loan_data.xlsx', engine='openpyxl')
-
-    for _, row in df.iterrows():
-        # Make sure the customer exists before creating the loan
-        if Customer.objects.filter(customer_id=row['Customer ID']).exists():
-            Loan.objects.update_or_create(
-                loan_id=row['Loan ID'],
-                defaults={
-                    'customer_id': row['Customer ID'],
-                    'loan_amount': row['Loan Amount'],
-                    'tenure': row['Tenure'],
-                    'interest_rate': row['Interest Rate'],
-                    'monthly_repayment': row['Monthly payment'],
-                    'emis_paid_on_time': row['EMIs paid on Time'],
-                    'start_date': row['Date of Approval'],
-                    'end_date': row['End Date'],
-                }
-            )
-    return "Loan data ingestion complete."
\ No newline at end of file
+import shutil
+from pathlib import Path
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .analytics import rebuild_portfolio_rollups
+from .cache import invalidate_customers
+from .idempotency import purge_expired
+from .ingestion import count_rows, ingest_customers, ingest_loans, split_file
+from .models import IngestionJob
+from .partitions import ensure_loan_partitions
+from .snapshots import invalidate_snapshots, refresh_credit_score_snapshots
+from .summaries import roll_over_loan_summaries
+
+@shared_task
+def ingest_customer_data(path='customer_data.xlsx', chunk_size=5000):
+    # Streams the file in chunks and upserts each chunk with a single bulk write
+    report = ingest_customers(path, chunk_size=chunk_size)
+    return f"Customer data ingestion complete: {report}."
+
+@shared_task
+def ingest_loan_data(path='loan_data.xlsx', chunk_size=5000):
+    # Loans for unknown customers are rejected; loan summaries are rebuilt per chunk
+    report = ingest_loans(path, chunk_size=chunk_size)
+    return f"Loan data ingestion complete: {report}."
+
+@shared_task
+def roll_over_loan_summary_task():
+    # Move loans whose end_date has passed from active to closed in the summaries
+    rebuilt = roll_over_loan_summaries()
+    return f"Rolled over {rebuilt} loan summaries."
+
+@shared_task
+def refresh_credit_score_snapshot_task():
+    # Rescore customers whose loans changed, rolled over, or whose snapshot is about to expire
+    refreshed = refresh_credit_score_snapshots()
+    return f"Refreshed {refreshed} credit score snapshots."
+
+@shared_task
+def rebuild_portfolio_rollup_task():
+    # Loan writes keep the rollups current; the nightly rebuild repairs any drift
+    rebuilt = rebuild_portfolio_rollups()
+    return f"Rebuilt {rebuilt} portfolio rollup slices."
+
+@shared_task
+def purge_idempotency_keys():
+    # Stored create-loan responses are only replayed within the key TTL
+    deleted = purge_expired()
+    return f"Purged {deleted} idempotency keys."
+
+@shared_task
+def create_loan_partitions_task():
+    # Loans ending in a year without a partition would pile up in the default partition
+    created = ensure_loan_partitions()
+    return f"Created {len(created)} loan partitions."
+
+
+# --- Sharded ingestion ---
+# A job runs as two chords: customer shards in parallel, then loan shards in
+# parallel once every customer shard has finished, then a final rebuild of
+# origination scores and rollups that also drops the loaded customers' cached scores.
+# Each phase parses its file once and splits the rows into one shard file per
+# shard by customer or loan id, so all rows of an id are written by one shard
+# in file order and the last one wins, exactly as in a single pass.
+
+def _fail_job(job_id, exc):
+    IngestionJob.objects.filter(pk=job_id).update(
+        status=IngestionJob.FAILED, error=repr(exc), finished_at=timezone.now()
+    )
+
+def _record_progress(job_id, report):
+    IngestionJob.objects.filter(pk=job_id).update(
+        processed_rows=F('processed_rows') + report.rows,
+        rejected_rows=F('rejected_rows') + report.rejected,
+    )
+
+def shard_directory(job_id):
+    # On storage every worker can read; kept after a failure for inspection
+    return Path(settings.INGESTION_WORK_DIR) / f'job-{job_id}'
+
+@shared_task
+def start_ingestion_job(job_id):
+    job = IngestionJob.objects.get(pk=job_id)
+    IngestionJob.objects.filter(pk=job_id).update(status=IngestionJob.CUSTOMERS, started_at=timezone.now())
+    try:
+        loan_rows = count_rows(job.loan_file)
+        IngestionJob.objects.filter(pk=job_id).update(total_rows=count_rows(job.customer_file) + loan_rows)
+        paths = split_file(job.customer_file, 'Customer ID', max(job.shards, 1), shard_directory(job_id), job.chunk_size)
+    except Exception as exc:
+        _fail_job(job_id, exc)
+        raise
+    chord([ingest_customer_shard.si(job_id, path) for path in paths])(start_loan_phase.si(job_id, loan_rows))
+
+@shared_task
+def ingest_customer_shard(job_id, path):
+    job = IngestionJob.objects.get(pk=job_id)
+    try:
+        report = ingest_customers(path, chunk_size=job.chunk_size)
+    except Exception as exc:
+        _fail_job(job_id, exc)
+        raise
+    _record_progress(job_id, report)
+    return report.rows
+
+@shared_task
+def start_loan_phase(job_id, loan_rows):
+    job = IngestionJob.objects.get(pk=job_id)
+    IngestionJob.objects.filter(pk=job_id).update(status=IngestionJob.LOANS)
+    if not loan_rows:
+        finish_ingestion_job.delay([], job_id)
+        return
+    try:
+        paths = split_file(job.loan_file, 'Loan ID', max(job.shards, 1), shard_directory(job_id), job.chunk_size)
+    except Exception as exc:
+        _fail_job(job_id, exc)
+        raise
+    chord([ingest_loan_shard.si(job_id, path) for path in paths])(finish_ingestion_job.s(job_id))
+
+@shared_task
+def ingest_loan_shard(job_id, path):
+    job = IngestionJob.objects.get(pk=job_id)
+    try:
+        # Origination scores and rollups are rebuilt once at the end, from the whole book
+        report = ingest_loans(path, chunk_size=job.chunk_size, rebuild_rollups=False)
+    except Exception as exc:
+        _fail_job(job_id, exc)
+        raise
+    _record_progress(job_id, report)
+    return sorted(report.touched_ids)
+
+@shared_task
+def finish_ingestion_job(touched_ids, job_id):
+    # touched_ids: the chord's results, one list of customer ids per loan shard
+    customer_ids = sorted({customer_id for shard in touched_ids for customer_id in shard})
+    try:
+        rebuild_portfolio_rollups()
+        # Scores cached or snapshotted while the shards were still loading are stale now
+        invalidate_customers(customer_ids)
+        invalidate_snapshots(customer_ids)
+    except Exception as exc:
+        _fail_job(job_id, exc)
+        raise
+    IngestionJob.objects.filter(pk=job_id).update(status=IngestionJob.COMPLETED, finished_at=timezone.now())
+    shutil.rmtree(shard_directory(job_id), ignore_errors=True)
+    return f"Ingestion job {job_id} complete."
@@ -1,3 +1,1671 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from datetime import date, datetime, time as clock_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from unittest import skipIf, skipUnless
+
+from django.conf import settings
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .models import CreditScoreSnapshot, Customer, CustomerLoanSummary, IngestionJob, Loan, PortfolioRollup, Repayment
+from .registration import approved_limits
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .responses import CreateLoanResponse, EligibilityResponse
+from .serializers import CreateLoanResponseSerializer, LoanEligibilityResponseSerializer, LoanListSerializer, RepaymentBatchItemSerializer, RepaymentSerializer
+from .snapshots import compute_snapshots, refresh_credit_score_snapshots
+from .summaries import load_customer_with_summary, rebuild_loan_summaries, record_new_loan, roll_over_loan_summaries, summary_credit_score
+from .analytics import rebuild_portfolio_rollups
+from .benchmarks import endpoint_requests, run_connection_benchmarks, run_endpoint_benchmarks, run_micro_benchmarks, run_partition_benchmarks, run_response_benchmarks, seed_synthetic_data
+from .cache import cache_stats, credit_score_key, reset_cache_stats
+from .eligibility import EligibilityDecision, eligibility_engine
+from .finance import amortization_schedules, emi, emi_array, outstanding_balances, to_money
+from .metrics import RequestTimings, current_timings, render_prometheus, reset_metrics
+from .export import FIELDS, export_rows
+from .pagination import LoanCursorPagination
+from .ingestion import count_rows, ingest_customers, ingest_loans, read_chunks, split_file, upsert_loans
+from .partitions import ensure_loan_partitions, is_partitioned, loan_partitions, partition_loans, scanned_relations, unpartition_loans
+from .tasks import create_loan_partitions_task, ingest_customer_data, finish_ingestion_job, ingest_loan_data, start_ingestion_job, start_loan_phase
+from .utils import calculate_credit_score, loan_aggregates, score_customers
+
+
+def legacy_credit_score(customer_id):
+    """The original per-loan scoring loop, kept as the reference implementation."""
+    try:
+        customer = Customer.objects.get(pk=customer_id)
+    except Customer.DoesNotExist:
+        return 0
+
+    customer_loans = Loan.objects.filter(customer=customer)
+    current_debt_sum = customer_loans.filter(end_date__gte=date.today()).aggregate(total=Sum('loan_amount'))['total'] or 0
+    if current_debt_sum > customer.approved_limit:
+        return 0
+
+    score = 100
+    past_loans = customer_loans.filter(end_date__lt=date.today())
+    for loan in past_loans:
+        if loan.emis_paid_on_time < loan.tenure:
+            score -= 25
+    score -= customer_loans.filter(end_date__gte=date.today()).count() * 10
+    score += past_loans.count() * 10
+    return max(0, min(score, 100))
+
+
+class ExcelDatasetTestCase(TestCase):
+    """Loads the shipped customer_data.xlsx and loan_data.xlsx once per class."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ingest_customer_data()
+        ingest_loan_data()
+
+
+class CreditScoreTests(ExcelDatasetTestCase):
+
+    def test_matches_legacy_scores_on_excel_dataset(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+        self.assertTrue(customer_ids)
+        for customer_id in customer_ids:
+            self.assertEqual(calculate_credit_score(customer_id), legacy_credit_score(customer_id), customer_id)
+
+    def test_unknown_customer_scores_zero(self):
+        self.assertEqual(calculate_credit_score(0), 0)
+
+    def test_single_query(self):
+        customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        with CaptureQueriesContext(connection) as ctx:
+            calculate_credit_score(customer_id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class ScoreCustomersTests(ExcelDatasetTestCase):
+
+    def test_matches_per_customer_scores(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True)) + [0]
+        scores = score_customers(customer_ids, batch_size=50)
+        self.assertEqual(scores, {customer_id: calculate_credit_score(customer_id) for customer_id in customer_ids})
+
+    def test_query_count_is_fixed_per_batch(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+        with CaptureQueriesContext(connection) as ctx:
+            score_customers(customer_ids, batch_size=len(customer_ids))
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_batch_endpoint_preserves_input_order(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True)[:5])[::-1]
+        response = self.client.post('/api/credit-scores/batch/', {'customer_ids': customer_ids}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['customer_id'] for row in response.json()['scores']], customer_ids)
+
+
+class CustomerLoanSummaryTests(ExcelDatasetTestCase):
+
+    def test_summary_scores_match_live_scores(self):
+        rebuild_loan_summaries()
+        for customer in Customer.objects.select_related('loan_summary'):
+            self.assertEqual(summary_credit_score(customer, customer.loan_summary), calculate_credit_score(customer.pk))
+
+    def test_create_loan_updates_summary_incrementally(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000001,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        response = self.client.post('/api/create-loan/', {
+            'customer_id': customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }, content_type='application/json')
+        self.assertTrue(response.json()['loan_approved'])
+
+        summary = CustomerLoanSummary.objects.get(pk=customer.pk)
+        loan = Loan.objects.get(customer=customer)
+        self.assertEqual(summary.active_loan_count, 1)
+        self.assertEqual(summary.active_principal, loan.loan_amount)
+        self.assertEqual(summary.active_emi_total, loan.monthly_repayment)
+        self.assertEqual(summary.next_rollover, loan.end_date)
+
+    def test_rollover_moves_ended_loans_to_closed(self):
+        loan = Loan.objects.order_by('loan_id').first()
+        rebuild_loan_summaries([loan.customer_id], today=loan.end_date)
+        self.assertEqual(CustomerLoanSummary.objects.get(pk=loan.customer_id).next_rollover, loan.end_date)
+        self.assertGreaterEqual(roll_over_loan_summaries(today=loan.end_date + timedelta(days=1)), 1)
+
+        summary = CustomerLoanSummary.objects.get(pk=loan.customer_id)
+        self.assertGreater(summary.next_rollover or date.max, loan.end_date)
+
+    def test_eligibility_reads_a_single_row(self):
+        customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        rebuild_loan_summaries([customer_id])
+        with CaptureQueriesContext(connection) as ctx:
+            load_customer_with_summary(customer_id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class IngestionTests(TestCase):
+    @staticmethod
+    def rollups():
+        return sorted(
+            PortfolioRollup.objects.filter(loan_count__gt=0).values_list(
+                'score_tier', 'rate_band', 'tenure_bucket', 'origination_month',
+                'loan_count', 'total_principal', 'total_monthly_repayment',
+            )
+        )
+
+    def test_bulk_ingestion_reports_rows_and_rejects(self):
+        customers = ingest_customers('customer_data.xlsx', chunk_size=100)
+        self.assertEqual(customers.rejected, 0)
+        self.assertEqual(Customer.objects.count(), customers.loaded)
+
+        loans = ingest_loans('loan_data.xlsx', chunk_size=100)
+        self.assertGreater(loans.rows_per_second, 0)
+        # Rows of a repeated loan id other than the last count as rejected, also across chunks
+        self.assertEqual(Loan.objects.count(), loans.loaded)
+        self.assertEqual(loans.rejected, 29)
+        self.assertEqual(CustomerLoanSummary.objects.count(), len(loans.touched_ids))
+
+    def test_rejects_loans_for_unknown_customers(self):
+        report = ingest_loans('loan_data.xlsx')
+        self.assertEqual(report.rejected, report.rows)
+        self.assertFalse(Loan.objects.exists())
+
+    def test_reingestion_is_idempotent(self):
+        ingest_customers('customer_data.xlsx')
+        ingest_loans('loan_data.xlsx')
+        counts = Customer.objects.count(), Loan.objects.count()
+        ingest_customers('customer_data.xlsx')
+        ingest_loans('loan_data.xlsx')
+        self.assertEqual((Customer.objects.count(), Loan.objects.count()), counts)
+
+    def test_sharded_ingestion_matches_single_pass(self):
+        customer_fields = ['customer_id', 'first_name', 'last_name', 'phone_number', 'monthly_salary', 'approved_limit']
+        fields = ['loan_id', 'customer_id', 'loan_amount', 'tenure', 'emis_paid_on_time', 'start_date', 'end_date',
+                  'origination_score']
+        with tempfile.TemporaryDirectory() as directory:
+            # Shards run in reverse order, so an id split across shards would keep the wrong row
+            for path in reversed(split_file('customer_data.xlsx', 'Customer ID', 3, directory)):
+                ingest_customers(path)
+            reports = [
+                ingest_loans(path, rebuild_rollups=False)
+                for path in reversed(split_file('loan_data.xlsx', 'Loan ID', 3, directory))
+            ]
+        # What finish_ingestion_job does once every shard has loaded
+        rebuild_portfolio_rollups()
+        sharded = set(Customer.objects.values_list(*customer_fields)), set(Loan.objects.values_list(*fields)), self.rollups()
+
+        Customer.objects.all().delete()
+        ingest_customers('customer_data.xlsx')
+        single = ingest_loans('loan_data.xlsx')
+        self.assertEqual(
+            (set(Customer.objects.values_list(*customer_fields)), set(Loan.objects.values_list(*fields)), self.rollups()),
+            sharded,
+        )
+        self.assertEqual(sum(report.rows for report in reports), single.rows)
+        self.assertEqual(sum(report.rejected for report in reports), single.rejected)
+
+    def test_repeated_customer_ids_are_resolved_within_one_shard(self):
+        header = 'Customer ID,First Name,Last Name,Phone Number,Monthly Salary,Approved Limit\n'
+        rows = ['1,Old,Row,7500000001,50000,1800000', '2,Two,Row,7500000002,50000,1800000',
+                '4,Four,Row,7500000004,50000,1800000', '1,New,Row,7500000001,60000,2200000']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'customers.csv')
+            with open(path, 'w') as f:
+                f.write(header + '\n'.join(rows) + '\n')
+            paths = split_file(path, 'Customer ID', 2, directory)
+            shard_ids = [[int(i) for chunk in read_chunks(shard) for i in chunk['Customer ID']] for shard in paths]
+            reports = [ingest_customers(shard) for shard in reversed(paths)]
+
+        self.assertEqual(shard_ids, [[2, 4], [1, 1]])
+        self.assertEqual(Customer.objects.get(pk=1).first_name, 'New')
+        self.assertEqual(sum(report.rejected for report in reports), 1)
+
+    def test_chunk_size_does_not_change_origination_scores_or_rollups(self):
+        ingest_customers('customer_data.xlsx')
+        ingest_loans('loan_data.xlsx', chunk_size=5000)
+        scores = dict(Loan.objects.values_list('loan_id', 'origination_score'))
+        rollups = self.rollups()
+
+        Loan.objects.all().delete()
+        ingest_loans('loan_data.xlsx', chunk_size=50)
+
+        self.assertNotIn(None, scores.values())
+        self.assertEqual(dict(Loan.objects.values_list('loan_id', 'origination_score')), scores)
+        self.assertEqual(self.rollups(), rollups)
+        # Scored from the whole book, not from an empty loan table
+        self.assertEqual(scores, {
+            loan_id: score_customers([customer_id])[customer_id]
+            for loan_id, customer_id in Loan.objects.values_list('loan_id', 'customer_id')
+        })
+
+    def test_failed_chunk_leaves_no_partial_writes(self):
+        ingest_customers('customer_data.xlsx')
+        rebuilt = []
+
+        def rebuild_once(customer_ids):
+            if rebuilt:
+                raise RuntimeError('disk full')
+            rebuilt.append(rebuild_loan_summaries(customer_ids))
+
+        with mock.patch('api.ingestion.rebuild_loan_summaries', rebuild_once), \
+                self.captureOnCommitCallbacks() as callbacks, self.assertRaises(RuntimeError):
+            ingest_loans('loan_data.xlsx', chunk_size=100)
+
+        # The first chunk committed whole, with its summaries; nothing of the second was written
+        self.assertEqual(len(callbacks), 1)
+        loaded = set(next(read_chunks('loan_data.xlsx', 100))['Loan ID'])
+        self.assertEqual(set(Loan.objects.values_list('loan_id', flat=True)), loaded)
+        self.assertEqual(PortfolioRollup.objects.aggregate(total=Sum('loan_count'))['total'], len(loaded))
+        stored = set(CustomerLoanSummary.objects.values_list())
+        rebuild_loan_summaries(Loan.objects.values_list('customer_id', flat=True).distinct())
+        self.assertEqual(set(CustomerLoanSummary.objects.values_list()), stored)
+
+    def test_finishing_a_job_drops_the_loaded_customers_cached_scores(self):
+        ingest_customers('customer_data.xlsx')
+        ingest_loans('loan_data.xlsx', rebuild_rollups=False)
+        job = IngestionJob.objects.create(customer_file='customer_data.xlsx', loan_file='loan_data.xlsx', shards=2)
+        customer_ids = sorted(Loan.objects.values_list('customer_id', flat=True).distinct()[:4])
+        compute_snapshots(customer_ids)
+        django_cache.set_many({credit_score_key(customer_id): 0 for customer_id in customer_ids})
+
+        finish_ingestion_job([customer_ids[:2], customer_ids[2:]], job.pk)
+
+        self.assertFalse(django_cache.get_many([credit_score_key(customer_id) for customer_id in customer_ids]))
+        self.assertFalse(CreditScoreSnapshot.objects.filter(customer_id__in=customer_ids).exists())
+        self.assertEqual(IngestionJob.objects.get(pk=job.pk).status, IngestionJob.COMPLETED)
+        self.assertFalse(Loan.objects.filter(origination_score__isnull=True).exists())
+
+    def test_job_phases_split_each_file_once_by_id(self):
+        job = IngestionJob.objects.create(customer_file='customer_data.xlsx', loan_file='loan_data.xlsx', shards=3)
+        with tempfile.TemporaryDirectory() as directory, override_settings(INGESTION_WORK_DIR=directory):
+            for phase, file, column in ((start_ingestion_job, 'customer_data.xlsx', 'Customer ID'),
+                                        (start_loan_phase, 'loan_data.xlsx', 'Loan ID')):
+                with mock.patch('api.tasks.chord') as queued:
+                    phase(job.pk) if phase is start_ingestion_job else phase(job.pk, count_rows(file))
+                shards = [shard.args for shard in queued.call_args.args[0]]
+                self.assertEqual([job_id for job_id, path in shards], [job.pk] * 3)
+
+                ids = [[value for chunk in read_chunks(path) for value in chunk[column]] for _, path in shards]
+                self.assertEqual(sorted(value for shard in ids for value in shard),
+                                 sorted(value for chunk in read_chunks(file) for value in chunk[column]))
+                self.assertEqual([{value % 3 for value in shard} for shard in ids], [{0}, {1}, {2}])
+
+
+class EligibilityEngineTests(ExcelDatasetTestCase):
+
+    def test_rate_tiers(self):
+        cases = {0: None, 10: None, 11: 16.0, 30: 16.0, 31: 12.0, 50: 12.0, 51: 10.0, 100: 10.0}
+        for score, rate in cases.items():
+            self.assertEqual(eligibility_engine.min_rate_for_score(score), rate, score)
+
+    def test_low_rate_is_corrected_to_tier_minimum(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000002,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        decision = eligibility_engine.check(customer.pk, loan_amount=100000, interest_rate=8, tenure=12)
+        self.assertTrue(decision.approval)
+        self.assertEqual(decision.credit_score, 100)
+        self.assertEqual(decision.corrected_interest_rate, 10.0)
+        self.assertEqual(decision.final_interest_rate, 10.0)
+
+    def test_check_eligibility_uses_one_query(self):
+        customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        eligibility_engine.check(customer_id, loan_amount=1000, interest_rate=12, tenure=12)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/check-eligibility/', {
+                'customer_id': customer_id, 'loan_amount': 1000, 'interest_rate': 12, 'tenure': 12,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_unknown_customer_is_not_found(self):
+        for url in ('/api/check-eligibility/', '/api/create-loan/'):
+            response = self.client.post(url, {
+                'customer_id': 0, 'loan_amount': 1000, 'interest_rate': 12, 'tenure': 12,
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 404)
+
+
+class FinanceTests(TestCase):
+
+    def test_emi_array_matches_scalar_emi(self):
+        principals, rates, tenures = [100000, 50000, 1200], [12, 0, 7.5], [12, 6, 240]
+        expected = [emi(p, r, n) for p, r, n in zip(principals, rates, tenures)]
+        for value, reference in zip(emi_array(principals, rates, tenures), expected):
+            self.assertAlmostEqual(value, reference, places=9)
+
+    def test_to_money_matches_decimal_field_storage(self):
+        self.assertEqual(to_money(8884.878867834), Decimal('8884.88'))
+        self.assertEqual(to_money(0.125), Decimal('0.12'))
+        self.assertEqual(to_money(Decimal('10.005')), Decimal('10.00'))
+
+    def test_schedules_close_at_zero_and_pad_short_loans(self):
+        payment, interest, principal, balance = amortization_schedules([100000, 5000], [12, 0], [12, 3])
+        self.assertEqual(payment.shape, (2, 12))
+        self.assertEqual(balance[0, 11], 0)
+        self.assertEqual(balance[1, 2], 0)
+        self.assertTrue(np.isnan(payment[1, 3:]).all())
+        self.assertAlmostEqual(np.nansum(principal[0]), 100000, places=6)
+
+    def test_outstanding_balances_follow_the_schedules(self):
+        _, _, _, balance = amortization_schedules([100000, 5000], [12, 0], [12, 3], [8884.88, 1666.67])
+        months = np.arange(1, 13)
+        after = outstanding_balances([100000] * 12, [12] * 12, [12] * 12, [8884.88] * 12, months)
+        np.testing.assert_allclose(after, balance[0])
+        self.assertEqual(outstanding_balances([5000], [0], [3], [1666.67], [0])[0], 5000)
+        self.assertEqual(outstanding_balances([5000], [0], [3], [1666.67], [5])[0], 0)
+
+    def test_schedule_endpoint_streams_every_installment(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000003,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        response = self.client.post('/api/create-loan/', {
+            'customer_id': customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 24,
+        }, content_type='application/json')
+        loan_id = response.json()['loan_id']
+
+        response = self.client.get(f'/api/view-loan/{loan_id}/schedule/')
+        self.assertTrue(response.streaming)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(body['schedule']), 24)
+        self.assertEqual(body['schedule'][-1]['balance'], '0.00')
+        self.assertEqual(sum(Decimal(row['principal']) for row in body['schedule']), Decimal('100000.00'))
+
+
+class ResponseCacheTests(ExcelDatasetTestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        reset_cache_stats()
+
+    def test_view_loan_is_served_from_cache(self):
+        loan_id = Loan.objects.values_list('loan_id', flat=True).first()
+        first = self.client.get(f'/api/view-loan/{loan_id}/')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(f'/api/view-loan/{loan_id}/')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(cache_stats()['loan'], {'hits': 1, 'misses': 1})
+
+    def test_missing_loan_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/view-loan/0/').status_code, 404)
+        self.assertEqual(self.client.get('/api/view-loan/0/').status_code, 404)
+        self.assertEqual(cache_stats()['loan'], {'hits': 0, 'misses': 2})
+
+    def test_create_loan_invalidates_customer_entries(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000004,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        self.assertEqual(self.client.get(f'/api/view-loans/{customer.pk}/').json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/create-loan/', {
+                'customer_id': customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+            }, content_type='application/json')
+        self.assertEqual(len(self.client.get(f'/api/view-loans/{customer.pk}/').json()), 1)
+
+    def test_batch_scores_are_cached_per_customer(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True)[:10])
+        self.client.post('/api/credit-scores/batch/', {'customer_ids': customer_ids[:5]}, content_type='application/json')
+        response = self.client.post('/api/credit-scores/batch/', {'customer_ids': customer_ids}, content_type='application/json')
+        self.assertEqual(len(response.json()['scores']), 10)
+        self.assertEqual(cache_stats()['credit-score'], {'hits': 5, 'misses': 10})
+
+
+class LoanListTests(ExcelDatasetTestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.customer_id = (
+            Loan.objects.values('customer_id').annotate(n=Count('loan_id')).order_by('-n').first()['customer_id']
+        )
+
+    def test_lean_rows_match_model_serializer(self):
+        queryset = LoanListSerializer.with_repayments_left(Loan.objects.filter(customer_id=self.customer_id))
+        expected = LoanListSerializer(queryset.order_by('loan_id'), many=True).data
+        response = self.client.get(f'/api/view-loans/{self.customer_id}/')
+        self.assertEqual(response.json(), json.loads(json.dumps(expected)))
+
+    def test_keyset_pages_cover_every_loan(self):
+        url, loan_ids = f'/api/view-loans/{self.customer_id}/?page_size=2', []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                body = self.client.get(url).json()
+            self.assertEqual(len(ctx.captured_queries), 1)
+            loan_ids += [row['loan_id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(loan_ids, sorted(Loan.objects.filter(customer_id=self.customer_id).values_list('loan_id', flat=True)))
+
+    def test_plain_list_is_capped_with_a_link_to_the_next_page(self):
+        loan_ids = list(Loan.objects.filter(customer_id=self.customer_id).order_by('loan_id').values_list('loan_id', flat=True))
+        for prefix in ('/api', '/api/async'):
+            django_cache.clear()
+            with mock.patch.object(LoanCursorPagination, 'max_page_size', 2):
+                response = self.client.get(f'{prefix}/view-loans/{self.customer_id}/')
+                self.assertEqual([row['loan_id'] for row in response.json()], loan_ids[:2])
+                # A cached list is capped the same way
+                self.assertEqual(self.client.get(f'{prefix}/view-loans/{self.customer_id}/')['Link'], response['Link'])
+
+                url, rest = response['Link'][1:-len('>; rel="next"')], []
+                while url:
+                    body = self.client.get(url).json()
+                    rest += [row['loan_id'] for row in body['results']]
+                    url = body['next']
+            self.assertEqual(loan_ids[:2] + rest, loan_ids)
+
+    def test_view_loan_uses_one_query(self):
+        loan_id = Loan.objects.values_list('loan_id', flat=True).first()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/view-loan/{loan_id}/')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific')
+class LoanIndexTests(TransactionTestCase):
+    """Checks that the eligibility aggregates are answered from the covering loan index."""
+
+    def setUp(self):
+        ingest_customers('customer_data.xlsx')
+        ingest_loans('loan_data.xlsx')
+        with connection.cursor() as cursor:
+            # Index-only scans need an up-to-date visibility map
+            cursor.execute('VACUUM ANALYZE api_loan')
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # The shipped dataset is small enough that a sequential scan would win on cost
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_aggregates_use_index_only_scan(self):
+        customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        queryset = Customer.objects.filter(pk=customer_id).annotate(**loan_aggregates()).values(
+            'approved_limit', 'current_debt_sum', 'num_current_loans', 'num_past_loans', 'num_late_loans'
+        )
+        plan = self.explain(queryset)
+        self.assertIn('Index Only Scan using loan_customer_end_date_idx', plan)
+
+    def test_active_emi_sum_uses_index_only_scan(self):
+        customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        queryset = Loan.objects.filter(customer_id=customer_id, end_date__gte=date.today()).values('customer_id').annotate(
+            total_emi=Sum('monthly_repayment'), total_amount=Sum('loan_amount')
+        )
+        plan = self.explain(queryset)
+        self.assertIn('Index Only Scan using loan_customer_end_date_idx', plan)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locking needs a database with SELECT ... FOR UPDATE')
+class ConcurrentCreateLoanTests(TransactionTestCase):
+
+    def create_loans_in_parallel(self, customer_id, requests, threads=8, headers=None):
+        payload = {'customer_id': customer_id, 'loan_amount': 225000, 'interest_rate': 12, 'tenure': 12}
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            try:
+                client = Client(headers=headers)
+                barrier.wait()
+                return [
+                    client.post('/api/create-loan/', payload, content_type='application/json').json()['loan_approved']
+                    for _ in range(requests // threads)
+                ]
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = [approved for batch in pool.map(lambda _: worker(), range(threads)) for approved in batch]
+        return results, time.perf_counter() - started
+
+    def test_no_oversubscription_or_lost_updates(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000005,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        # Each loan adds ~20k of EMI; loans are approved while existing EMIs are <= 50k
+        results, seconds = self.create_loans_in_parallel(customer.pk, requests=64)
+
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 3)
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, 3 * 225000)
+        summary = CustomerLoanSummary.objects.get(pk=customer.pk)
+        self.assertEqual(summary.active_loan_count, 3)
+        self.assertEqual(summary.active_principal, 3 * 225000)
+        self.assertLess(seconds, 30, f'{len(results) / seconds:.0f} requests/s')
+
+    def test_parallel_retries_with_one_idempotency_key_create_one_loan(self):
+        customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000006,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        results, _ = self.create_loans_in_parallel(customer.pk, requests=16, headers={'Idempotency-Key': 'retry-1'})
+
+        self.assertTrue(all(results))
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 1)
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, 225000)
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.customer = Customer.objects.create(
+            first_name='Test', last_name='User', phone_number=9000000007,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+        self.payload = {'customer_id': self.customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+
+    def post(self, payload, key):
+        return self.client.post('/api/create-loan/', payload, content_type='application/json', headers={'Idempotency-Key': key})
+
+    def test_retry_replays_stored_response(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.post(self.payload, 'key-1')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.post(self.payload, 'key-1')
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_replay_falls_back_to_database(self):
+        first = self.post(self.payload, 'key-2')
+        django_cache.clear()
+        self.assertEqual(self.post(self.payload, 'key-2').json(), first.json())
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self.post(self.payload, 'key-3')
+        response = self.post({**self.payload, 'loan_amount': 5000}, 'key-3')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post('/api/create-loan/', self.payload, content_type='application/json')
+        self.client.post('/api/create-loan/', self.payload, content_type='application/json')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 2)
+
+
+class CheckEligibilityBatchTests(ExcelDatasetTestCase):
+
+    def setUp(self):
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True)[:60]) + [0]
+        self.items = [
+            {'customer_id': customer_id, 'loan_amount': 50000 + 1000 * index, 'interest_rate': rate, 'tenure': 6 + index % 30}
+            for index, customer_id in enumerate(customer_ids)
+            for rate in (8, 11.5, 14, 20)
+        ] + [{'customer_id': 'x', 'loan_amount': 1000, 'interest_rate': 12, 'tenure': 12}, {'tenure': '12'}]
+
+    def single_results(self):
+        return [
+            self.client.post('/api/check-eligibility/', item, content_type='application/json').json()
+            for item in self.items
+        ]
+
+    def batch_results(self, body, content_type):
+        response = self.client.post('/api/check-eligibility/batch/', body, content_type=content_type)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_json_array_matches_single_endpoint(self):
+        self.assertEqual(self.batch_results(self.items, 'application/json'), self.single_results())
+
+    def test_ndjson_matches_single_endpoint(self):
+        body = '\n'.join(json.dumps(item) for item in self.items)
+        self.assertEqual(self.batch_results(body, 'application/x-ndjson'), self.single_results())
+
+    def test_query_count_does_not_grow_with_items(self):
+        rebuild_loan_summaries()
+        with CaptureQueriesContext(connection) as ctx:
+            self.batch_results(self.items, 'application/json')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class AsyncViewTests(ExcelDatasetTestCase):
+
+    def setUp(self):
+        django_cache.clear()
+        self.customer_id = Loan.objects.values_list('customer_id', flat=True).first()
+        self.loan_id = Loan.objects.values_list('loan_id', flat=True).first()
+
+    def assertSameResponse(self, sync_response, async_response):
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+
+    def test_check_eligibility_matches_sync_view(self):
+        for payload in (
+            {'customer_id': self.customer_id, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12},
+            {'customer_id': 0, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12},
+            {'customer_id': self.customer_id, 'tenure': 'x'},
+        ):
+            self.assertSameResponse(
+                self.client.post('/api/check-eligibility/', payload, content_type='application/json'),
+                async_to_sync(self.async_client.post)('/api/async/check-eligibility/', payload, content_type='application/json'),
+            )
+
+    def test_unparsable_bodies_are_rejected_like_the_sync_view(self):
+        payload = {'customer_id': self.customer_id, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12}
+        for body, content_type in (
+            (json.dumps(payload), 'text/plain'),
+            ('{"customer_id": ', 'application/json'),
+            (f'customer_id={self.customer_id}&loan_amount=100000&interest_rate=8&tenure=12',
+             'application/x-www-form-urlencoded'),
+        ):
+            self.assertSameResponse(
+                self.client.post('/api/check-eligibility/', body, content_type=content_type),
+                async_to_sync(self.async_client.post)('/api/async/check-eligibility/', body, content_type=content_type),
+            )
+        unsupported = async_to_sync(self.async_client.post)(
+            '/api/async/check-eligibility/', json.dumps(payload), content_type='text/plain',
+        )
+        self.assertEqual(unsupported.status_code, 415)
+
+    def test_posts_without_a_csrf_token_are_accepted(self):
+        payload = {'customer_id': self.customer_id, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12}
+        response = async_to_sync(AsyncClient(enforce_csrf_checks=True).post)(
+            '/api/async/check-eligibility/', payload, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, Client(enforce_csrf_checks=True).post(
+            '/api/check-eligibility/', payload, content_type='application/json',
+        ).content)
+
+    def test_asgi_routes_swap_in_the_async_views_once(self):
+        spec = importlib.util.find_spec('api.urls')
+        urls = importlib.util.module_from_spec(spec)
+        with override_settings(APP_SERVER='asgi'):
+            spec.loader.exec_module(urls)
+        names = [pattern.name for pattern in urls.urlpatterns]
+        # The async variants come first, so they win the shared names
+        self.assertEqual(names[:3], ['check-eligibility', 'view-loan', 'view-customer-loans'])
+        self.assertEqual(len(names) - 3, len(set(names)))
+        self.assertEqual(names.count('loan-repayments'), 1)
+
+    def test_view_loan_matches_sync_view(self):
+        for loan_id in (self.loan_id, 0):
+            django_cache.clear()
+            self.assertSameResponse(
+                self.client.get(f'/api/view-loan/{loan_id}/'),
+                async_to_sync(self.async_client.get)(f'/api/async/view-loan/{loan_id}/'),
+            )
+
+    def test_view_loans_matches_sync_view(self):
+        self.assertSameResponse(
+            self.client.get(f'/api/view-loans/{self.customer_id}/'),
+            async_to_sync(self.async_client.get)(f'/api/async/view-loans/{self.customer_id}/'),
+        )
+
+    def test_paginated_view_loans_matches_sync_view(self):
+        sync_page = self.client.get(f'/api/view-loans/{self.customer_id}/?page_size=2').json()
+        async_page = async_to_sync(self.async_client.get)(f'/api/async/view-loans/{self.customer_id}/?page_size=2').json()
+        self.assertEqual(async_page['results'], sync_page['results'])
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_seeding_is_deterministic_and_repeatable(self):
+        customer_ids, loan_ids = seed_synthetic_data(10, 3, seed=7)
+        first = list(Loan.objects.order_by('loan_id').values_list('customer_id', 'loan_amount', 'tenure', 'end_date'))
+        seed_synthetic_data(10, 3, seed=7)
+
+        self.assertEqual(customer_ids, list(range(1, 11)))
+        self.assertEqual(loan_ids, list(range(1, 31)))
+        self.assertEqual(Customer.objects.count(), 10)
+        self.assertEqual(CustomerLoanSummary.objects.count(), 10)
+        self.assertEqual(
+            list(Loan.objects.order_by('loan_id').values_list('customer_id', 'loan_amount', 'tenure', 'end_date')),
+            first,
+        )
+
+    def test_micro_benchmarks_report_latency_percentiles(self):
+        customer_ids, _ = seed_synthetic_data(5, 2)
+        results = run_micro_benchmarks(customer_ids, iterations=5)
+
+        self.assertIn('calculate_credit_score', results)
+        for stats in results.values():
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+
+    def test_every_endpoint_is_load_tested_successfully(self):
+        customer_ids, loan_ids = seed_synthetic_data(5, 2)
+        results = run_endpoint_benchmarks(customer_ids, loan_ids, requests=3)
+
+        self.assertEqual(set(results), set(endpoint_requests(customer_ids, loan_ids)))
+        for name, stats in results.items():
+            self.assertEqual(stats['calls'], 3)
+            self.assertTrue(all(code.startswith('2') for code in stats['status_codes']), name)
+            self.assertGreater(stats['requests_per_second'], 0)
+        self.assertEqual(results['view-loan']['queries_per_request'], 1)
+
+    def test_response_path_is_benchmarked_for_every_rendered_endpoint(self):
+        customer_ids, loan_ids = seed_synthetic_data(5, 2)
+        results = run_response_benchmarks(customer_ids, loan_ids, iterations=3)
+
+        self.assertEqual(set(results), set(endpoint_requests(customer_ids, loan_ids)) - {'view-loan-schedule'})
+        for stats in results.values():
+            self.assertGreater(stats['stock_cpu_us'], 0)
+            self.assertEqual(stats['saved_cpu_us'], round(stats['stock_cpu_us'] - stats['lean_cpu_us'], 2))
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Meter', last_name='Ed', age=40, phone_number=7100000001,
+            monthly_salary=100000, approved_limit=3600000,
+        )
+
+    def setUp(self):
+        reset_metrics()
+
+    def check_eligibility(self):
+        return self.client.post('/api/check-eligibility/', {
+            'customer_id': self.customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }, content_type='application/json')
+
+    def test_server_timing_header_reports_queries_and_phases(self):
+        self.check_eligibility()
+        response = self.check_eligibility()
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        for phase in ('load', 'evaluate', 'serialize', 'total'):
+            self.assertIn(f'{phase};dur=', timing)
+
+    def test_async_views_are_instrumented(self):
+        response = async_to_sync(self.async_client.post)('/api/async/check-eligibility/', {
+            'customer_id': self.customer.pk, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }, content_type='application/json')
+
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertIn('load;dur=', response['Server-Timing'])
+
+    def test_streaming_responses_are_recorded_once_their_content_is_sent(self):
+        Loan.objects.create(customer=self.customer, loan_amount=100000, tenure=12, interest_rate=12,
+                            monthly_repayment=8885, emis_paid_on_time=0, start_date=date.today(),
+                            end_date=date.today() + timedelta(days=365))
+
+        response = self.client.get('/api/export/loans/?format=ndjson')
+        self.assertNotIn('api_requests_total{endpoint="export-loans"', render_prometheus())
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+        body = render_prometheus()
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('api_requests_total{endpoint="export-loans",method="GET",status="200"} 1', body)
+        self.assertIn('api_db_queries_per_request_bucket{endpoint="export-loans",le="0.0"} 0', body)
+
+    def test_metrics_endpoint_exposes_prometheus_histograms(self):
+        self.check_eligibility()
+        self.check_eligibility()
+        body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('# TYPE api_request_duration_seconds histogram', body)
+        self.assertIn('api_requests_total{endpoint="check-eligibility",method="POST",status="200"} 2', body)
+        self.assertIn('api_request_duration_seconds_count{endpoint="check-eligibility"} 2', body)
+        self.assertIn('api_db_queries_per_request_bucket{endpoint="check-eligibility",le="+Inf"} 2', body)
+        self.assertIn('api_phase_duration_seconds_count{endpoint="check-eligibility",phase="load"} 2', body)
+
+    def test_unmatched_paths_share_one_series(self):
+        self.client.get('/api/no-such-endpoint/1/')
+        self.client.get('/api/no-such-endpoint/2/')
+
+        self.assertIn('api_requests_total{endpoint="unmatched",method="GET",status="404"} 2', render_prometheus())
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.check_eligibility()
+
+        self.assertIn('POST /api/check-eligibility/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=None)
+    def test_slow_request_log_can_be_disabled(self):
+        with self.assertNoLogs('api.slow_requests', 'WARNING'):
+            self.check_eligibility()
+
+    def test_credit_score_calculation_is_timed_as_a_phase(self):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            calculate_credit_score(self.customer.pk)
+        finally:
+            current_timings.reset(token)
+
+        self.assertIn('credit_score', timings.phases)
+        self.assertEqual(timings.query_count, 1)
+
+
+class CreditScoreSnapshotTests(ExcelDatasetTestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.customer_ids = list(Customer.objects.order_by('pk').values_list('pk', flat=True)[:50])
+
+    def test_snapshots_match_live_scores(self):
+        compute_snapshots(self.customer_ids)
+
+        snapshots = dict(CreditScoreSnapshot.objects.values_list('customer_id', 'credit_score'))
+        self.assertEqual(snapshots, score_customers(self.customer_ids))
+
+    def test_refresh_recomputes_missing_rolled_over_and_expiring_snapshots(self):
+        compute_snapshots(self.customer_ids)
+        missing, rolled_over, expiring, fresh = self.customer_ids[:4]
+        CreditScoreSnapshot.objects.filter(pk=missing).delete()
+        CreditScoreSnapshot.objects.filter(pk=rolled_over).update(valid_until=date.today() - timedelta(days=1))
+        CreditScoreSnapshot.objects.filter(pk=expiring).update(computed_at=timezone.now() - timedelta(days=1))
+        before = CreditScoreSnapshot.objects.get(pk=fresh).computed_at
+
+        refresh_credit_score_snapshots()
+
+        self.assertTrue(CreditScoreSnapshot.objects.filter(pk=missing).exists())
+        self.assertNotEqual(CreditScoreSnapshot.objects.get(pk=rolled_over).valid_until, date.today() - timedelta(days=1))
+        self.assertGreater(CreditScoreSnapshot.objects.get(pk=expiring).computed_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(CreditScoreSnapshot.objects.get(pk=fresh).computed_at, before)
+
+    def test_eligibility_reads_a_fresh_snapshot_in_the_same_query(self):
+        customer_id = self.customer_ids[0]
+        compute_snapshots([customer_id])
+        # A score of 0 is never approved, which shows the snapshot was used
+        CreditScoreSnapshot.objects.filter(pk=customer_id).update(credit_score=0)
+
+        with self.assertNumQueries(1):
+            self.assertFalse(eligibility_engine.check(customer_id, 1000, 20, 12).approval)
+
+    def test_eligibility_scores_live_when_the_snapshot_is_too_old(self):
+        customer_id = self.customer_ids[0]
+        live = eligibility_engine.check(customer_id, 1000, 20, 12)
+        compute_snapshots([customer_id])
+        CreditScoreSnapshot.objects.filter(pk=customer_id).update(
+            credit_score=0, computed_at=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(eligibility_engine.check(customer_id, 1000, 20, 12), live)
+
+    def test_loan_writes_drop_the_snapshot(self):
+        customer_id = next(pk for pk in self.customer_ids if eligibility_engine.check(pk, 1000, 20, 12).approval)
+        compute_snapshots([customer_id])
+        response = self.client.post('/api/create-loan/', {
+            'customer_id': customer_id, 'loan_amount': 1000, 'interest_rate': 20, 'tenure': 12,
+        }, content_type='application/json')
+
+        self.assertTrue(response.json()['loan_approved'])
+        self.assertFalse(CreditScoreSnapshot.objects.filter(pk=customer_id).exists())
+
+    def test_batch_scores_read_fresh_snapshots(self):
+        compute_snapshots(self.customer_ids[:1])
+        CreditScoreSnapshot.objects.filter(pk=self.customer_ids[0]).update(credit_score=42)
+
+        response = self.client.post('/api/credit-scores/batch/', {'customer_ids': self.customer_ids[:2]},
+                                    content_type='application/json')
+
+        scores = {row['customer_id']: row['credit_score'] for row in response.json()['scores']}
+        self.assertEqual(scores[self.customer_ids[0]], 42)
+        self.assertEqual(scores[self.customer_ids[1]], calculate_credit_score(self.customer_ids[1]))
+
+
+class LoanExportTests(ExcelDatasetTestCase):
+    def export(self, file_format):
+        response = self.client.get(f'/api/export/loans/?format={file_format}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def assertMatchesLoanBook(self, rows):
+        self.assertEqual(len(rows), Loan.objects.count())
+        self.assertEqual(len({row['loan_id'] for row in rows}), len(rows))
+        row = rows[0]
+        loan = Loan.objects.get(pk=row['loan_id'])
+        self.assertEqual(int(row['repayments_left']), loan.tenure - loan.emis_paid_on_time)
+        self.assertEqual(int(row['credit_score']), calculate_credit_score(loan.customer_id))
+        self.assertEqual(Decimal(str(row['loan_amount'])), loan.loan_amount)
+
+    def test_csv_export(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode())))
+
+        self.assertEqual(list(rows[0]), FIELDS)
+        self.assertMatchesLoanBook(rows)
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.export('ndjson').decode().splitlines()]
+
+        self.assertEqual(list(rows[0]), FIELDS)
+        self.assertMatchesLoanBook(rows)
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_export(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(self.export('parquet')))
+
+        self.assertEqual(table.column_names, FIELDS)
+        self.assertMatchesLoanBook(table.to_pylist())
+
+    def test_export_reads_only_and_scores_each_chunk_in_one_query(self):
+        customer_ids = list(Customer.objects.order_by('customer_id').values_list('customer_id', flat=True))
+        CustomerLoanSummary.objects.filter(customer_id__in=customer_ids[::2]).delete()
+        stale = CustomerLoanSummary.objects.exclude(next_rollover=None).first()
+        stale.next_rollover = date.today() - timedelta(days=1)
+        stale.active_loan_count += 1
+        stale.save()
+        chunk_size = 500
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(export_rows(chunk_size))
+
+        self.assertFalse([query for query in ctx.captured_queries
+                          if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')])
+        self.assertLessEqual(len(ctx.captured_queries), 1 + -(-len(rows) // chunk_size))
+        self.assertEqual(CustomerLoanSummary.objects.get(pk=stale.pk).active_loan_count, stale.active_loan_count)
+        scores = score_customers(customer_ids)
+        for row in rows:
+            self.assertEqual(row['credit_score'], scores[row['customer_id']], row['customer_id'])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/api/export/loans/?format=xml')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_data_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'loans.ndjson')
+            call_command('export_data', format='ndjson', output=path, chunk_size=100, stderr=io.StringIO())
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertMatchesLoanBook(rows)
+
+
+class ConnectionReuseBenchmarkTests(TransactionTestCase):
+    @skipIf(settings.DATABASES['default']['OPTIONS'].get('pool'), 'A connection pool replaces CONN_MAX_AGE')
+    def test_persistent_connections_are_opened_once(self):
+        customer_ids, _ = seed_synthetic_data(5, 2)
+
+        results = run_connection_benchmarks(customer_ids, requests=5, conn_max_age=60)
+
+        self.assertEqual(results['per_request']['connections_opened'], 5)
+        self.assertLessEqual(results['persistent']['connections_opened'], 1)
+        self.assertLess(results['persistent']['connection_setup_share'], results['per_request']['connection_setup_share'])
+
+    @skipUnless(settings.DATABASES['default']['OPTIONS'].get('pool'), 'Set DB_POOL_MAX_SIZE to use a connection pool')
+    def test_pooled_requests_check_a_connection_out(self):
+        customer_ids, _ = seed_synthetic_data(5, 2)
+
+        results = run_connection_benchmarks(customer_ids, requests=5)
+
+        self.assertEqual(list(results), ['connection_setup_ms', 'pooled'])
+        self.assertEqual(results['pooled']['connections_opened'], 5)
+
+
+class PortfolioRollupTests(ExcelDatasetTestCase):
+    def rollups(self):
+        return sorted(
+            PortfolioRollup.objects.filter(loan_count__gt=0).values_list(
+                'score_tier', 'rate_band', 'tenure_bucket', 'origination_month',
+                'loan_count', 'total_principal', 'total_monthly_repayment',
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        rebuild_portfolio_rollups()
+        self.assertEqual(incremental, self.rollups())
+
+    def portfolio(self, query=''):
+        return self.client.get(f'/api/analytics/portfolio/{query}')
+
+    def test_ingestion_maintains_rollups(self):
+        self.assertFalse(Loan.objects.filter(origination_score__isnull=True).exists())
+        self.assertEqual(sum(row[4] for row in self.rollups()), Loan.objects.count())
+        self.assertMatchesRebuild()
+
+    def test_reingestion_moves_rather_than_duplicates_loans(self):
+        ingest_loan_data()
+
+        self.assertEqual(sum(row[4] for row in self.rollups()), Loan.objects.count())
+        self.assertMatchesRebuild()
+
+    def test_created_loans_are_added_to_their_slice(self):
+        customer_id = next(
+            pk for pk in Customer.objects.values_list('pk', flat=True)
+            if eligibility_engine.check(pk, 1000, 20, 12).approval
+        )
+        response = self.client.post('/api/create-loan/', {
+            'customer_id': customer_id, 'loan_amount': 1000, 'interest_rate': 20, 'tenure': 12,
+        }, content_type='application/json')
+        loan = Loan.objects.get(pk=response.json()['loan_id'])
+
+        self.assertIsNotNone(loan.origination_score)
+        self.assertMatchesRebuild()
+
+    def test_totals_cover_the_whole_book(self):
+        with self.assertNumQueries(2):
+            data = self.portfolio('?group_by=score_tier').json()
+
+        book = Loan.objects.aggregate(count=Count('loan_id'), principal=Sum('loan_amount'))
+        self.assertEqual(data['totals']['loan_count'], book['count'])
+        self.assertEqual(Decimal(data['totals']['total_principal']), book['principal'])
+        self.assertEqual(sum(row['loan_count'] for row in data['results']), book['count'])
+        self.assertEqual([row['score_tier'] for row in data['results']], sorted(row['score_tier'] for row in data['results']))
+
+    def test_slices_can_be_filtered(self):
+        data = self.portfolio('?group_by=origination_month&tenure_bucket=1-12,13-24&month_from=2015-01').json()
+
+        expected = Loan.objects.filter(tenure__lte=24, start_date__gte=date(2015, 1, 1)).count()
+        self.assertEqual(data['totals']['loan_count'], expected)
+        self.assertTrue(all(row['origination_month'] >= '2015-01' for row in data['results']))
+
+    def test_unknown_dimension_is_rejected(self):
+        self.assertEqual(self.portfolio('?group_by=branch').status_code, 400)
+
+
+class RegisterBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.create(
+            first_name='Taken', last_name='Phone', age=30, phone_number=7200000000,
+            monthly_salary=50000, approved_limit=1800000,
+        )
+
+    def items(self, count=20, offset=0):
+        items = [
+            {'first_name': f'First{i}', 'last_name': f'Last{i}', 'age': 20 + i % 40,
+             'monthly_salary': 10000 + 1387 * i, 'phone_number': 7200000001 + offset + i}
+            for i in range(count)
+        ]
+        return items + [
+            {'first_name': 'Again', 'last_name': 'Dup', 'age': 30, 'monthly_salary': 40000, 'phone_number': 7200000001 + offset},
+            {'first_name': 'Old', 'last_name': 'Phone', 'age': 30, 'monthly_salary': 40000, 'phone_number': 7200000000},
+            {'first_name': '  Padded ', 'last_name': 'Name', 'monthly_salary': '45000', 'phone_number': 7100000000 + offset},
+            {'first_name': 'No', 'last_name': 'Salary', 'phone_number': 7100000001 + offset},
+            {'first_name': '', 'last_name': 'Blank', 'monthly_salary': 1, 'phone_number': 'x'},
+            ['not', 'an', 'object'],
+        ]
+
+    def batch(self, body, content_type='application/json'):
+        response = self.client.post('/api/register/batch/', body, content_type=content_type)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def single(self, items):
+        with transaction.atomic():
+            results = [
+                self.client.post('/api/register/', item, content_type='application/json').json()
+                for item in items
+            ]
+            transaction.set_rollback(True)
+        return results
+
+    @staticmethod
+    def without_ids(results):
+        return [{key: value for key, value in result.items() if key != 'customer_id'} for result in results]
+
+    def test_results_match_single_endpoint_in_input_order(self):
+        items = self.items()
+        expected = self.single(items)
+        results = self.batch(items)
+
+        self.assertEqual(self.without_ids(results), self.without_ids(expected))
+        created = [result['customer_id'] for result in results if 'customer_id' in result]
+        self.assertEqual(len(created), 21)
+        self.assertEqual(Customer.objects.filter(pk__in=created).count(), 21)
+
+    def test_ndjson_body(self):
+        items = self.items(5)
+        expected = self.single(items)
+        results = self.batch('\n'.join(json.dumps(item) for item in items), 'application/x-ndjson')
+
+        self.assertEqual(self.without_ids(results), self.without_ids(expected))
+
+    def test_query_count_does_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as small:
+            self.batch(self.items(5))
+        with CaptureQueriesContext(connection) as large:
+            self.batch(self.items(500, offset=1000))
+
+        self.assertEqual(len(large), len(small))
+
+    def test_rows_failing_at_insert_do_not_fail_the_chunk(self):
+        items = self.items(3, offset=2000)[:3] + [
+            # Valid input whose approved_limit overflows the integer column
+            {'first_name': 'Very', 'last_name': 'Rich', 'monthly_salary': 2**31 - 1, 'phone_number': 7300000000},
+        ]
+        results = self.batch(items)
+
+        self.assertTrue(all('customer_id' in result for result in results[:3]))
+        self.assertNotIn('customer_id', results[3])
+        self.assertFalse(Customer.objects.filter(phone_number=7300000000).exists())
+
+    def test_every_chunk_is_registered_before_the_response_streams(self):
+        items = self.items(20, offset=3000)
+        with mock.patch('api.views.RegisterBatchAPIView.chunk_size', 5):
+            response = self.client.post('/api/register/batch/', items, content_type='application/json')
+            # The client reads one chunk and disconnects
+            first = next(iter(response.streaming_content))
+
+        self.assertEqual(len(first.splitlines()), 5)
+        self.assertEqual(Customer.objects.filter(phone_number__range=(7200003001, 7200003020)).count(), 20)
+
+    def test_approved_limits_match_the_serializer(self):
+        salaries = list(range(0, 500000, 1373)) + [13889, 41667, 2777]
+        self.assertEqual(approved_limits(salaries).tolist(), [round(36 * s / 100000) * 100000 for s in salaries])
+
+    def test_non_list_body_is_rejected(self):
+        response = self.client.post('/api/register/batch/', {'first_name': 'x'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseContractTests(ExcelDatasetTestCase):
+    """The lean response path must produce the same JSON as the serializers and DRF's renderer."""
+
+    def decisions(self):
+        base = dict(customer_id=7, credit_score=55, interest_rate=12.0, corrected_interest_rate=None,
+                    final_interest_rate=12.0, tenure=24, loan_amount=100000.0, monthly_installment=4707.347222)
+        yield EligibilityDecision(approval=True, **base)
+        yield EligibilityDecision(approval=False, **{**base, 'monthly_installment': 0.0})
+        # Integer rates from a request and the rate tiers still come out as floats
+        yield EligibilityDecision(approval=True, **{**base, 'interest_rate': 9, 'corrected_interest_rate': 16})
+        yield EligibilityDecision(approval=True, **{**base, 'corrected_interest_rate': 12.5})
+
+    @staticmethod
+    def round_trip(serializer_class, data):
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.data
+
+    def assertSameJSON(self, lean, reference):
+        self.assertEqual(list(lean), list(reference))
+        self.assertEqual({key: type(value) for key, value in lean.items()},
+                         {key: type(value) for key, value in reference.items()})
+        self.assertEqual(ORJSONRenderer().render(lean), JSONRenderer().render(reference))
+
+    def test_eligibility_response_matches_its_serializer(self):
+        for decision in self.decisions():
+            reference = self.round_trip(LoanEligibilityResponseSerializer, {
+                'customer_id': decision.customer_id, 'approval': decision.approval,
+                'interest_rate': decision.interest_rate, 'corrected_interest_rate': decision.corrected_interest_rate,
+                'tenure': decision.tenure, 'monthly_installment': round(decision.monthly_installment, 2),
+            })
+            self.assertSameJSON(EligibilityResponse.from_decision(decision).to_dict(), reference)
+
+    def test_create_loan_response_matches_its_serializer(self):
+        for decision in self.decisions():
+            for loan_id in (None, 42):
+                reference = self.round_trip(CreateLoanResponseSerializer, {
+                    'loan_id': loan_id, 'customer_id': decision.customer_id, 'loan_approved': decision.approval,
+                    'message': CreateLoanResponse.from_decision(decision, loan_id).message,
+                    'monthly_installment': round(decision.monthly_installment, 2),
+                })
+                self.assertSameJSON(CreateLoanResponse.from_decision(decision, loan_id).to_dict(), reference)
+
+    def test_renderer_output_is_byte_compatible(self):
+        data = {
+            'name': 'Zoë \u2028 Ünal', 'amount': Decimal('1234.50'), 'rate': 12.5, 'whole': 3.0, 'none': None,
+            'flags': [True, False], 'nested': {1: 'int key', 'list': (1, 2)}, 'big': 2**70,
+            'at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), 'on': date(2025, 1, 2),
+            'time': clock_time(3, 4, 5, 678901), 'error': ErrorDetail('This field is required.', code='required'),
+            'lazy': gettext_lazy('This field may not be null.'),
+            'floats': [1e16, -1e16, 1e-05, 5e-324, 1.7976931348623157e308, 9999999999999998.0, 0.0001, -0.0],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render([1e16]), b'[1e+16]')
+        self.assertEqual(ORJSONRenderer().render({'rate': 1e-05}), b'{"rate":1e-05}')
+        with override_settings(REST_FRAMEWORK={'COERCE_DECIMAL_TO_STRING': False}):
+            self.assertEqual(ORJSONRenderer().render([Decimal('1E+16')]), JSONRenderer().render([Decimal('1E+16')]))
+        for value in (float('nan'), float('inf'), -float('inf')):
+            for renderer in (ORJSONRenderer(), JSONRenderer()):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    renderer.render({'score': [value]})
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_parser_matches_drf(self):
+        body = json.dumps({'customer_id': 1, 'loan_amount': 1.5, 'name': 'Zoë', 'items': [1, None, True]}).encode()
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for invalid in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(invalid))
+
+    def test_endpoints_render_as_drf_would(self):
+        customer_id = Customer.objects.order_by('pk').values_list('pk', flat=True).first()
+        loan_id = Loan.objects.order_by('pk').values_list('pk', flat=True).first()
+        payload = {'customer_id': customer_id, 'loan_amount': 50000, 'interest_rate': 12, 'tenure': 12}
+        responses = [
+            self.client.post('/api/check-eligibility/', payload, content_type='application/json'),
+            self.client.post('/api/create-loan/', payload, content_type='application/json'),
+            self.client.get(f'/api/view-loan/{loan_id}/'),
+            self.client.get(f'/api/view-loans/{customer_id}/'),
+            self.client.post('/api/check-eligibility/', {}, content_type='application/json'),
+        ]
+        for response in responses:
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response.content, JSONRenderer().render(json.loads(response.content)))
+
+        eligibility, loan = responses[0].json(), responses[1].json()
+        self.assertEqual(list(eligibility), list(LoanEligibilityResponseSerializer().fields))
+        self.assertIsInstance(eligibility['interest_rate'], float)
+        self.assertIsInstance(eligibility['monthly_installment'], float)
+        self.assertEqual(list(loan), list(CreateLoanResponseSerializer().fields))
+
+
+class StartupTests(SimpleTestCase):
+    """Guards how long a server process takes to start and how much memory it holds once warmed up."""
+    # Generous for CI machines; override to tighten locally
+    STARTUP_SECONDS_BUDGET = float(os.environ.get('STARTUP_SECONDS_BUDGET', 5))
+    STARTUP_RSS_MB_BUDGET = float(os.environ.get('STARTUP_RSS_MB_BUDGET', 200))
+
+    def profile(self, *modules):
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path), 'CACHE_BACKEND': 'locmem'}
+        result = subprocess.run(
+            [sys.executable, '-m', 'core.warmup', *modules],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_web_startup_stays_within_budget(self):
+        profile = self.profile()
+
+        self.assertEqual(profile['heavy_modules'], [])
+        self.assertLess(profile['startup_seconds'], self.STARTUP_SECONDS_BUDGET)
+        self.assertLess(profile['max_rss_mb'], self.STARTUP_RSS_MB_BUDGET)
+
+    def test_worker_and_commands_import_without_heavy_modules(self):
+        profile = self.profile('api.tasks', 'api.management.commands.ingest_data',
+                               'api.management.commands.export_data')
+        self.assertEqual(profile['heavy_modules'], [])
+
+    def load_gunicorn_config(self, **env):
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py')
+        config = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, env), mock.patch('gc.disable'):
+            spec.loader.exec_module(config)
+        return config
+
+    def test_gunicorn_config_preloads_and_tunes_workers_from_env(self):
+        config = self.load_gunicorn_config(WEB_CONCURRENCY='4', GUNICORN_THREADS='8')
+        self.assertTrue(config.preload_app)
+        self.assertEqual((config.workers, config.threads, config.worker_class), (4, 8, 'gthread'))
+
+        config = self.load_gunicorn_config(GUNICORN_PRELOAD='0', GUNICORN_THREADS='1', APP_SERVER='wsgi')
+        self.assertFalse(config.preload_app)
+        self.assertEqual(config.worker_class, 'sync')
+
+
+class RepaymentLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        cls.customer = Customer.objects.create(
+            first_name='Pay', last_name='Er', age=35, phone_number=7400000000,
+            monthly_salary=100000, approved_limit=3600000, current_debt=100000,
+        )
+        cls.loan = Loan.objects.create(
+            customer=cls.customer, loan_amount=Decimal('100000.00'), tenure=12, interest_rate=Decimal('12.00'),
+            monthly_repayment=to_money(emi(100000, 12, 12), max_digits=10), emis_paid_on_time=0,
+            start_date=today, end_date=today + timedelta(days=360),
+        )
+        # Closed, with one installment never paid on time
+        cls.late_loan = Loan.objects.create(
+            customer=cls.customer, loan_amount=Decimal('20000.00'), tenure=6, interest_rate=Decimal('10.00'),
+            monthly_repayment=to_money(emi(20000, 10, 6), max_digits=10), emis_paid_on_time=5,
+            start_date=today - timedelta(days=400), end_date=today - timedelta(days=220),
+        )
+        rebuild_loan_summaries([cls.customer.pk])
+
+    def post(self, loan, body=None):
+        return self.client.post(f'/api/loans/{loan.pk}/repayments/', body or {}, content_type='application/json')
+
+    def batch(self, items, content_type='application/json'):
+        body = items if content_type == 'application/json' else '\n'.join(json.dumps(item) for item in items)
+        response = self.client.post('/api/repayments/batch/', body, content_type=content_type)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_posting_the_next_installment_updates_the_counters(self):
+        response = self.post(self.loan)
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['installment_number'], data['on_time']), (1, True))
+        self.assertEqual(data['amount'], str(self.loan.monthly_repayment))
+        self.assertEqual(data, RepaymentSerializer(Repayment.objects.get(pk=data['repayment_id'])).data)
+        self.loan.refresh_from_db()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.loan.emis_paid_on_time, 1)
+        self.assertEqual(self.customer.current_debt, 100000 - data['principal_repaid'])
+        self.assertEqual(self.client.get(f'/api/loans/{self.loan.pk}/repayments/').json(), [data])
+
+    def test_every_installment_repays_the_whole_principal(self):
+        results = self.batch([{'loan_id': self.loan.pk} for _ in range(13)])
+
+        self.assertEqual([result.get('installment_number') for result in results[:12]], list(range(1, 13)))
+        self.assertEqual(sum(result['principal_repaid'] for result in results[:12]), 100000)
+        self.assertEqual(results[12], {'installment_number': ['Every installment of this loan has already been paid.']})
+        self.customer.refresh_from_db()
+        self.loan.refresh_from_db()
+        self.assertEqual((self.customer.current_debt, self.loan.emis_paid_on_time), (0, 12))
+
+    def test_every_chunk_is_posted_before_the_response_streams(self):
+        with mock.patch('api.views.RepaymentBatchAPIView.chunk_size', 4):
+            response = self.client.post('/api/repayments/batch/', [{'loan_id': self.loan.pk}] * 12,
+                                        content_type='application/json')
+            # The client reads one chunk and disconnects
+            first = next(iter(response.streaming_content))
+
+        self.assertEqual(len(first.splitlines()), 4)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.emis_paid_on_time, 12)
+
+    def test_late_underpaid_and_duplicate_installments(self):
+        first = self.post(self.loan, {'installment_number': 1})
+        short = self.post(self.loan, {'installment_number': 2, 'amount': 10})
+        again = self.post(self.loan, {'installment_number': 1})
+
+        self.assertTrue(first.json()['on_time'])
+        # Due 180 days after a start 400 days ago
+        self.assertFalse(self.post(self.late_loan, {'installment_number': 6}).json()['on_time'])
+        self.assertEqual(short.status_code, 400)
+        self.assertEqual(short.json(), {'amount': [f'Ensure this value is greater than or equal to {self.loan.monthly_repayment}.']})
+        self.assertEqual(again.status_code, 409)
+        self.assertEqual(self.post(self.loan, {'installment_number': 13}).status_code, 400)
+        missing = self.client.post('/api/loans/999999/repayments/', {}, content_type='application/json')
+        self.assertEqual(missing.status_code, 404)
+        self.loan.refresh_from_db()
+        self.late_loan.refresh_from_db()
+        # The late installment is not counted as paid on time
+        self.assertEqual((self.loan.emis_paid_on_time, self.late_loan.emis_paid_on_time), (1, 5))
+        self.assertEqual(Repayment.objects.filter(loan=self.loan).count(), 1)
+        # The short payment did not claim installment 2
+        self.assertEqual(self.post(self.loan, {'installment_number': 2}).status_code, 201)
+
+    def test_payment_dates_in_the_future_or_before_the_loan_started_are_rejected(self):
+        future = {'installment_number': 1, 'paid_on': str(date.today() + timedelta(days=1))}
+        early = {'installment_number': 1, 'paid_on': str(self.loan.start_date - timedelta(days=1))}
+
+        self.assertEqual(self.post(self.loan, future).status_code, 400)
+        self.assertEqual(self.post(self.loan, future).json(), {'paid_on': ['Ensure this date is not in the future.']})
+        self.assertEqual(self.post(self.loan, early).json(), {
+            'paid_on': [f"Ensure this date is on or after the loan's start date, {self.loan.start_date.isoformat()}."]
+        })
+        results = self.batch([{'loan_id': self.loan.pk, **future}, {'loan_id': self.loan.pk, **early},
+                              {'loan_id': self.loan.pk}])
+        self.assertEqual([list(result) for result in results[:2]], [['paid_on'], ['paid_on']])
+        # The rejected rows claimed no installment
+        self.assertEqual(results[2]['installment_number'], 1)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.emis_paid_on_time, 1)
+
+    def test_installments_paid_before_the_ledger_cannot_be_posted(self):
+        # Closed with 5 of 6 installments counted as paid on time at ingestion
+        early = self.post(self.late_loan, {'installment_number': 5})
+        self.assertEqual(early.status_code, 409)
+        last = self.post(self.late_loan, {'installment_number': 6, 'paid_on': str(date.today() - timedelta(days=230))})
+        self.assertEqual(last.status_code, 201)
+        # Counted once, and still recognized as pre-ledger after the ledger row raised the counter
+        self.assertEqual(self.post(self.late_loan, {'installment_number': 1}).status_code, 409)
+        self.late_loan.refresh_from_db()
+        self.assertEqual(self.late_loan.emis_paid_on_time, 6)
+
+    def test_settling_a_late_closed_loan_improves_the_credit_score(self):
+        before = calculate_credit_score(self.customer.pk)
+        compute_snapshots([self.customer.pk])
+
+        response = self.post(self.late_loan, {'paid_on': str(self.late_loan.start_date + timedelta(days=150))})
+
+        self.assertTrue(response.json()['on_time'])
+        summary = CustomerLoanSummary.objects.get(pk=self.customer.pk)
+        self.assertEqual(summary.late_loan_count, 0)
+        self.assertFalse(CreditScoreSnapshot.objects.filter(pk=self.customer.pk).exists())
+        self.assertEqual(calculate_credit_score(self.customer.pk), before + 25)
+        # The incremental summary agrees with a recount
+        rebuild_loan_summaries([self.customer.pk])
+        self.assertEqual(CustomerLoanSummary.objects.get(pk=self.customer.pk).late_loan_count, 0)
+
+    def test_batch_errors_match_the_serializer(self):
+        items = [
+            {'loan_id': self.loan.pk, 'amount': 9000.5, 'paid_on': str(date.today())},
+            {'loan_id': self.loan.pk, 'amount': 1.005},
+            {'loan_id': self.loan.pk, 'installment_number': 0},
+            {'loan_id': self.loan.pk, 'paid_on': 'yesterday'},
+            {'loan_id': self.loan.pk, 'installment_number': None},
+            {'loan_id': 'x'},
+            {'amount': 10},
+            {'loan_id': 999999},
+            ['not', 'an', 'object'],
+        ]
+        results = self.batch(items, 'application/x-ndjson')
+
+        self.assertEqual(results[0]['installment_number'], 1)
+        self.assertEqual(results[7], {'loan_id': ['Loan not found.']})
+        for item, result in zip(items[1:7] + items[8:], results[1:7] + results[8:]):
+            serializer = RepaymentBatchItemSerializer(data=item)
+            self.assertFalse(serializer.is_valid())
+            self.assertEqual(result, json.loads(json.dumps(serializer.errors)), item)
+
+    def test_posting_a_file_is_set_based_and_idempotent_with_emi_numbers(self):
+        loans = [
+            Loan.objects.create(
+                customer=self.customer, loan_amount=Decimal('50000.00'), tenure=24, interest_rate=Decimal('14.00'),
+                monthly_repayment=to_money(emi(50000, 14, 24), max_digits=10), emis_paid_on_time=0,
+                start_date=date.today(), end_date=date.today() + timedelta(days=720),
+            )
+            for _ in range(20)
+        ]
+
+        def write_file(count):
+            path = os.path.join(tempfile.mkdtemp(), 'repayments.csv')
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Loan ID', 'EMI Number', 'Amount', 'Payment Date'])
+                for loan in loans[:count]:
+                    for number in range(1, 11):
+                        writer.writerow([loan.pk, number, loan.monthly_repayment, date.today().isoformat()])
+                writer.writerow(['oops', 1, 10, 'never'])
+            return path
+
+        with CaptureQueriesContext(connection) as small:
+            call_command('post_repayments', write_file(2), stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as large:
+            call_command('post_repayments', write_file(20), stdout=io.StringIO())
+        call_command('post_repayments', write_file(20), stdout=io.StringIO())
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Repayment.objects.filter(loan__in=loans).count(), 200)
+        paid = Loan.objects.filter(pk__in=[loan.pk for loan in loans]).values_list('emis_paid_on_time', flat=True)
+        self.assertEqual(set(paid), {10})
+
+    def test_ledger_rows_cannot_be_changed(self):
+        self.post(self.loan)
+        repayment = Repayment.objects.get(loan=self.loan)
+        repayment.amount = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            repayment.save()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning is PostgreSQL specific')
+class LoanPartitioningTests(TestCase):
+    def loan_rows(self):
+        return list(Loan.objects.order_by('loan_id').values_list(
+            'loan_id', 'customer_id', 'loan_amount', 'emis_paid_on_time', 'start_date', 'end_date',
+        ))
+
+    def foreign_keys(self, table):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        return sorted(constraint['foreign_key'] for constraint in constraints.values() if constraint['foreign_key'])
+
+    def test_conversion_keeps_rows_ids_and_relations(self):
+        seed_synthetic_data(20, 5)
+        rows = self.loan_rows()
+
+        self.assertTrue(partition_loans())
+        self.assertFalse(partition_loans())
+        self.assertTrue(is_partitioned())
+        self.assertEqual(self.loan_rows(), rows)
+        names = {partition['name'] for partition in loan_partitions()}
+        self.assertIn(f'api_loan_p{date.today().year + 5}', names)
+        self.assertIn('api_loan_default', names)
+        self.assertEqual(self.foreign_keys('api_loan'), [('api_customer', 'customer_id')])
+        self.assertEqual(self.foreign_keys('api_repayment'), [])
+
+        response = self.client.post('/api/create-loan/', {
+            'customer_id': 1, 'loan_amount': 1000, 'interest_rate': 12, 'tenure': 6,
+        }, content_type='application/json')
+        self.assertEqual(response.json()['loan_id'], rows[-1][0] + 1)
+        self.assertEqual(self.client.post(f'/api/loans/{rows[-1][0] + 1}/repayments/', {},
+                                          content_type='application/json').status_code, 201)
+
+        self.assertTrue(unpartition_loans())
+        self.assertFalse(is_partitioned())
+        self.assertEqual(self.foreign_keys('api_repayment'), [('api_loan', 'loan_id')])
+        self.assertEqual(Loan.objects.create(**{
+            field: value for field, value in Loan.objects.values().get(pk=1).items() if field != 'loan_id'
+        }).loan_id, rows[-1][0] + 2)
+
+    def test_active_loan_queries_skip_closed_partitions(self):
+        seed_synthetic_data(20, 5)
+        partition_loans()
+        today = date.today()
+
+        active = scanned_relations(Loan.objects.filter(end_date__gte=today))
+        self.assertNotIn(f'api_loan_p{today.year - 1}', active)
+        self.assertIn(f'api_loan_p{today.year}', active)
+        self.assertLess(len(active), len(loan_partitions()))
+        closed = scanned_relations(Loan.objects.filter(end_date__lt=date(today.year, 1, 1)))
+        # The default partition takes any end_date outside the yearly ranges, before or after them
+        self.assertTrue(all(int(name[len('api_loan_p'):]) < today.year for name in closed if name != 'api_loan_default'))
+
+    def test_future_partitions_are_created_ahead_of_time(self):
+        self.assertEqual(create_loan_partitions_task(), 'Created 0 loan partitions.')
+        customer_ids, _ = seed_synthetic_data(2, 1)
+        partition_loans(ahead=0)
+        today = date.today()
+        far = Loan.objects.create(**{
+            **{field: value for field, value in Loan.objects.values().get(pk=1).items() if field != 'loan_id'},
+            'end_date': date(today.year + 2, 6, 1),
+        })
+
+        created = ensure_loan_partitions(ahead=2)
+
+        self.assertEqual(created, [f'api_loan_p{today.year + 1}', f'api_loan_p{today.year + 2}'])
+        self.assertEqual(ensure_loan_partitions(ahead=2), [])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM api_loan WHERE loan_id = %s', [far.loan_id])
+            self.assertEqual(cursor.fetchone()[0], f'api_loan_p{today.year + 2}')
+
+    def test_reseeding_a_partitioned_table_updates_rather_than_duplicates(self):
+        seed_synthetic_data(10, 3, seed=1)
+        partition_loans()
+        # Another seed moves loans between end_date partitions
+        seed_synthetic_data(10, 3, seed=2)
+        rows = self.loan_rows()
+        unpartition_loans()
+        seed_synthetic_data(10, 3, seed=2)
+
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(self.loan_rows(), rows)
+
+    def test_partition_benchmark_restores_the_single_table(self):
+        customer_ids, _ = seed_synthetic_data(10, 3)
+        results = run_partition_benchmarks(customer_ids, iterations=3, scans=2)
+
+        self.assertFalse(is_partitioned())
+        self.assertEqual(results['single_table']['active_exposure']['relations_scanned'], 1)
+        self.assertLess(
+            results['partitioned']['active_exposure']['relations_scanned'], results['partitioned']['partitions'],
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning is PostgreSQL specific')
+class SnapshotRaceTests(TransactionTestCase):
+    def test_snapshot_computed_during_a_loan_write_does_not_outlive_its_invalidation(self):
+        borrower, other = [
+            Customer.objects.create(first_name='Race', last_name=str(index), phone_number=9100000000 + index,
+                                    monthly_salary=100000, approved_limit=3600000)
+            for index in range(2)
+        ]
+        written, release = threading.Event(), threading.Event()
+
+        def book_loan():
+            try:
+                with transaction.atomic():
+                    # Over the approved limit, so the borrower's score drops to 0
+                    loan = Loan.objects.create(customer=borrower, loan_amount=4000000, tenure=12, interest_rate=12,
+                                               monthly_repayment=355000, emis_paid_on_time=0, start_date=date.today(),
+                                               end_date=date.today() + timedelta(days=365))
+                    record_new_loan(loan)
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(1) as pool:
+            booked = pool.submit(book_loan)
+            self.assertTrue(written.wait(10))
+            try:
+                computed = compute_snapshots([borrower.pk, other.pk])
+            finally:
+                release.set()
+            booked.result()
+
+        self.assertEqual(computed, 1)
+        snapshots = dict(CreditScoreSnapshot.objects.values_list('customer_id', 'credit_score'))
+        self.assertNotIn(borrower.pk, snapshots)
+        self.assertEqual(snapshots[other.pk], calculate_credit_score(other.pk))
+        self.assertEqual(calculate_credit_score(borrower.pk), 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning is PostgreSQL specific')
+class PartitionedUpsertTests(TransactionTestCase):
+    def test_concurrent_upserts_insert_a_loan_id_once(self):
+        seed_synthetic_data(2, 1)
+        partition_loans()
+        try:
+            template = {field: value for field, value in Loan.objects.values().get(pk=1).items() if field != 'loan_id'}
+            end_dates = [date(date.today().year + offset, 6, 1) for offset in range(8)]
+            barrier = threading.Barrier(len(end_dates))
+
+            def upsert(end_date):
+                try:
+                    barrier.wait()
+                    # Different end dates put the same id in different partitions
+                    upsert_loans([Loan(**{**template, 'loan_id': 1003, 'end_date': end_date})], ['end_date'])
+                finally:
+                    connection.close()
+
+            with ThreadPoolExecutor(len(end_dates)) as pool:
+                list(pool.map(upsert, end_dates))
+
+            self.assertEqual(Loan.objects.filter(pk=1003).count(), 1)
+        finally:
+            unpartition_loans()
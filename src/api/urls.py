@@ -1,15 +1,44 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterAPIView
-from .views import CheckEligibilityAPIView 
+from . import async_views
+from .views import RegisterAPIView, RegisterBatchAPIView
+from .views import CheckEligibilityAPIView, CheckEligibilityBatchAPIView
 from .views import CreateLoanAPIView 
-from .views import ViewLoanAPIView, ViewCustomerLoansAPIView 
+from .views import ViewLoanAPIView, ViewCustomerLoansAPIView, LoanScheduleAPIView
+from .views import CreditScoreBatchAPIView, CacheStatsAPIView, export_loans_view
+from .views import PortfolioAnalyticsAPIView
+from .views import LoanRepaymentsAPIView, RepaymentBatchAPIView
 
 
 
 urlpatterns = [
     path('register/', RegisterAPIView.as_view(), name='register'),
+    path('register/batch/', RegisterBatchAPIView.as_view(), name='register-batch'),
     path('check-eligibility/', CheckEligibilityAPIView.as_view(), name='check-eligibility'),
+    path('check-eligibility/batch/', CheckEligibilityBatchAPIView.as_view(), name='check-eligibility-batch'),
     path('create-loan/', CreateLoanAPIView.as_view(), name='create-loan'),
     path('view-loan/<int:loan_id>/', ViewLoanAPIView.as_view(), name='view-loan'),
+    path('view-loan/<int:loan_id>/schedule/', LoanScheduleAPIView.as_view(), name='view-loan-schedule'),
+    path('loans/<int:loan_id>/repayments/', LoanRepaymentsAPIView.as_view(), name='loan-repayments'),
+    path('repayments/batch/', RepaymentBatchAPIView.as_view(), name='repayments-batch'),
     path('view-loans/<int:customer_id>/', ViewCustomerLoansAPIView.as_view(), name='view-customer-loans'),
-]
\ No newline at end of file
+    path('credit-scores/batch/', CreditScoreBatchAPIView.as_view(), name='credit-scores-batch'),
+    path('cache/stats/', CacheStatsAPIView.as_view(), name='cache-stats'),
+    path('export/loans/', export_loans_view, name='export-loans'),
+    path('analytics/portfolio/', PortfolioAnalyticsAPIView.as_view(), name='analytics-portfolio'),
+]
+
+# Async variants, always reachable for side-by-side comparison
+urlpatterns += [
+    path('async/check-eligibility/', async_views.check_eligibility, name='async-check-eligibility'),
+    path('async/view-loan/<int:loan_id>/', async_views.view_loan, name='async-view-loan'),
+    path('async/view-loans/<int:customer_id>/', async_views.view_customer_loans, name='async-view-customer-loans'),
+]
+
+if settings.APP_SERVER == 'asgi':
+    # Under an ASGI server the main routes are served by the async variants
+    urlpatterns = [
+        path('check-eligibility/', async_views.check_eligibility, name='check-eligibility'),
+        path('view-loan/<int:loan_id>/', async_views.view_loan, name='view-loan'),
+        path('view-loans/<int:customer_id>/', async_views.view_customer_loans, name='view-customer-loans'),
+    ] + urlpatterns
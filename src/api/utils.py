@@ -1,8 +1,62 @@
 # src/api/utils.py
 from datetime import date
-from django.db.models import Sum
-from .models import Loan, Customer
+import numpy as np
+from django.db.models import Count, F, Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from .metrics import timed_function
+from .models import Customer
 
+
+def lock_customers(customer_ids) -> None:
+    """
+    Locks the customer rows FOR UPDATE until the caller's transaction ends, in
+    id order, so concurrent writers queue instead of deadlocking.
+    """
+    list(Customer.objects.select_for_update().filter(pk__in=list(customer_ids)).order_by('customer_id').values_list('pk'))
+
+
+def loan_aggregates(today=None):
+    """
+    Returns the conditional aggregates over a customer's loans that feed the
+    credit score, as annotations for a Customer queryset.
+    """
+    today = today or date.today()
+    active = Q(loans__end_date__gte=today)
+    past = Q(loans__end_date__lt=today)
+    return {
+        'current_debt_sum': Coalesce(
+            Sum('loans__loan_amount', filter=active),
+            Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+        'num_current_loans': Count('loans', filter=active),
+        'num_past_loans': Count('loans', filter=past),
+        'num_late_loans': Count('loans', filter=past & Q(loans__emis_paid_on_time__lt=F('loans__tenure'))),
+    }
+
+
+def score_from_aggregates(approved_limit, current_debt_sum, num_current_loans, num_past_loans, num_late_loans) -> int:
+    """Applies the credit score rules to precomputed loan aggregates."""
+    # Automatic failure condition: sum of current loans > approved limit
+    if current_debt_sum > approved_limit:
+        return 0
+
+    # Start with a baseline score for a good customer
+    score = 100
+
+    # 1. Penalize heavily for past loans that were not fully paid on time
+    score -= num_late_loans * 25
+
+    # 2. Penalize for high number of current loans
+    score -= num_current_loans * 10
+
+    # 3. Reward for paying off loans completely
+    score += num_past_loans * 10
+
+    # Ensure score is within the 0-100 range
+    return max(0, min(score, 100))
+
+
+@timed_function('credit_score')
 def calculate_credit_score(customer_id: int) -> int:
     """
     Calculates a credit score for a given customer based on their loan history.
@@ -11,39 +65,61 @@ def calculate_credit_score(customer_id: int) -> int:
     - Penalizes for having many active loans.
     - Rewards for paying off loans completely.
     - Fails automatically if total debt exceeds approved limit.
+
+    All inputs are computed in a single conditional-aggregate query.
     """
-    try:
-        customer = Customer.objects.get(pk=customer_id)
-    except Customer.DoesNotExist:
+    row = (
+        Customer.objects.filter(pk=customer_id)
+        .annotate(**loan_aggregates())
+        .values('approved_limit', 'current_debt_sum', 'num_current_loans', 'num_past_loans', 'num_late_loans')
+        .first()
+    )
+    if row is None:
         return 0 # Customer not found, no score
 
-    customer_loans = Loan.objects.filter(customer=customer)
+    return score_from_aggregates(**row)
 
-    # Check for automatic failure condition: sum of current loans > approved limit
-    current_debt_sum = customer_loans.filter(end_date__gte=date.today()).aggregate(total=Sum('loan_amount'))['total'] or 0
-    if current_debt_sum > customer.approved_limit:
-        return 0
 
-    # Start with a baseline score for a good customer
-    score = 100
+SCORE_BATCH_SIZE = 5000
 
-    # 1. Penalize for past late payments
-    # This is a simplified model: we penalize if any past loan was not fully paid on time.
-    past_loans = customer_loans.filter(end_date__lt=date.today())
-    for loan in past_loans:
-        if loan.emis_paid_on_time < loan.tenure:
-            # Penalize heavily for loans with missed payments
-            score -= 25
 
-    # 2. Penalize for high number of current loans
-    num_current_loans = customer_loans.filter(end_date__gte=date.today()).count()
-    score -= num_current_loans * 10
+def score_array(approved_limit, current_debt_sum, num_current_loans, num_past_loans, num_late_loans) -> np.ndarray:
+    """Applies the credit score rules element-wise to arrays of loan aggregates."""
+    # Loan sums are 2dp amounts and limits are integers, so float64 compares them exactly
+    over_limit = np.asarray(current_debt_sum, dtype=np.float64) > np.asarray(approved_limit, dtype=np.float64)
+    score = (
+        100
+        - 25 * np.asarray(num_late_loans, dtype=np.int64)
+        - 10 * np.asarray(num_current_loans, dtype=np.int64)
+        + 10 * np.asarray(num_past_loans, dtype=np.int64)
+    )
+    return np.where(over_limit, 0, np.clip(score, 0, 100))
 
-    # 3. Reward for paying off loans completely
-    num_paid_off_loans = past_loans.count()
-    score += num_paid_off_loans * 10
 
-    # Ensure score is within the 0-100 range
-    final_score = max(0, min(score, 100))
+def score_customers(customer_ids, batch_size=SCORE_BATCH_SIZE) -> dict:
+    """
+    Calculates credit scores for many customers at once.
+
+    Runs one grouped aggregate query per batch of ids and applies the scoring
+    rules with vectorized array math. Returns {customer_id: score}, with unknown
+    customers scoring 0 exactly like calculate_credit_score.
+    """
+    customer_ids = list(dict.fromkeys(customer_ids))
+    scores = dict.fromkeys(customer_ids, 0)
+    aggregates = loan_aggregates()
+
+    for start in range(0, len(customer_ids), batch_size):
+        rows = list(
+            Customer.objects.filter(pk__in=customer_ids[start:start + batch_size])
+            .values('customer_id', 'approved_limit')
+            .annotate(**aggregates)
+            .values_list('customer_id', 'approved_limit', 'current_debt_sum',
+                         'num_current_loans', 'num_past_loans', 'num_late_loans')
+        )
+        if not rows:
+            continue
+
+        ids, limits, debt, current, past, late = zip(*rows)
+        scores.update(zip(ids, score_array(limits, debt, current, past, late).tolist()))
 
-    return final_score
\ No newline at end of file
+    return scores
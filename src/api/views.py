@@ -1,18 +1,40 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F
 from datetime import date, timedelta
-from django.shortcuts import render
+import json
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.shortcuts import get_object_or_404, render
 from .models import Customer, Loan
-from .utils import calculate_credit_score
+from . import cache, idempotency, metrics
+from .metrics import timed
+from .utils import score_customers
+from .summaries import record_new_loan
+from .analytics import portfolio_slices, record_loan_in_rollups
+from .snapshots import snapshot_scores
+from .export import CONTENT_TYPES, ExportError, stream_export
+from .eligibility import eligibility_engine
+from .registration import register_customers
+from .repayments import DUPLICATE_INSTALLMENT_ERROR, LOAN_NOT_FOUND_ERROR, post_repayment_items, post_repayments
+from .finance import amortization_schedule, to_money
+from .pagination import LoanCursorPagination
+from .parsers import NDJSONParser, ORJSONParser
+from .renderers import dumps
+from .responses import CreateLoanResponse, EligibilityResponse
 from .serializers import (
     CustomerSerializer,
     LoanEligibilityRequestSerializer,
-    LoanEligibilityResponseSerializer,
     CreateLoanRequestSerializer,
-    CreateLoanResponseSerializer,
     LoanDetailSerializer,
-    LoanListSerializer
+    LoanListSerializer,
+    CreditScoreBatchRequestSerializer,
+    CreditScoreSerializer,
+    PortfolioQuerySerializer,
+    PortfolioSliceSerializer,
+    RepaymentRequestSerializer,
+    RepaymentSerializer
 )
 
 class RegisterAPIView(generics.CreateAPIView):
@@ -38,161 +60,357 @@ class RegisterAPIView(generics.CreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
 
+class RegisterBatchAPIView(generics.GenericAPIView):
+    """
+    API view to register many customers in one call.
+
+    Accepts a JSON array or NDJSON and streams back one NDJSON line per item,
+    in input order: the body /register would return, or the validation errors.
+    Every chunk is registered before the response starts, so a client that
+    disconnects mid-stream still has the whole batch written.
+    """
+    parser_classes = [ORJSONParser, NDJSONParser]
+    chunk_size = 5000
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a JSON array or NDJSON"}, status=status.HTTP_400_BAD_REQUEST)
+        results = [
+            result
+            for start in range(0, len(items), self.chunk_size)
+            for result in register_customers(items[start:start + self.chunk_size])
+        ]
+        return StreamingHttpResponse(self.stream(results), content_type='application/x-ndjson')
+
+    def stream(self, results):
+        for start in range(0, len(results), self.chunk_size):
+            yield b''.join(dumps(result.get('errors', result)) + b'\n' for result in results[start:start + self.chunk_size])
+
+def eligibility_response_data(decision):
+    """The /check-eligibility response body for a decision."""
+    return EligibilityResponse.from_decision(decision).to_dict()
+
 class CheckEligibilityAPIView(generics.GenericAPIView):
     """API view to check loan eligibility for a customer."""
     def post(self, request, *args, **kwargs):
         serializer = LoanEligibilityRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
 
-        customer_id = data['customer_id']
-        loan_amount = data['loan_amount']
-        interest_rate = data['interest_rate']
-        tenure = data['tenure']
-
-        credit_score = calculate_credit_score(customer_id)
-        
         try:
-            customer = Customer.objects.get(pk=customer_id)
+            decision = eligibility_engine.check(**serializer.validated_data)
         except Customer.DoesNotExist:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # --- Definitive Corrected Logic ---
-        approval = False
-        corrected_interest_rate = None
-        final_interest_rate = interest_rate
-        
-        # Determine the minimum interest rate allowed for the customer's credit score tier
-        min_rate_for_tier = None
-        can_be_approved = True
-
-        if credit_score > 50:
-            min_rate_for_tier = 10.0  # Minimum rate for the best customers
-        elif 30 < credit_score <= 50:
-            min_rate_for_tier = 12.0
-        elif 10 < credit_score <= 30:
-            min_rate_for_tier = 16.0
-        else: # score < 10
-            can_be_approved = False
-
-        if can_be_approved:
-            if interest_rate >= min_rate_for_tier:
-                approval = True
-            else:
-                # The loan can be approved, but at the tier's minimum required rate
-                approval = True
-                corrected_interest_rate = min_rate_for_tier
-                final_interest_rate = min_rate_for_tier
-        
-        # Final check: The 50% EMI rule overrides everything
-        current_loans = Loan.objects.filter(customer=customer, end_date__gte=date.today())
-        sum_of_emis = current_loans.aggregate(total_emi=Sum('monthly_repayment'))['total_emi'] or 0
-        if sum_of_emis > customer.monthly_salary / 2:
-            approval = False
-            corrected_interest_rate = None # Not applicable if rejected by EMI rule
-
-        # Calculate EMI based on the final interest rate
-        monthly_installment = 0
-        if approval:
-            r = (final_interest_rate / 12) / 100
-            n = tenure
-            monthly_installment = (loan_amount * r * (1 + r)**n) / ((1 + r)**n - 1) if r > 0 else loan_amount / n
+        with timed('serialize'):
+            data = eligibility_response_data(decision)
+        return Response(data, status=status.HTTP_200_OK)
 
-        response_data = {
-            'customer_id': customer_id,
-            'approval': approval,
-            'interest_rate': interest_rate,
-            'corrected_interest_rate': corrected_interest_rate,
-            'tenure': tenure,
-            'monthly_installment': round(monthly_installment, 2)
-        }
-        
-        response_serializer = LoanEligibilityResponseSerializer(data=response_data)
-        response_serializer.is_valid(raise_exception=True)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+class CheckEligibilityBatchAPIView(generics.GenericAPIView):
+    """
+    API view to check eligibility for many requests in one call.
+
+    Accepts a JSON array or NDJSON and streams back one NDJSON line per item,
+    in input order, with exactly the body /check-eligibility would return.
+    """
+    parser_classes = [ORJSONParser, NDJSONParser]
+    chunk_size = 5000
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a JSON array or NDJSON"}, status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(self.stream(items), content_type='application/x-ndjson')
+
+    def stream(self, items):
+        for start in range(0, len(items), self.chunk_size):
+            chunk = [self.validate(item) for item in items[start:start + self.chunk_size]]
+            valid = [item for item in chunk if 'errors' not in item]
+            decisions = iter(eligibility_engine.evaluate_batch(valid))
+
+            lines = []
+            for item in chunk:
+                if 'errors' in item:
+                    body = item['errors']
+                else:
+                    decision = next(decisions)
+                    if decision is None:
+                        body = {"error": "Customer not found"}
+                    else:
+                        body = eligibility_response_data(decision)
+                lines.append(dumps(body))
+            yield b'\n'.join(lines) + b'\n'
+
+    @staticmethod
+    def validate(item):
+        # Fast path for well-typed items; anything else goes through the serializer
+        # so errors read exactly like the single endpoint's
+        if type(item) is dict:
+            customer_id, tenure = item.get('customer_id'), item.get('tenure')
+            loan_amount, interest_rate = item.get('loan_amount'), item.get('interest_rate')
+            if (type(customer_id) is int and type(tenure) is int
+                    and type(loan_amount) in (int, float) and type(interest_rate) in (int, float)):
+                return {
+                    'customer_id': customer_id, 'loan_amount': float(loan_amount),
+                    'interest_rate': float(interest_rate), 'tenure': tenure,
+                }
+
+        serializer = LoanEligibilityRequestSerializer(data=item)
+        if not serializer.is_valid():
+            return {'errors': serializer.errors}
+        return serializer.validated_data
 
 class CreateLoanAPIView(generics.GenericAPIView):
-    """API view to process and create a new loan."""
+    """
+    API view to process and create a new loan.
+
+    Requests may carry an Idempotency-Key header; a retry with the same key
+    gets the stored response back without creating another loan.
+    """
     def post(self, request, *args, **kwargs):
         serializer = CreateLoanRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
 
-        customer_id = data['customer_id']
-        loan_amount = data['loan_amount']
-        interest_rate = data['interest_rate']
-        tenure = data['tenure']
+        key = request.headers.get(idempotency.HEADER)
+        request_fingerprint = None
+        if key:
+            if len(key) > idempotency.MAX_KEY_LENGTH:
+                return Response({"error": "Idempotency-Key is too long"}, status=status.HTTP_400_BAD_REQUEST)
+            request_fingerprint = idempotency.fingerprint(serializer.validated_data)
+            stored = idempotency.lookup(key)
+            if stored:
+                return self.replay(stored, request_fingerprint)
 
-        credit_score = calculate_credit_score(customer_id)
-        customer = Customer.objects.get(pk=customer_id)
-        
-        # Re-use the exact same logic from eligibility check
-        approval = False
-        final_interest_rate = interest_rate
-        min_rate_for_tier = None
-        can_be_approved = True
-
-        if credit_score > 50: min_rate_for_tier = 10.0
-        elif 30 < credit_score <= 50: min_rate_for_tier = 12.0
-        elif 10 < credit_score <= 30: min_rate_for_tier = 16.0
-        else: can_be_approved = False
-
-        if can_be_approved:
-            if interest_rate >= min_rate_for_tier:
-                approval = True
-            else:
-                approval = True
-                final_interest_rate = min_rate_for_tier
-
-        current_loans = Loan.objects.filter(customer=customer, end_date__gte=date.today())
-        sum_of_emis = current_loans.aggregate(total_emi=Sum('monthly_repayment'))['total_emi'] or 0
-        if sum_of_emis > customer.monthly_salary / 2:
-            approval = False
-
-        # --- Create Loan if Approved ---
-        loan_id = None
-        monthly_installment = 0
-        message = "Loan not approved. Customer does not meet eligibility criteria."
-
-        if approval:
-            message = "Loan approved successfully!"
-            r = (final_interest_rate / 12) / 100
-            n = tenure
-            monthly_installment = (loan_amount * r * (1 + r)**n) / ((1 + r)**n - 1) if r > 0 else loan_amount / n
-
-            new_loan = Loan.objects.create(
-                customer=customer, loan_amount=loan_amount, tenure=tenure,
-                interest_rate=final_interest_rate, monthly_repayment=monthly_installment,
-                emis_paid_on_time=0, start_date=date.today(),
-                end_date=date.today() + timedelta(days=30 * tenure)
+        try:
+            # Decide and write as one unit with the customer row locked, so parallel
+            # requests for one customer cannot all pass the EMI rule on the same totals
+            with transaction.atomic():
+                try:
+                    decision = eligibility_engine.check(**serializer.validated_data, lock=True)
+                except Customer.DoesNotExist:
+                    return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+
+                if key:
+                    # A retry that raced the first attempt waited on the lock; check again
+                    stored = idempotency.lookup(key, use_cache=False)
+                    if stored:
+                        return self.replay(stored, request_fingerprint)
+
+                loan_id = None
+                if decision.approval:
+                    with timed('write'):
+                        loan_id = self.create_loan(decision)
+
+                with timed('serialize'):
+                    response_data = self.response_data(decision, loan_id)
+                if key:
+                    idempotency.store(key, request_fingerprint, status.HTTP_201_CREATED, response_data)
+        except idempotency.IdempotencyKeyConflict:
+            return Response(
+                {"error": "Idempotency-Key is already in use by another request"},
+                status=status.HTTP_409_CONFLICT
             )
-            loan_id = new_loan.loan_id
-            
-            # Update customer's current debt
-            customer.current_debt += loan_amount
-            customer.save()
 
-        response_data = {
-            'loan_id': loan_id, 'customer_id': customer_id, 'loan_approved': approval,
-            'message': message, 'monthly_installment': round(monthly_installment, 2)
-        }
-        response_serializer = CreateLoanResponseSerializer(data=response_data)
-        response_serializer.is_valid(raise_exception=True)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def response_data(decision, loan_id):
+        return CreateLoanResponse.from_decision(decision, loan_id).to_dict()
+
+    @staticmethod
+    def replay(stored, request_fingerprint):
+        if stored.fingerprint != request_fingerprint:
+            return Response(
+                {"error": "Idempotency-Key was already used with a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+    @staticmethod
+    def create_loan(decision):
+        """Inserts an approved loan and updates the customer's debt and loan summary."""
+        customer_id = decision.customer_id
+        new_loan = Loan.objects.create(
+            customer_id=customer_id, loan_amount=to_money(decision.loan_amount), tenure=decision.tenure,
+            interest_rate=decision.final_interest_rate,
+            monthly_repayment=to_money(decision.monthly_installment, max_digits=10),
+            emis_paid_on_time=0, start_date=date.today(),
+            end_date=date.today() + timedelta(days=30 * decision.tenure),
+            origination_score=decision.credit_score
+        )
+
+        # Update only the debt column, relative to its committed value
+        Customer.objects.filter(pk=customer_id).update(current_debt=F('current_debt') + int(decision.loan_amount))
+        record_new_loan(new_loan)
+        record_loan_in_rollups(new_loan)
+        transaction.on_commit(lambda: cache.invalidate_customers([customer_id]))
+        return new_loan.loan_id
+
+class CreditScoreBatchAPIView(generics.GenericAPIView):
+    """API view to score many customers in one pass."""
+    def post(self, request, *args, **kwargs):
+        serializer = CreditScoreBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        customer_ids = serializer.validated_data['customer_ids']
+
+        # Cache misses read fresh snapshots first and score the rest live
+        scores = cache.get_or_set_many(
+            'credit-score', {customer_id: cache.credit_score_key(customer_id) for customer_id in customer_ids},
+            lambda missing: snapshot_scores(missing, score_customers)
+        )
+        results = [
+            {'customer_id': customer_id, 'credit_score': scores[customer_id]}
+            for customer_id in customer_ids
+        ]
+        return Response({'scores': CreditScoreSerializer(results, many=True).data}, status=status.HTTP_200_OK)
 
 class ViewLoanAPIView(generics.RetrieveAPIView):
     """API view to get details of a single loan by its ID."""
-    queryset = Loan.objects.all()
+    queryset = Loan.objects.select_related('customer')
     serializer_class = LoanDetailSerializer
     lookup_field = 'loan_id'
 
+    def retrieve(self, request, *args, **kwargs):
+        loan_id = self.kwargs['loan_id']
+        data = cache.get_or_set('loan', cache.loan_key(loan_id), lambda: dict(self.get_serializer(self.get_object()).data))
+        return Response(data)
+
+class LoanRepaymentsAPIView(generics.GenericAPIView):
+    """
+    API view to list a loan's repayment ledger and post a repayment to it.
+
+    Posting updates the loan's emis_paid_on_time and the customer's
+    current_debt in the same transaction.
+    """
+    def get(self, request, loan_id, *args, **kwargs):
+        loan = get_object_or_404(Loan, loan_id=loan_id)
+        repayments = loan.repayments.order_by('installment_number')
+        return Response(RepaymentSerializer(repayments, many=True).data)
+
+    def post(self, request, loan_id, *args, **kwargs):
+        serializer = RepaymentRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        row = {'installment_number': None, 'amount': None, 'paid_on': None, **serializer.validated_data}
+
+        result = post_repayments([{**row, 'loan_id': loan_id}])[0]
+        if result.get('errors') == LOAN_NOT_FOUND_ERROR:
+            return Response({"error": "Loan not found"}, status=status.HTTP_404_NOT_FOUND)
+        if result.get('errors') == DUPLICATE_INSTALLMENT_ERROR:
+            return Response(result['errors'], status=status.HTTP_409_CONFLICT)
+        if 'errors' in result:
+            return Response(result['errors'], status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+class RepaymentBatchAPIView(generics.GenericAPIView):
+    """
+    API view to post many repayments in one call.
+
+    Accepts a JSON array or NDJSON and streams back one NDJSON line per item,
+    in input order: the posted repayment, or the errors. Each chunk is posted
+    in one transaction, and every chunk is posted before the response starts.
+    """
+    parser_classes = [ORJSONParser, NDJSONParser]
+    chunk_size = 5000
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a JSON array or NDJSON"}, status=status.HTTP_400_BAD_REQUEST)
+        results = [
+            result
+            for start in range(0, len(items), self.chunk_size)
+            for result in post_repayment_items(items[start:start + self.chunk_size])
+        ]
+        return StreamingHttpResponse(self.stream(results), content_type='application/x-ndjson')
+
+    def stream(self, results):
+        for start in range(0, len(results), self.chunk_size):
+            yield b''.join(dumps(result.get('errors', result)) + b'\n' for result in results[start:start + self.chunk_size])
+
+class LoanScheduleAPIView(generics.GenericAPIView):
+    """API view to stream the amortization schedule of a single loan."""
+    def get(self, request, loan_id, *args, **kwargs):
+        loan = get_object_or_404(Loan, loan_id=loan_id)
+        return StreamingHttpResponse(self.stream(loan), content_type='application/json')
+
+    @staticmethod
+    def stream(loan):
+        # Amounts are rendered as strings, like the DecimalFields of the other loan endpoints
+        yield '{"loan_id": %d, "tenure": %d, "monthly_repayment": "%s", "schedule": [' % (
+            loan.loan_id, loan.tenure, loan.monthly_repayment)
+        rows = amortization_schedule(loan.loan_amount, loan.interest_rate, loan.tenure, loan.monthly_repayment)
+        for index, row in enumerate(rows):
+            yield (', ' if index else '') + json.dumps(row, default=str)
+        yield ']}'
+
 class ViewCustomerLoansAPIView(generics.ListAPIView):
-    """API view to get a list of all loans for a given customer."""
+    """API view to get a customer's loans; without a cursor, the first max_page_size of them."""
     serializer_class = LoanListSerializer
+    pagination_class = LoanCursorPagination
 
     def get_queryset(self):
         customer_id = self.kwargs['customer_id']
-        return Loan.objects.filter(customer__customer_id=customer_id)
+        queryset = Loan.objects.filter(customer_id=customer_id).order_by('loan_id')
+        return LoanListSerializer.with_repayments_left(queryset).values(*LoanListSerializer.Meta.fields)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(LoanListSerializer.lean_data(page))
+
+        customer_id = self.kwargs['customer_id']
+        limit = self.paginator.max_page_size
+        data = cache.get_or_set(
+            'customer-loans', cache.customer_loans_key(customer_id),
+            lambda: LoanListSerializer.lean_data(queryset[:limit + 1])
+        )
+        data, headers = self.paginator.capped_list(data, request)
+        return Response(data, headers=headers)
+
+class PortfolioAnalyticsAPIView(generics.GenericAPIView):
+    """
+    API view to report loan exposure totals from the portfolio rollups.
+
+    ?group_by= takes a comma-separated list of score_tier, rate_band,
+    tenure_bucket and origination_month; the same dimensions (comma-separated
+    values) and month_from/month_to (YYYY-MM) filter the slices.
+    """
+    def get(self, request, *args, **kwargs):
+        query = PortfolioQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        group_by = query.validated_data['group_by']
+
+        rows, totals = portfolio_slices(group_by, query.filters())
+        return Response({
+            'group_by': group_by,
+            'results': PortfolioSliceSerializer(rows, many=True).data,
+            'totals': PortfolioSliceSerializer(totals).data,
+        })
+
+class CacheStatsAPIView(generics.GenericAPIView):
+    """API view to report response cache hit and miss counters for this process."""
+    def get(self, request, *args, **kwargs):
+        return Response(cache.cache_stats())
+
+@require_GET
+def export_loans_view(request):
+    """
+    Streams the whole loan book, joined with customers, repayments_left and
+    credit scores, as ?format=csv (default), ndjson or parquet.
+    """
+    file_format = request.GET.get('format', 'csv')
+    try:
+        chunks = stream_export(file_format)
+    except ExportError as exc:
+        return JsonResponse({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="loans.{file_format}"'
+    return response
+
+def metrics_view(request):
+    """Serves this process's request metrics in the Prometheus text format."""
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 def frontend_view(request):
     """Serves the frontend HTML file."""
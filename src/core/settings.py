@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the middleware stack
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +76,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+ASGI_APPLICATION = 'core.asgi.application'
+
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn with uvicorn workers).
+# Under 'asgi' the read and eligibility endpoints are served by async views.
+APP_SERVER = os.environ.get('APP_SERVER', 'wsgi')
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -83,9 +94,27 @@ DATABASES = {
         'PASSWORD': 'credit_password',
         'HOST': 'db',  # This is the service name from docker-compose.yml
         'PORT': 5432,
+        # Seconds a connection is reused across requests and Celery tasks (0 closes it
+        # after each one). Defaults to 0 under ASGI, where each request may run on a
+        # different thread and persistent connections pile up; use the pool there.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE') or (0 if APP_SERVER == 'asgi' else 60)),
+        # Reused connections are checked before each request instead of failing it
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Optional psycopg 3 connection pool (psycopg[binary,pool] in requirements.txt),
+# one per process, enabled by DB_POOL_MAX_SIZE. Django requires CONN_MAX_AGE=0 with a pool.
+# Each process type (web, worker, beat) sets these through its own environment.
+if int(os.environ.get('DB_POOL_MAX_SIZE') or 0):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,6 +157,110 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST framework
+# JSON is rendered and parsed with orjson; the output is byte-compatible with DRF's
+# JSONRenderer. The browsable API stays available for indented, in-browser use.
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Cache
+# Responses and credit scores are cached in Redis. Set CACHE_BACKEND=locmem (the
+# default when running tests) to use an in-process fake instead.
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379')
+
+if os.environ.get('CACHE_BACKEND', 'locmem' if 'test' in sys.argv else 'redis') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'{REDIS_URL}/1',
+        }
+    }
+
+# Seconds before each kind of cached entry is recomputed
+API_CACHE_TTLS = {
+    'loan': int(os.environ.get('LOAN_CACHE_TTL', 300)),
+    'customer-loans': int(os.environ.get('CUSTOMER_LOANS_CACHE_TTL', 300)),
+    'credit-score': int(os.environ.get('CREDIT_SCORE_CACHE_TTL', 3600)),
+}
+
+# Seconds a credit score snapshot may be served before scores are computed live
+CREDIT_SCORE_SNAPSHOT_MAX_AGE = int(os.environ.get('CREDIT_SCORE_SNAPSHOT_MAX_AGE', 6 * 60 * 60))
+
+# Seconds a create-loan Idempotency-Key is remembered
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Loan table partitioning (PostgreSQL only, see api/partitions.py)
+# LOAN_PARTITIONING=1 makes migrate split api_loan into yearly end_date ranges;
+# `manage.py partition_loans` converts (or with --undo reverts) an existing database.
+LOAN_PARTITIONING = os.environ.get('LOAN_PARTITIONING', '0') != '0'
+# Years of partitions created ahead of the current one
+LOAN_PARTITION_YEARS_AHEAD = int(os.environ.get('LOAN_PARTITION_YEARS_AHEAD', 5))
+
+# Where sharded ingestion jobs write the shard files their workers read;
+# must be storage every Celery worker can reach
+INGESTION_WORK_DIR = os.environ.get('INGESTION_WORK_DIR', BASE_DIR / 'ingestion')
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://redis:6379/0'
-CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
\ No newline at end of file
+CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+
+CELERY_BEAT_SCHEDULE = {
+    # Roll loans from active to closed in the per-customer loan summaries once their end_date passes
+    'roll-over-loan-summaries': {
+        'task': 'api.tasks.roll_over_loan_summary_task',
+        'schedule': crontab(minute=5, hour=0),
+    },
+    # Keep credit score snapshots within CREDIT_SCORE_SNAPSHOT_MAX_AGE; matches snapshots.REFRESH_INTERVAL
+    'refresh-credit-score-snapshots': {
+        'task': 'api.tasks.refresh_credit_score_snapshot_task',
+        'schedule': crontab(minute='*/15'),
+    },
+    'rebuild-portfolio-rollups': {
+        'task': 'api.tasks.rebuild_portfolio_rollup_task',
+        'schedule': crontab(minute=30, hour=1),
+    },
+    'purge-idempotency-keys': {
+        'task': 'api.tasks.purge_idempotency_keys',
+        'schedule': crontab(minute=30),
+    },
+    # Keep LOAN_PARTITION_YEARS_AHEAD years of loan partitions ready; a no-op unless partitioned
+    'create-loan-partitions': {
+        'task': 'api.tasks.create_loan_partitions_task',
+        'schedule': crontab(minute=0, hour=2, day_of_month=1),
+    },
+}
+
+# Instrumentation
+# Requests at least this slow are logged with their SQL to the api.slow_requests
+# logger. Set SLOW_REQUEST_THRESHOLD_MS to an empty string to disable the log.
+
+_slow_request_threshold = os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '500')
+SLOW_REQUEST_THRESHOLD_MS = float(_slow_request_threshold) if _slow_request_threshold else None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
@@ -16,10 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from api.views import frontend_view
+from api.views import frontend_view, metrics_view
 
 urlpatterns = [
     path('', frontend_view, name='frontend'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('api.urls')), 
 ]
@@ -0,0 +1,69 @@
+# src/core/warmup.py
+"""
+Start-up helpers for the web servers.
+
+warm_up() loads everything the first request would otherwise load on demand.
+With gunicorn's preload_app it runs once in the master, and every forked
+worker shares the result copy-on-write (see gunicorn.conf.py).
+
+Run `python -m core.warmup [module ...]` to print the start-up time, peak
+memory and heavy modules loaded after Django starts and the app warms up.
+"""
+import gc
+import json
+import os
+import resource
+import sys
+import time
+from importlib import import_module
+
+# Only the ingestion and export code paths need these; the servers must not load them
+HEAVY_MODULES = ('pandas', 'openpyxl', 'pyarrow')
+
+
+def warm_up():
+    """Imports every view and resolves DRF's settings, without touching the database."""
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    # Importing the URLconf imports every view and the API modules behind them
+    get_resolver().url_patterns
+    # DRF imports its default classes on first access
+    for name in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+                 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
+
+
+def prepare_fork():
+    """
+    Runs in the master right before each worker is forked: no database
+    connection may be shared with a worker, and gc.freeze() keeps the
+    children's garbage collector from writing to (and so copying) the
+    preloaded objects.
+    """
+    from django.db import connections
+
+    connections.close_all()
+    gc.freeze()
+
+
+def startup_profile(modules=()):
+    """Starts Django, warms the app up and imports modules; returns what that cost this process."""
+    import django
+
+    started = time.perf_counter()
+    django.setup()
+    warm_up()
+    for module in modules:
+        import_module(module)
+    return {
+        'startup_seconds': round(time.perf_counter() - started, 3),
+        # Kilobytes on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'heavy_modules': sorted(module for module in HEAVY_MODULES if module in sys.modules),
+    }
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    print(json.dumps(startup_profile(sys.argv[1:])))
@@ -0,0 +1,54 @@
+# Gunicorn settings for the web service, selected by APP_SERVER (see core.settings)
+import gc
+import os
+
+APP_SERVER = os.environ.get('APP_SERVER', 'wsgi')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads per sync worker; more than one runs them as gthread workers
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 2))
+# Restart a worker after this many requests (0 never does), staggered by the jitter
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Load and warm up Django once in the master and fork workers from it, so they
+# start instantly and share its memory copy-on-write. Set GUNICORN_PRELOAD=0 to
+# load the app in each worker instead (e.g. for code reloading).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+if APP_SERVER == 'asgi':
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'core.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+if preload_app:
+    # Collections in the master would free objects and leave holes in pages the
+    # workers share; the master allocates little after start-up
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from core.warmup import warm_up
+        warm_up()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from core.warmup import prepare_fork
+        prepare_fork()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from core.warmup import warm_up
+        warm_up()